@@ -1,2 +1,4 @@
+__version__ = '2.1'
+
 from pyRDDLGym.core.env import RDDLEnv
 from pyRDDLGym.registration import make
@@ -0,0 +1,480 @@
+import copy
+import numpy as np
+from typing import Dict, Optional, Tuple, Union
+
+from pyRDDLGym.core.compiler.initializer import RDDLValueInitializer
+from pyRDDLGym.core.compiler.model import RDDLPlanningModel
+from pyRDDLGym.core.compiler.tracer import RDDLObjectsTracer, RDDLTracedObjects
+from pyRDDLGym.core.debug.exception import (
+    print_stack_trace,
+    RDDLActionPreconditionNotSatisfiedError,
+    RDDLInvalidActionError,
+    RDDLStateInvariantNotSatisfiedError,
+    RDDLUndefinedVariableError
+)
+from pyRDDLGym.core.debug.logger import Logger
+from pyRDDLGym.core.simulator import RDDLSimulator
+
+BatchArgs = Dict[str, np.ndarray]
+
+
+class RDDLBatchedSimulator(RDDLSimulator):
+    '''A simulator that evaluates a batch of independent roll-outs at once.
+
+    Every fluent and non-fluent tensor carries a leading batch axis, and the
+    compiled tensor information is shifted to account for it, so that a single
+    recursive evaluation of each CPF covers all roll-outs in the batch.
+    Rewards, termination flags and constraint checks are returned as arrays
+    with one entry per roll-out.
+    '''
+
+    def __init__(self, rddl: RDDLPlanningModel,
+                 batch_size: int,
+                 allow_synchronous_state: bool=True,
+                 rng: np.random.Generator=np.random.default_rng(),
+                 logger: Optional[Logger]=None,
+                 keep_tensors: bool=False,
+                 compile_closures: bool=True,
+                 dtypes: Optional[Dict[str, type]]=None,
+                 validation: str='full',
+                 validation_steps: int=100) -> None:
+        '''Creates a new batched simulator for the given RDDL model.
+
+        :param rddl: the RDDL model
+        :param batch_size: the number of independent roll-outs to simulate
+        :param allow_synchronous_state: whether state-fluent can be synchronous
+        :param rng: the random number generator
+        :param logger: to log information about compilation to file
+        :param keep_tensors: whether the sampler takes actions and
+        returns state in numpy array form (with leading batch dimension),
+        otherwise each grounded fluent maps to an array of size batch_size
+        :param compile_closures: whether to compile expressions into closures
+        instead of walking the expression tree at every step
+        :param dtypes: optional dictionary mapping fluents and non-fluents to
+        the narrower dtypes in which their tensors are stored
+        :param validation: how often the values of expressions are checked at
+        run time ('full', 'sampled' or 'off', see RDDLSimulator)
+        :param validation_steps: the number of steps of the validation level
+        '''
+        if batch_size < 1:
+            raise ValueError(f'Batch size must be positive, got {batch_size}.')
+        self.batch_size = batch_size
+
+        super(RDDLBatchedSimulator, self).__init__(
+            rddl=rddl,
+            allow_synchronous_state=allow_synchronous_state,
+            rng=rng,
+            logger=logger,
+            keep_tensors=keep_tensors,
+            compile_closures=compile_closures,
+            dtypes=dtypes,
+            validation=validation,
+            validation_steps=validation_steps)
+
+    def _compile(self):
+        super(RDDLBatchedSimulator, self)._compile()
+        batch_size = self.batch_size
+
+        # make the compiled tensor information aware of the batch dimension
+        self.traced = _batch_traced_objects(self.traced, batch_size)
+
+        # prepend the batch dimension to all initial values: the tensors are
+        # read-only views, since values are only ever replaced and not modified
+        self.init_values = {
+            var: np.broadcast_to(values, (batch_size,) + np.shape(values))
+            for (var, values) in self.init_values.items()
+        }
+        self.subs = self.init_values.copy()
+        self.noop_actions = {var: self.init_values[var]
+                             for var in self.noop_actions}
+
+    def _ground_batched(self, var, values):
+        groundings = self.rddl.variable_groundings[var]
+        values = np.reshape(values, (self.batch_size, len(groundings)))
+        return zip(groundings, values.T)
+
+    # ===========================================================================
+    # main sampling routines
+    # ===========================================================================
+
+    def _process_actions(self, actions):
+        rddl = self.rddl
+        batch_size = self.batch_size
+        new_actions = self.noop_actions.copy()
+
+        # tensors are broadcast to include the batch dimension if missing
+        if self.keep_tensors:
+            for (action, value) in actions.items():
+                default = new_actions.get(action, None)
+                if default is None:
+                    raise RDDLInvalidActionError(
+                        f'<{action}> is not a valid action-fluent, '
+                        f'must be one of {set(new_actions.keys())}.')
+                try:
+                    new_actions[action] = np.broadcast_to(value, default.shape)
+                except ValueError:
+                    raise RDDLInvalidActionError(
+                        f'Value array for action <{action}> must be broadcastable '
+                        f'to shape {default.shape}, got array of shape '
+                        f'{np.shape(value)}.')
+
+        # grounded values are scalars or arrays of size batch_size
+        else:
+            copied = set()
+            for (action, value) in actions.items():
+                value = _objects_to_indices(rddl, value)
+                if action in new_actions:  # no parameters
+                    new_actions[action] = np.broadcast_to(
+                        value, new_actions[action].shape)
+                else:  # must have parameters
+                    entry = self.grounded_action_indices.get(action, None)
+                    if entry is None:
+                        raise RDDLInvalidActionError(
+                            f'<{action}> is not a valid action-fluent, '
+                            f'must be one of {set(new_actions.keys())}.')
+                    var, index, dtype = entry
+                    self._check_type(value, dtype, action, expr='')
+                    tensor = new_actions[var]
+                    if var not in copied:
+                        tensor = new_actions[var] = np.array(tensor)
+                        copied.add(var)
+                    tensor.reshape(batch_size, -1)[:, index] = value
+        return new_actions
+
+    def check_default_action_count(self, actions: BatchArgs,
+                                   enforce_for_non_bool: bool=True) -> None:
+        '''Throws an exception if the actions of any roll-out in the batch do
+        not satisfy max-nondef-actions.'''
+        rddl = self.rddl
+        if self.keep_tensors:
+            action_ranges = rddl.action_ranges
+        else:
+            action_ranges = self.grounded_action_ranges
+
+        total_non_default = np.zeros((self.batch_size,), dtype=np.int64)
+        for (var, values) in actions.items():
+
+            # check that action is valid
+            prange = action_ranges.get(var, None)
+            if prange is None:
+                raise RDDLInvalidActionError(
+                    f'<{var}> is not a valid action fluent, '
+                    f'must be one of {set(action_ranges.keys())}.')
+
+            # accumulate count of non-default actions for each roll-out
+            if enforce_for_non_bool or prange == 'bool':
+                if self.keep_tensors:
+                    default_values = self.noop_actions[var]
+                    shape = np.shape(default_values)
+                else:
+                    default_values = self.grounded_noop_actions[var]
+                    shape = (self.batch_size,)
+                non_default = np.broadcast_to(
+                    np.not_equal(values, default_values), shape)
+                non_default = np.reshape(non_default, (self.batch_size, -1))
+                total_non_default += np.count_nonzero(non_default, axis=1)
+
+        if np.any(total_non_default > rddl.max_allowed_actions):
+            raise RDDLInvalidActionError(
+                f'Expected at most {rddl.max_allowed_actions} '
+                f'non-default actions, got {np.max(total_non_default)}.')
+
+    def check_state_invariants(self, silent: bool=False) -> np.ndarray:
+        '''Returns a boolean array indicating whether the state invariants are
+        satisfied in each roll-out. Throws an exception if they are not
+        satisfied in some roll-out and silent is False.'''
+        self._shared_values.clear()
+        satisfied = np.ones((self.batch_size,), dtype=bool)
+        for (i, invariant) in enumerate(self.rddl.invariants):
+            loc = self.invariant_names[i]
+            sample = self._sample(invariant, self.subs)
+            self._check_type(sample, bool, loc, invariant)
+            if not silent and not np.all(sample):
+                raise RDDLStateInvariantNotSatisfiedError(
+                    f'{loc} is not satisfied.\n' + print_stack_trace(invariant))
+            satisfied &= sample
+        return satisfied
+
+    def check_action_preconditions(self, actions: BatchArgs,
+                                   silent: bool=False) -> np.ndarray:
+        '''Returns a boolean array indicating whether the action preconditions
+        are satisfied in each roll-out. Throws an exception if they are not
+        satisfied in some roll-out and silent is False.'''
+        actions = self._process_actions(actions)
+        self.subs.update(actions)
+
+        self._shared_values.clear()
+        satisfied = np.ones((self.batch_size,), dtype=bool)
+        for (i, precond) in enumerate(self.rddl.preconditions):
+            loc = self.precond_names[i]
+            sample = self._sample(precond, self.subs)
+            self._check_type(sample, bool, loc, precond)
+            if not silent and not np.all(sample):
+                raise RDDLActionPreconditionNotSatisfiedError(
+                    f'{loc} is not satisfied for actions {actions}.\n' +
+                    print_stack_trace(precond))
+            satisfied &= sample
+        return satisfied
+
+    def check_terminal_states(self) -> np.ndarray:
+        '''Returns a boolean array indicating whether a terminal state has been
+        reached in each roll-out.'''
+        self._shared_values.clear()
+        terminated = np.zeros((self.batch_size,), dtype=bool)
+        for (i, terminal) in enumerate(self.rddl.terminations):
+            loc = self.terminal_names[i]
+            sample = self._sample(terminal, self.subs)
+            self._check_type(sample, bool, loc, terminal)
+            terminated |= sample
+        return terminated
+
+    def sample_reward(self) -> np.ndarray:
+        '''Samples the current reward of each roll-out given the current state
+        and action.'''
+        self._shared_values.clear()
+        return self._sample_reward()
+
+    def _sample_reward(self):
+        reward = self._sample(self.rddl.reward, self.subs)
+        return np.asarray(reward, dtype=float)
+
+    def reset(self) -> Tuple[BatchArgs, np.ndarray]:
+        '''Resets the state variables of all roll-outs to their initial values.'''
+        rddl = self.rddl
+        subs = self.subs = self.init_values.copy()
+        keep_tensors = self.keep_tensors
+
+        # update state
+        self.state = {}
+        for state in rddl.state_fluents:
+            if keep_tensors:
+                self.state[state] = subs[state]
+            else:
+                self.state.update(self._ground_batched(state, subs[state]))
+
+        # update observation
+        if self._pomdp:
+            if keep_tensors:
+                obs = {var: None for var in rddl.observ_fluents}
+            else:
+                obs = {}
+                for var in rddl.observ_fluents:
+                    obs.update(rddl.ground_var_with_value(var, None))
+        else:
+            obs = self.state
+
+        done = self.check_terminal_states()
+        return obs, done
+
+    def step(self, actions: BatchArgs) -> Tuple[BatchArgs, np.ndarray, np.ndarray]:
+        '''Samples and returns the next state of all roll-outs from the CPF
+        expressions.
+
+        :param actions: a dict mapping current action fluent to their values,
+        where values are either shared by all roll-outs or have leading
+        dimension equal to the batch size
+        '''
+        rddl = self.rddl
+        keep_tensors = self.keep_tensors
+        actions = self._process_actions(actions)
+        subs = self.subs
+        subs.update(actions)
+
+        # evaluate CPFs in topological order
+        self._shared_values.clear()
+        self._sample_cpfs(subs)
+
+        # evaluate reward, reusing subexpressions shared with the CPFs
+        reward = self._sample_reward()
+
+        # update state
+        self.state = {}
+        for (state, next_state) in rddl.next_state.items():
+            subs[state] = subs[next_state]
+            if keep_tensors:
+                self.state[state] = subs[state]
+            else:
+                self.state.update(self._ground_batched(state, subs[state]))
+
+        # update observation
+        if self._pomdp:
+            obs = {}
+            for var in rddl.observ_fluents:
+                if keep_tensors:
+                    obs[var] = subs[var]
+                else:
+                    obs.update(self._ground_batched(var, subs[var]))
+        else:
+            obs = self.state
+
+        done = self.check_terminal_states()
+        if self.validation != 'full':
+            self._count_validated_step()
+        return obs, reward, done
+
+    # ===========================================================================
+    # leaves
+    # ===========================================================================
+
+    def _sample_pvar(self, expr, subs):
+        var, args = expr.args
+
+        # free variable (e.g., ?x) and object converted to canonical index
+        is_value, cached_info = self.traced.cached_sim_info(expr)
+        if is_value:
+            return cached_info
+
+        # extract variable value
+        sample = subs.get(var, None)
+        if sample is None:
+            raise RDDLUndefinedVariableError(
+                f'Variable <{var}> is referenced before assignment.\n' +
+                print_stack_trace(expr))
+        if self._widen and var in self._widen:
+            sample = RDDLValueInitializer.cast(sample, self._widen[var])
+
+        # lifted domain must slice and/or reshape value tensor
+        # the first slice always runs along the batch dimension
+        if cached_info is not None:
+            slices, axis, shape, op_code, op_args = cached_info
+            if slices:
+                if op_code == RDDLObjectsTracer.NUMPY_OP_CODE.NESTED_SLICE:
+                    batch_slice, *slices = slices
+                    slices = (batch_slice,) + tuple(
+                        (self._sample(arg, subs) if _slice is None else _slice)
+                        for (arg, _slice) in zip(args, slices)
+                    )
+                sample = sample[slices]
+            if axis:
+                sample = np.expand_dims(sample, axis=axis)
+                sample = np.broadcast_to(sample, shape=shape)
+            if op_code == RDDLObjectsTracer.NUMPY_OP_CODE.EINSUM:
+                sample = np.einsum(sample, *op_args)
+            elif op_code == RDDLObjectsTracer.NUMPY_OP_CODE.TRANSPOSE:
+                sample = np.transpose(sample, axes=op_args)
+        return sample
+
+    # ===========================================================================
+    # arithmetic and boolean
+    # ===========================================================================
+
+    def _sample_product_grounded(self, args, subs):
+        prod = 1
+
+        # go through simple expressions first, then complex expressions
+        # short-circuit only if the product is zero in all roll-outs
+        for simple in (True, False):
+            for arg in args:
+                if simple == (arg.is_constant_expression()
+                              or arg.is_pvariable_expression()):
+                    prod = prod * self._sample(arg, subs)
+                    if not np.any(prod):
+                        return prod
+        return prod
+
+    def _sample_and_or_grounded(self, args, op, expr, subs):
+        use_and = op == '^'
+        result = np.full((self.batch_size,), fill_value=use_and, dtype=bool)
+
+        # go through simple expressions first, then complex expressions
+        # short-circuit only if the result is decided in all roll-outs
+        for simple in (True, False):
+            for (i, arg) in enumerate(args):
+                if simple == (arg.is_constant_expression()
+                              or arg.is_pvariable_expression()):
+                    sample = self._sample(arg, subs)
+                    self._check_type(sample, bool, op, expr, arg=i + 1)
+                    if use_and:
+                        result = np.logical_and(result, sample)
+                        if not np.any(result):
+                            return result
+                    else:
+                        result = np.logical_or(result, sample)
+                        if np.all(result):
+                            return result
+        return result
+
+
+# ===========================================================================
+# helper functions for adding the batch dimension to traced information
+# ===========================================================================
+
+def _objects_to_indices(rddl, value):
+    if isinstance(value, str):
+        return rddl.object_to_index.get(value, value)
+    value = np.asarray(value)
+    if value.dtype.kind in ('U', 'S', 'O'):
+        value = np.vectorize(rddl.object_to_index.get, otypes=[np.int64])(value)
+    return value
+
+
+def _batch_pvar_info(info, batch_size, num_objects):
+    slices, axis, shape, op_code, op_args = info
+    NUMPY_OP_CODE = RDDLObjectsTracer.NUMPY_OP_CODE
+
+    # nested slices require an index array along the batch dimension that
+    # broadcasts with the runtime indices of the nested pvariables
+    if op_code == NUMPY_OP_CODE.NESTED_SLICE:
+        batch_index = np.arange(batch_size)
+        batch_index = np.reshape(batch_index, (batch_size,) + (1,) * num_objects)
+        return ((batch_index,) + tuple(slices), axis, shape, op_code, op_args)
+
+    # otherwise the batch dimension is kept as the leading axis
+    if slices:
+        slices = (slice(None),) + tuple(slices)
+    if axis:
+        axis = tuple(i + 1 for i in axis)
+        shape = (batch_size,) + tuple(shape)
+    if op_code == NUMPY_OP_CODE.EINSUM:
+        permuted, objects_range = op_args
+        batch_label = len(objects_range)
+        op_args = ([batch_label] + list(permuted),
+                   [batch_label] + list(objects_range))
+    elif op_code == NUMPY_OP_CODE.TRANSPOSE:
+        op_args = (0,) + tuple(i + 1 for i in op_args)
+    return (slices, axis, shape, op_code, op_args)
+
+
+def _shift_axes(axes: Union[int, Tuple[int, ...]]) -> Union[int, Tuple[int, ...]]:
+    if isinstance(axes, tuple):
+        return tuple(i + 1 for i in axes)
+    return axes + 1
+
+
+def _batch_traced_objects(traced: RDDLTracedObjects,
+                          batch_size: int) -> RDDLTracedObjects:
+    '''Returns a copy of the traced information in which all cached simulation
+    info accounts for a leading batch dimension in all value tensors.'''
+    batched = copy.copy(traced)
+    batched._cached_sim_info = sim_info = list(traced._cached_sim_info)
+
+    for (expr_id, info) in enumerate(sim_info):
+        expr = traced.lookup(expr_id)
+        etype, op = expr.etype
+
+        # leaves are broadcast to the full shape of the batch
+        if etype == 'constant':
+            sim_info[expr_id] = np.broadcast_to(
+                info, (batch_size,) + np.shape(info))
+
+        elif etype == 'pvar':
+            is_value, cached_info = info
+            if is_value:
+                cached_info = np.broadcast_to(
+                    cached_info, (batch_size,) + np.shape(cached_info))
+            elif cached_info is not None:
+                num_objects = len(traced.cached_objects_in_scope(expr))
+                cached_info = _batch_pvar_info(
+                    cached_info, batch_size, num_objects)
+            sim_info[expr_id] = (is_value, cached_info)
+
+        # reduction axes are shifted by one
+        elif etype == 'aggregation' or (etype == 'matrix' and op == 'det'):
+            new_objects, axes = info
+            sim_info[expr_id] = (new_objects, _shift_axes(axes))
+
+        # sampling and matrix dimensions are shifted by one
+        elif etype == 'randomvector' or etype == 'matrix':
+            sim_info[expr_id] = _shift_axes(tuple(info))
+
+    return batched
@@ -0,0 +1,62 @@
+import numpy as np
+
+
+class RDDLAliasTable:
+    '''Samples a tensor of independent categorical distributions with static
+    probabilities in constant time per sample, using Walker's alias method.
+
+    For a tensor of probabilities of shape (..., K), the table stores for each
+    distribution and category a probability of keeping the category and an
+    alias category. A sample draws a category uniformly at random and keeps it
+    with its probability, otherwise returns its alias.
+    '''
+
+    def __init__(self, pdf: np.ndarray) -> None:
+        '''Builds the alias tables of the given probabilities.
+
+        :param pdf: a tensor of shape (..., K) of non-negative probabilities of
+        the K categories of each distribution, whose sum over the last axis is
+        positive (the probabilities are normalized)
+        '''
+        pdf = np.asarray(pdf, dtype=np.float64)
+        self.shape = pdf.shape[:-1]
+        self.num_categories = pdf.shape[-1]
+        rows = np.reshape(pdf, (-1, self.num_categories))
+        rows = rows / np.sum(rows, axis=-1, keepdims=True)
+        self.size = rows.shape[0]
+        self.prob = np.ones(rows.shape, dtype=np.float64)
+        self.alias = np.tile(np.arange(self.num_categories), (self.size, 1))
+        for (row, pmf) in enumerate(rows):
+            self._build(pmf, self.prob[row], self.alias[row])
+        self._rows = np.arange(self.size)
+
+    @staticmethod
+    def _build(pmf, prob, alias):
+
+        # Vose's method: every category whose scaled probability is below one
+        # is filled up to one with an alias whose probability exceeds one
+        scaled = (pmf * len(pmf)).tolist()
+        small = [i for (i, p) in enumerate(scaled) if p < 1.0]
+        large = [i for (i, p) in enumerate(scaled) if p >= 1.0]
+        while small and large:
+            i = small.pop()
+            j = large.pop()
+            prob[i] = scaled[i]
+            alias[i] = j
+            scaled[j] = (scaled[j] + scaled[i]) - 1.0
+            if scaled[j] < 1.0:
+                small.append(j)
+            else:
+                large.append(j)
+
+        # the remaining categories have probability one up to rounding errors
+        for i in small + large:
+            prob[i] = 1.0
+
+    def sample(self, rng: np.random.Generator) -> np.ndarray:
+        '''Draws a category index from every distribution.'''
+        rows = self._rows
+        index = rng.integers(self.num_categories, size=self.size)
+        keep = rng.random(size=self.size) < self.prob[rows, index]
+        sample = np.where(keep, index, self.alias[rows, index])
+        return np.reshape(sample, self.shape)[()]
@@ -0,0 +1,108 @@
+import functools
+import glob
+import hashlib
+import os
+import pickle
+from typing import Any, Dict, Optional
+
+from pyRDDLGym.core.debug.exception import raise_warning
+from pyRDDLGym.core.paths import CACHE_DIR_VARIABLE, default_cache_dir
+
+# source files of pyRDDLGym.core whose classes and outputs are stored in the 
+# entries of the cache (i.e. the model, compiled information, bounds and box 
+# invariants), or which restore the simulator from them
+SOURCE_FILES = ('compiler/*.py', 'parser/*.py', 'constraints.py', 'simulator.py')
+
+
+@functools.lru_cache(maxsize=None)
+def source_digest() -> str:
+    '''Returns a hash of the source files of the parser, compiler, constraints
+    and simulator, which changes whenever the layout of the pickled classes or
+    the compiled information may change, even if the library version does not.'''
+    core_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    digest = hashlib.sha256()
+    for pattern in SOURCE_FILES:
+        for filename in sorted(glob.glob(os.path.join(core_dir, pattern))):
+            digest.update(os.path.relpath(filename, core_dir).encode('utf-8'))
+            with open(filename, 'rb') as file:
+                digest.update(file.read())
+    return digest.hexdigest()
+
+
+class RDDLCompilationCache:
+    '''A content-addressed cache on disk for compiled RDDL models.
+    
+    Each entry is a dictionary holding the lifted model (including its AST), 
+    initial values, CPF levels, traced information and any other compiled 
+    data, pickled together so that references to the same expressions are 
+    preserved. Entries are keyed by a hash of the domain and instance text, 
+    the library version and the sources that produce the entries (see 
+    source_digest()), so they are never reused for a different problem, after 
+    an upgrade or after the compiler is modified.
+    '''
+    
+    def __init__(self, cache_dir: Optional[str]=None) -> None:
+        '''Creates a new compilation cache in the given directory.
+        
+        :param cache_dir: the directory where entries are stored, which is 
+        created if it does not exist (defaults to default_cache_dir())
+        '''
+        if cache_dir is None:
+            cache_dir = default_cache_dir()
+        self.cache_dir = cache_dir
+    
+    @staticmethod
+    def key(*texts: str) -> str:
+        '''Returns the key of the entry for the given text (e.g., domain and 
+        instance) for the current library version and compiler sources.'''
+        import pyRDDLGym
+        digest = hashlib.sha256(pyRDDLGym.__version__.encode('utf-8'))
+        digest.update(b'\0')
+        digest.update(source_digest().encode('utf-8'))
+        for text in texts:
+            digest.update(b'\0')
+            digest.update(text.encode('utf-8'))
+        return digest.hexdigest()
+    
+    def path(self, key: str) -> str:
+        '''Returns the path of the file storing the entry with the given key.'''
+        return os.path.join(self.cache_dir, f'{key}.pkl')
+    
+    def load(self, key: str) -> Optional[Dict[str, Any]]:
+        '''Returns the entry with the given key, or None if it does not exist
+        or cannot be read.'''
+        path = self.path(key)
+        if not os.path.isfile(path):
+            return None
+        try:
+            with open(path, 'rb') as file:
+                return pickle.load(file)
+        except Exception as e:
+            raise_warning(f'Failed to load compiled model from {path}: {e}, '
+                          f'it will be compiled again.', 'red')
+            return None
+    
+    def save(self, key: str, entry: Dict[str, Any]) -> None:
+        '''Saves the entry with the given key, replacing any existing entry.
+        
+        The entry is written to a temporary file first and then renamed, so 
+        concurrent readers never see a partially written entry.
+        '''
+        os.makedirs(self.cache_dir, exist_ok=True)
+        path = self.path(key)
+        temp_path = f'{path}.{os.getpid()}.tmp'
+        try:
+            with open(temp_path, 'wb') as file:
+                pickle.dump(entry, file, protocol=pickle.HIGHEST_PROTOCOL)
+            os.replace(temp_path, path)
+        except Exception as e:
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+            raise_warning(f'Failed to save compiled model to {path}: {e}.', 'red')
+    
+    def clear(self) -> None:
+        '''Removes all entries from the cache.'''
+        if os.path.isdir(self.cache_dir):
+            for filename in os.listdir(self.cache_dir):
+                if filename.endswith('.pkl'):
+                    os.remove(os.path.join(self.cache_dir, filename))
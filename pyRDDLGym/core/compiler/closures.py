@@ -0,0 +1,538 @@
+import numpy as np
+from typing import Any, Callable, Dict, List
+
+from pyRDDLGym.core.compiler.initializer import RDDLValueInitializer
+from pyRDDLGym.core.compiler.tracer import RDDLObjectsTracer
+from pyRDDLGym.core.debug.exception import (
+    print_stack_trace,
+    RDDLUndefinedVariableError
+)
+from pyRDDLGym.core.parser.expr import Expression
+
+Closure = Callable[[Dict[str, Any]], Any]
+
+
+class RDDLClosureCompiler:
+    '''Compiles the traced expressions of a RDDL simulator into a flat list of
+    Python closures indexed by expression id.
+
+    Each closure takes the current dictionary of fluent values and returns the
+    sampled value of its expression, with the operator, cached simulation info
+    and child closures resolved once at compile time. The evaluation order of
+    child expressions is identical to the tree-walking interpreter of the
+    simulator, so both produce the same samples from the same random generator.
+    Expressions that are rare or malformed are delegated to the corresponding
+    sampling method of the simulator, so errors are raised as usual at run time.
+    '''
+
+    # maps each distribution to the sampling subroutine of the simulator
+    RANDOM_SAMPLERS = {
+        'KronDelta': ('_sample_kron_delta', {}),
+        'DiracDelta': ('_sample_dirac_delta', {}),
+        'Uniform': ('_sample_uniform', {}),
+        'Bernoulli': ('_sample_bernoulli', {}),
+        'Normal': ('_sample_normal', {}),
+        'Poisson': ('_sample_poisson', {}),
+        'Exponential': ('_sample_exponential', {}),
+        'Weibull': ('_sample_weibull', {}),
+        'Gamma': ('_sample_gamma', {}),
+        'Binomial': ('_sample_binomial', {}),
+        'NegativeBinomial': ('_sample_negative_binomial', {}),
+        'Beta': ('_sample_beta', {}),
+        'Geometric': ('_sample_geometric', {}),
+        'Pareto': ('_sample_pareto', {}),
+        'Student': ('_sample_student', {}),
+        'Gumbel': ('_sample_gumbel', {}),
+        'Laplace': ('_sample_laplace', {}),
+        'Cauchy': ('_sample_cauchy', {}),
+        'Gompertz': ('_sample_gompertz', {}),
+        'ChiSquare': ('_sample_chisquare', {}),
+        'Kumaraswamy': ('_sample_kumaraswamy', {}),
+        'Discrete': ('_sample_discrete', {'unnorm': False}),
+        'UnnormDiscrete': ('_sample_discrete', {'unnorm': True}),
+        'Discrete(p)': ('_sample_discrete_pvar', {'unnorm': False}),
+        'UnnormDiscrete(p)': ('_sample_discrete_pvar', {'unnorm': True})
+    }
+
+    def __init__(self, simulator, profiler=None) -> None:
+        '''Creates a new closure compiler for the given simulator.
+
+        :param simulator: the RDDLSimulator instance whose traced expressions,
+        operator tables and sampling subroutines are used by the closures
+        :param profiler: an optional RDDLProfiler that times every closure
+        '''
+        self.sim = simulator
+        self.traced = simulator.traced
+        self.profiler = profiler
+
+    def compile(self) -> List[Closure]:
+        '''Returns a list of closures, such that the closure at position i
+        samples the expression with id i.'''
+        closures = {}
+        for identifier in range(self.traced._current_id):
+            expr = self.traced.lookup(identifier)
+            if expr is not None:
+                self._compile(expr, closures)
+        return [closures.get(identifier, None)
+                for identifier in range(self.traced._current_id)]
+
+    def _compile(self, expr: Expression, closures: Dict[int, Closure]) -> Closure:
+        closure = closures.get(expr.id, None)
+        if closure is None:
+            closure = self._compile_expr(expr, closures)
+            shared_id = self.sim.shared.get(expr.id, None)
+            if shared_id is not None:
+                closure = self._compile_shared(shared_id, closure)
+            if self.profiler is not None:
+                closure = self.profiler.wrap(expr.id, closure)
+            closures[expr.id] = closure
+        return closure
+
+    def _compile_expr(self, expr, closures):
+        if expr.id in self.sim.folded:
+            return self._compile_folded(expr, closures)
+        etype, _ = expr.etype
+        if etype == 'constant':
+            return self._compile_constant(expr, closures)
+        elif etype == 'pvar':
+            return self._compile_pvar(expr, closures)
+        elif etype == 'arithmetic':
+            return self._compile_arithmetic(expr, closures)
+        elif etype == 'relational':
+            return self._compile_relational(expr, closures)
+        elif etype == 'boolean':
+            return self._compile_logical(expr, closures)
+        elif etype == 'aggregation':
+            return self._compile_aggregation(expr, closures)
+        elif etype == 'func':
+            return self._compile_func(expr, closures)
+        elif etype == 'control':
+            return self._compile_control(expr, closures)
+        elif etype == 'randomvar':
+            return self._compile_random(expr, closures)
+        elif etype == 'randomvector':
+            return self._delegate_random('_sample_random_vector', expr)
+        elif etype == 'matrix':
+            return self._delegate('_sample_matrix', expr)
+        else:
+            return self._delegate('_sample', expr)
+
+    def _delegate(self, method_name, expr, **kwargs):
+        method = getattr(self.sim, method_name)
+
+        def _closure(subs):
+            return method(expr, subs, **kwargs)
+
+        return _closure
+
+    def _delegate_random(self, method_name, expr, **kwargs):
+        method = getattr(self.sim, method_name)
+        if self.sim.keyed_rng:
+            method = self.sim._keyed_sampler(method)
+
+        def _closure(subs):
+            return method(expr, subs, **kwargs)
+
+        return _closure
+
+    # ===========================================================================
+    # leaves
+    # ===========================================================================
+
+    def _compile_constant(self, expr, closures):
+        value = self.traced.cached_sim_info(expr)
+
+        def _closure(_):
+            return value
+
+        return _closure
+
+    def _compile_folded(self, expr, closures):
+        value = self.sim.folded[expr.id]
+
+        def _closure(_):
+            return value
+
+        return _closure
+
+    def _compile_shared(self, shared_id, closure):
+        values = self.sim._shared_values
+
+        def _shared(subs):
+            value = values.get(shared_id, None)
+            if value is None:
+                value = values[shared_id] = closure(subs)
+            return value
+
+        return _shared
+
+    def _compile_pvar(self, expr, closures):
+        var, args = expr.args
+
+        # free variable (e.g., ?x) and object converted to canonical index
+        is_value, cached_info = self.traced.cached_sim_info(expr)
+        if is_value:
+
+            def _closure(_):
+                return cached_info
+
+            return _closure
+
+        # values stored in a narrow dtype are widened when read
+        widen = self.sim._widen.get(var, None)
+        cast = RDDLValueInitializer.cast
+
+        def _read(subs):
+            sample = subs.get(var, None)
+            if sample is None:
+                raise RDDLUndefinedVariableError(
+                    f'Variable <{var}> is referenced before assignment.\n' +
+                    print_stack_trace(expr))
+            if widen is not None:
+                sample = cast(sample, widen)
+            return sample
+
+        if cached_info is None:
+            return _read
+
+        # nested variables are filled in at run time: any leading slices that
+        # do not correspond to an argument are kept as is
+        slices, axis, shape, op_code, op_args = cached_info
+        nested = []
+        if slices and op_code == RDDLObjectsTracer.NUMPY_OP_CODE.NESTED_SLICE:
+            offset = len(slices) - len(args)
+            for (i, _slice) in enumerate(slices):
+                if _slice is None:
+                    nested.append((i, self._compile(args[i - offset], closures)))
+
+        # the common case of a value tensor that needs no transformation
+        if not slices and not axis and op_code not in (
+            RDDLObjectsTracer.NUMPY_OP_CODE.EINSUM,
+            RDDLObjectsTracer.NUMPY_OP_CODE.TRANSPOSE):
+            return _read
+
+        do_einsum = op_code == RDDLObjectsTracer.NUMPY_OP_CODE.EINSUM
+        do_transpose = op_code == RDDLObjectsTracer.NUMPY_OP_CODE.TRANSPOSE
+
+        def _closure(subs):
+            sample = _read(subs)
+            if nested:
+                runtime_slices = list(slices)
+                for (i, arg) in nested:
+                    runtime_slices[i] = arg(subs)
+                sample = sample[tuple(runtime_slices)]
+            elif slices:
+                sample = sample[slices]
+            if axis:
+                sample = np.expand_dims(sample, axis=axis)
+                sample = np.broadcast_to(sample, shape=shape)
+            if do_einsum:
+                sample = np.einsum(sample, *op_args)
+            elif do_transpose:
+                sample = np.transpose(sample, axes=op_args)
+            return sample
+
+        return _closure
+
+    # ===========================================================================
+    # arithmetic
+    # ===========================================================================
+
+    def _compile_arithmetic(self, expr, closures):
+        sim = self.sim
+        _, op = expr.etype
+        numpy_op = sim.ARITHMETIC_OPS.get(op, None)
+        args = expr.args
+        n = len(args)
+        if numpy_op is None:
+            return self._delegate('_sample_arithmetic', expr)
+
+        # unary negation
+        if n == 1 and op == '-':
+            arg = self._compile(args[0], closures)
+
+            def _closure(subs):
+                return -1 * arg(subs)
+
+            return _closure
+
+        # binary operator: for * try to short-circuit if possible
+        elif n == 2:
+            lhs, rhs = args
+            if op == '*':
+                if rhs.is_constant_expression() or rhs.is_pvariable_expression():
+                    lhs, rhs = rhs, lhs
+                lhs = self._compile(lhs, closures)
+                rhs = self._compile(rhs, closures)
+
+                def _closure(subs):
+                    sample_lhs = 1 * lhs(subs)
+                    if not np.any(sample_lhs):
+                        return sample_lhs
+                    return sample_lhs * rhs(subs)
+
+                return _closure
+
+            else:
+                lhs = self._compile(lhs, closures)
+                rhs = self._compile(rhs, closures)
+
+                def _closure(subs):
+                    sample_lhs = 1 * lhs(subs)
+                    sample_rhs = 1 * rhs(subs)
+                    try:
+                        return numpy_op(sample_lhs, sample_rhs)
+                    except:
+                        raise ArithmeticError(
+                            f'Cannot evaluate arithmetic operation {op} '
+                            f'at {sample_lhs} and {sample_rhs}.\n' +
+                            print_stack_trace(expr))
+
+                return _closure
+
+        # for a grounded domain can short-circuit * and +
+        elif n > 0 and not self.traced.cached_objects_in_scope(expr):
+            for arg in args:
+                self._compile(arg, closures)
+            if op == '*':
+                product = sim._sample_product_grounded
+
+                def _closure(subs):
+                    return product(args, subs)
+
+                return _closure
+
+            elif op == '+':
+                terms = [closures[arg.id] for arg in args]
+
+                def _closure(subs):
+                    return sum(1 * term(subs) for term in terms)
+
+                return _closure
+
+        return self._delegate('_sample_arithmetic', expr)
+
+    # ===========================================================================
+    # boolean
+    # ===========================================================================
+
+    def _compile_relational(self, expr, closures):
+        _, op = expr.etype
+        numpy_op = self.sim.RELATIONAL_OPS.get(op, None)
+        args = expr.args
+        if numpy_op is None or len(args) != 2:
+            return self._delegate('_sample_relational', expr)
+
+        lhs, rhs = args
+        lhs = self._compile(lhs, closures)
+        rhs = self._compile(rhs, closures)
+
+        def _closure(subs):
+            return numpy_op(1 * lhs(subs), 1 * rhs(subs))
+
+        return _closure
+
+    def _compile_logical(self, expr, closures):
+        sim = self.sim
+        check_type = sim._check_type
+        _, op = expr.etype
+        if op == '&':
+            op = '^'
+        numpy_op = sim.LOGICAL_OPS.get(op, None)
+        args = expr.args
+        n = len(args)
+        if numpy_op is None:
+            return self._delegate('_sample_logical', expr)
+
+        if n == 1 and op == '~':
+            arg = self._compile(args[0], closures)
+
+            def _closure(subs):
+                sample = arg(subs)
+                check_type(sample, bool, op, expr, arg='')
+                return np.logical_not(sample)
+
+            return _closure
+
+        # try to short-circuit ^ and | if possible
+        elif n == 2:
+            lhs, rhs = args
+            if op == '^' or op == '|':
+                if rhs.is_constant_expression() or rhs.is_pvariable_expression():
+                    lhs, rhs = rhs, lhs
+                lhs = self._compile(lhs, closures)
+                rhs = self._compile(rhs, closures)
+                use_and = op == '^'
+
+                def _closure(subs):
+                    sample_lhs = lhs(subs)
+                    check_type(sample_lhs, bool, op, expr, arg=1)
+                    if use_and:
+                        if not np.any(sample_lhs):
+                            return sample_lhs
+                    elif np.all(sample_lhs):
+                        return sample_lhs
+                    sample_rhs = rhs(subs)
+                    check_type(sample_rhs, bool, op, expr, arg=2)
+                    return numpy_op(sample_lhs, sample_rhs)
+
+                return _closure
+
+            else:
+                lhs = self._compile(lhs, closures)
+                rhs = self._compile(rhs, closures)
+
+                def _closure(subs):
+                    sample_lhs = lhs(subs)
+                    sample_rhs = rhs(subs)
+                    check_type(sample_lhs, bool, op, expr, arg=1)
+                    check_type(sample_rhs, bool, op, expr, arg=2)
+                    return numpy_op(sample_lhs, sample_rhs)
+
+                return _closure
+
+        # for a grounded domain, we can short-circuit ^ and |
+        elif n > 0 and (op == '^' or op == '|') \
+        and not self.traced.cached_objects_in_scope(expr):
+            for arg in args:
+                self._compile(arg, closures)
+            and_or = sim._sample_and_or_grounded
+
+            def _closure(subs):
+                return and_or(args, op, expr, subs)
+
+            return _closure
+
+        return self._delegate('_sample_logical', expr)
+
+    # ===========================================================================
+    # aggregation
+    # ===========================================================================
+
+    def _compile_aggregation(self, expr, closures):
+        sim = self.sim
+        sparse = sim.sparse_aggregations.get(expr.id, None)
+        if sparse is not None:
+            return sparse.sample
+
+        check_type = sim._check_type
+        _, op = expr.etype
+        numpy_op = sim.AGGREGATION_OPS.get(op, None)
+        if numpy_op is None:
+            return self._delegate('_sample_aggregation', expr)
+
+        * _, arg = expr.args
+        arg = self._compile(arg, closures)
+        _, axes = self.traced.cached_sim_info(expr)
+
+        if op in sim.AGGREGATION_BOOL:
+
+            def _closure(subs):
+                sample = arg(subs)
+                check_type(sample, bool, op, expr, arg='')
+                return numpy_op(sample, axis=axes)
+
+        else:
+
+            def _closure(subs):
+                return numpy_op(1 * arg(subs), axis=axes)
+
+        return _closure
+
+    # ===========================================================================
+    # function
+    # ===========================================================================
+
+    def _compile_func(self, expr, closures):
+        sim = self.sim
+        check_type = sim._check_type
+        _, name = expr.etype
+        args = expr.args
+
+        # unary function
+        unary_op = sim.UNARY.get(name, None)
+        if unary_op is not None and len(args) == 1:
+            arg = self._compile(args[0], closures)
+
+            def _closure(subs):
+                sample = 1 * arg(subs)
+                try:
+                    return unary_op(sample)
+                except:
+                    raise ArithmeticError(
+                        f'Cannot evaluate unary function {name} at {sample}.\n' +
+                        print_stack_trace(expr))
+
+            return _closure
+
+        # binary function
+        binary_op = sim.BINARY.get(name, None)
+        if unary_op is None and binary_op is not None and len(args) == 2:
+            lhs, rhs = args
+            lhs = self._compile(lhs, closures)
+            rhs = self._compile(rhs, closures)
+            requires_int = name in sim.BINARY_REQUIRES_INT
+
+            def _closure(subs):
+                sample_lhs = 1 * lhs(subs)
+                sample_rhs = 1 * rhs(subs)
+                if requires_int:
+                    check_type(
+                        sample_lhs, RDDLValueInitializer.INT, name, expr, arg=1)
+                    check_type(
+                        sample_rhs, RDDLValueInitializer.INT, name, expr, arg=2)
+                try:
+                    return binary_op(sample_lhs, sample_rhs)
+                except:
+                    raise ArithmeticError(
+                        f'Cannot evaluate binary function {name} at '
+                        f'{sample_lhs} and {sample_rhs}.\n' +
+                        print_stack_trace(expr))
+
+            return _closure
+
+        return self._delegate('_sample_func', expr)
+
+    # ===========================================================================
+    # control flow
+    # ===========================================================================
+
+    def _compile_control(self, expr, closures):
+        sim = self.sim
+        check_type = sim._check_type
+        _, op = expr.etype
+        args = expr.args
+        if op != 'if' or len(args) != 3:
+            return self._delegate('_sample_control', expr)
+
+        pred, arg1, arg2 = args
+        pred = self._compile(pred, closures)
+        arg1 = self._compile(arg1, closures)
+        arg2 = self._compile(arg2, closures)
+
+        def _closure(subs):
+            sample_pred = pred(subs)
+            check_type(sample_pred, bool, 'If predicate', expr)
+
+            # can short circuit if all elements of predicate tensor equal
+            first_elem = bool(sample_pred.flat[0]
+                              if np.ndim(sample_pred)
+                              else sample_pred)
+            if np.all(sample_pred == first_elem):
+                return arg1(subs) if first_elem else arg2(subs)
+            else:
+                return np.where(sample_pred, arg1(subs), arg2(subs))
+
+        return _closure
+
+    # ===========================================================================
+    # random variables
+    # ===========================================================================
+
+    def _compile_random(self, expr, closures):
+        _, name = expr.etype
+        sampler = RDDLClosureCompiler.RANDOM_SAMPLERS.get(name, None)
+        if sampler is None:
+            return self._delegate_random('_sample_random', expr)
+        method_name, kwargs = sampler
+        return self._delegate_random(method_name, expr, **kwargs)
@@ -0,0 +1,743 @@
+import hashlib
+import numpy as np
+import os
+from typing import Optional
+
+from pyRDDLGym.core.compiler.closures import RDDLClosureCompiler
+from pyRDDLGym.core.compiler.model import RDDLPlanningModel
+from pyRDDLGym.core.compiler.tracer import RDDLObjectsTracer
+from pyRDDLGym.core.debug.decompiler import RDDLDecompiler
+from pyRDDLGym.core.debug.logger import Logger
+from pyRDDLGym.core.parser.expr import Expression
+
+# the version of the generated code: must be incremented whenever the generated
+# source changes, so that stale files in the cache directory are not reused
+CODEGEN_VERSION = '8'
+
+# the header and the imports of every generated module
+MODULE_HEADER = '''\'\'\'NumPy step function generated by pyRDDLGym for domain <{domain}>
+and instance <{instance}>: do not edit.\'\'\'
+import numpy as np
+import time
+
+from pyRDDLGym.core.compiler.initializer import RDDLValueInitializer
+from pyRDDLGym.core.debug.exception import (
+    print_stack_trace,
+    RDDLUndefinedVariableError
+)
+
+
+def _undefined(var, expr):
+    raise RDDLUndefinedVariableError(
+        f'Variable <{{var}}> is referenced before assignment.\\n' +
+        print_stack_trace(expr))
+
+
+def _arithmetic_error(op, lhs, rhs, expr):
+    raise ArithmeticError(
+        f'Cannot evaluate arithmetic operation {{op}} '
+        f'at {{lhs}} and {{rhs}}.\\n' + print_stack_trace(expr))
+
+
+def _unary_error(name, arg, expr):
+    raise ArithmeticError(
+        f'Cannot evaluate unary function {{name}} at {{arg}}.\\n' +
+        print_stack_trace(expr))
+
+
+def _binary_error(name, lhs, rhs, expr):
+    raise ArithmeticError(
+        f'Cannot evaluate binary function {{name}} at '
+        f'{{lhs}} and {{rhs}}.\\n' + print_stack_trace(expr))
+
+
+def bind(sim):
+    traced = sim.traced
+    _check_type = sim._check_type
+    _check_types = sim._check_types
+    _check_positive = sim._check_positive
+    _check_bounds = sim._check_bounds
+    _check_range = sim._check_range
+    _discrete = sim._sample_discrete_helper
+    _keyed_rng = sim._keyed_rng if sim.keyed_rng else None
+    _cast = RDDLValueInitializer.cast
+    INT = RDDLValueInitializer.INT
+    REAL = RDDLValueInitializer.REAL
+'''
+
+
+class RDDLCodeGenerator:
+    '''Generates the source code of a Python module that samples the CPFs,
+    reward and constraints of a RDDL domain with straight-line NumPy code.
+
+    The generated module defines a single function bind(sim), which reads the
+    operators and cached tensor information from the given simulator once and
+    returns a tuple (cpfs, roots), where cpfs(subs) samples all CPFs in the
+    order of evaluation and updates subs in place, and roots is a dictionary
+    mapping the id of each root expression (reward, invariants, preconditions
+    and terminations) to a function that samples it. The generated code
+    evaluates child expressions in the same order as the interpreter of the
+    simulator and short-circuits in the same cases, so both produce identical
+    samples from the same random generator.
+
+    Since the source only refers to expressions by their traced ids, it depends
+    only on the domain and instance (and on which subexpressions the simulator
+    folded into constants or shares), and can be cached between runs.
+    '''
+
+    # distributions whose sampling code is generated inline
+    INLINE_RANDOM = {'KronDelta', 'DiracDelta', 'Uniform', 'Bernoulli', 'Normal',
+                     'Poisson', 'Exponential', 'Gamma', 'Binomial', 'Beta',
+                     'Discrete', 'UnnormDiscrete', 'Discrete(p)',
+                     'UnnormDiscrete(p)'}
+
+    def __init__(self, simulator, logger: Optional[Logger]=None,
+                 validate: bool=True, profile: bool=False) -> None:
+        '''Creates a new code generator for the given simulator.
+
+        :param simulator: the RDDLSimulator instance whose model, traced 
+        expressions, CPF order and operator tables are used to generate code
+        :param logger: to log the generated code to file
+        :param validate: whether the generated code checks the values of 
+        expressions (i.e., the types of CPFs and the arguments of operations
+        and distributions), otherwise the checks are left out
+        :param profile: whether the generated code measures the time spent in
+        each CPF, which is accumulated in the profiler of the simulator
+        '''
+        self.sim = simulator
+        self.rddl = simulator.rddl
+        self.traced = simulator.traced
+        self.logger = logger
+        self.validate = validate
+        self.profile = profile
+
+    @staticmethod
+    def hash_key(*texts: str) -> str:
+        '''Returns a key for the cache that uniquely identifies the given text
+        (e.g., domain and instance) and the version of the code generator.'''
+        digest = hashlib.sha256(CODEGEN_VERSION.encode('utf-8'))
+        for text in texts:
+            digest.update(text.encode('utf-8'))
+            digest.update(b'\0')
+        return digest.hexdigest()
+
+    @staticmethod
+    def model_key(rddl: RDDLPlanningModel) -> str:
+        '''Returns a key for the cache computed from the decompiled domain and
+        the objects of the instance, which determine the generated code.'''
+        domain = RDDLDecompiler().decompile_domain(rddl)
+        instance = repr((rddl.instance_name, sorted(rddl.type_to_objects.items())))
+        return RDDLCodeGenerator.hash_key(domain, instance)
+
+    def generate(self, cache_dir: Optional[str]=None,
+                 cache_key: Optional[str]=None) -> str:
+        '''Returns the source code of the generated module.
+
+        :param cache_dir: optional directory where the generated source is
+        saved, and loaded from if it already exists
+        :param cache_key: the key identifying the domain and instance in the
+        cache directory, defaults to a key computed from the model
+        '''
+        path = self.path = None
+        if cache_dir is not None:
+            if cache_key is None:
+                cache_key = RDDLCodeGenerator.model_key(self.rddl)
+            
+            # the folded, shared and sparse subexpressions, the alias tables, 
+            # the narrow dtypes, the keyed random streams, the checks and the 
+            # timing of the CPFs are referenced by the generated code
+            folded = repr(sorted(self.sim.folded.keys()))
+            shared = repr(sorted(self.sim.shared.items()))
+            sparse = repr(sorted(self.sim.sparse_aggregations.keys()))
+            alias = repr(sorted(self.sim.alias_tables.keys()))
+            dtypes = repr(sorted((var, np.dtype(dtype).name)
+                                 for (var, dtype) in self.sim.dtypes.items()))
+            keyed = repr(self.sim.keyed_rng)
+            validate = repr(self.validate)
+            profile = repr(self.profile)
+            cache_key = RDDLCodeGenerator.hash_key(
+                cache_key, folded, shared, sparse, alias, dtypes, keyed, validate,
+                profile)
+            path = self.path = os.path.join(cache_dir, f'rddl_{cache_key}.py')
+            if os.path.isfile(path):
+                with open(path, 'r') as file:
+                    return file.read()
+
+        source = self._generate()
+        if self.logger is not None:
+            def _message():
+                return f'[info] generated source code:\n{source}\n'
+            self.logger.log(_message, Logger.DEBUG)
+
+        # write to temporary file first in case of concurrent writes
+        if path is not None:
+            os.makedirs(cache_dir, exist_ok=True)
+            temp_path = f'{path}.{os.getpid()}.tmp'
+            with open(temp_path, 'w') as file:
+                file.write(source)
+            os.replace(temp_path, path)
+        return source
+
+    # ===========================================================================
+    # module and function structure
+    # ===========================================================================
+
+    def _generate(self):
+        rddl = self.rddl
+        self._preamble = []
+        self._bound = set()
+        self._lines = []
+        self._indent = 0
+
+        # function that samples all CPFs in order
+        self._begin_function('cpfs')
+        for (i, (cpf, expr, _)) in enumerate(self.sim.cpfs):
+            self._emit(f'# {cpf}')
+            if self.profile:
+                clock = self._bind('_clock', 'time.perf_counter')
+                self._emit(f'_start = {clock}()')
+            result = self._generate_expr(expr)
+            if self.validate:
+                dtype = self._bind(f'_dtype{expr.id}', f'sim.cpfs[{i}][2]')
+                self._emit(f'_check_type({result}, {dtype}, '
+                           f'{cpf!r}, {self._ref(expr)})')
+            if cpf in self.sim.dtypes:
+                narrow = self._bind(f'_narrow{expr.id}', f'sim.dtypes[{cpf!r}]')
+                self._emit(f'{result} = _cast({result}, {narrow})')
+            self._emit(f'subs[{cpf!r}] = {result}')
+            if self.profile:
+                times = self._bind('_times', 'sim.profiler.times')
+                calls = self._bind('_calls', 'sim.profiler.calls')
+                self._emit(f'{times}[{expr.id}] += {clock}() - _start')
+                self._emit(f'{calls}[{expr.id}] += 1')
+        self._emit('return subs')
+        self._end_function()
+
+        # functions that sample the other root expressions
+        roots = [rddl.reward] + list(rddl.invariants) + \
+            list(rddl.preconditions) + list(rddl.terminations)
+        for expr in roots:
+            self._begin_function(f'root_{expr.id}')
+            self._emit(f'return {self._generate_expr(expr)}')
+            self._end_function()
+        root_names = ', '.join(f'{expr.id}: root_{expr.id}' for expr in roots)
+        self._indent = 1
+        self._emit(f'return cpfs, {{{root_names}}}')
+
+        header = MODULE_HEADER.format(domain=rddl.domain_name,
+                                      instance=rddl.instance_name)
+        preamble = ''.join(f'    {line}\n' for line in self._preamble)
+        body = '\n'.join(self._lines)
+        return f'{header}{preamble}\n{body}\n'
+
+    def _begin_function(self, name):
+        self._indent = 1
+        self._emit(f'def {name}(subs):')
+        self._indent = 2
+        self._emit('rng = sim.rng')
+
+    def _end_function(self):
+        self._lines.append('')
+
+    def _emit(self, line):
+        self._lines.append('    ' * self._indent + line)
+
+    def _emit_check(self, line):
+        if self.validate:
+            self._emit(line)
+
+    def _bind(self, name, value):
+        if name not in self._bound:
+            self._bound.add(name)
+            self._preamble.append(f'{name} = {value}')
+        return name
+
+    def _ref(self, expr):
+        return self._bind(f'_e{expr.id}', f'traced.lookup({expr.id})')
+
+    def _info(self, expr, index=''):
+        info = self._bind(f'_i{expr.id}',
+                          f'traced.cached_sim_info({self._ref(expr)})')
+        if index:
+            name = index.replace('][', '_')
+            info = self._bind(f'_i{expr.id}_{name}', f'{info}[{index}]')
+        return info
+
+    def _delegate(self, method_name, expr, **kwargs):
+        method = self._bind(f'_m{expr.id}', f'sim.{method_name}')
+        args = ''.join(f', {key}={value!r}' for (key, value) in kwargs.items())
+        result = f't{expr.id}'
+        self._emit(f'{result} = {method}({self._ref(expr)}, subs{args})')
+        return result
+
+    def _delegate_random(self, method_name, expr, **kwargs):
+        if not self.sim.keyed_rng:
+            return self._delegate(method_name, expr, **kwargs)
+        method = self._bind(f'_m{expr.id}',
+                            f'sim._keyed_sampler(sim.{method_name})')
+        args = ''.join(f', {key}={value!r}' for (key, value) in kwargs.items())
+        result = f't{expr.id}'
+        self._emit(f'{result} = {method}({self._ref(expr)}, subs{args})')
+        return result
+
+    def _emit_keyed_rng(self, expr):
+        # the arguments are sampled first, so the stream of the expression
+        # can be selected right before its draws
+        if self.sim.keyed_rng:
+            self._emit(f'rng = _keyed_rng({expr.id})')
+
+    def _is_simple(self, expr):
+        return expr.is_constant_expression() or expr.is_pvariable_expression()
+
+    # ===========================================================================
+    # expressions
+    # ===========================================================================
+
+    def _generate_expr(self, expr: Expression) -> str:
+        if expr.id in self.sim.folded:
+            return self._bind(f'_f{expr.id}', f'sim.folded[{expr.id}]')
+        shared_id = self.sim.shared.get(expr.id, None)
+        if shared_id is not None:
+            return self._generate_shared(expr, shared_id)
+        return self._generate_node(expr)
+
+    def _generate_node(self, expr):
+        etype, _ = expr.etype
+        if etype == 'constant':
+            return self._generate_constant(expr)
+        elif etype == 'pvar':
+            return self._generate_pvar(expr)
+        elif etype == 'arithmetic':
+            return self._generate_arithmetic(expr)
+        elif etype == 'relational':
+            return self._generate_relational(expr)
+        elif etype == 'boolean':
+            return self._generate_logical(expr)
+        elif etype == 'aggregation':
+            return self._generate_aggregation(expr)
+        elif etype == 'func':
+            return self._generate_func(expr)
+        elif etype == 'control':
+            return self._generate_control(expr)
+        elif etype == 'randomvar':
+            return self._generate_random(expr)
+        elif etype == 'randomvector':
+            return self._delegate_random('_sample_random_vector', expr)
+        elif etype == 'matrix':
+            return self._delegate('_sample_matrix', expr)
+        else:
+            return self._delegate('_sample', expr)
+
+    def _generate_shared(self, expr, shared_id):
+        shared = self._bind('_shared', 'sim._shared_values')
+        result = f's{expr.id}'
+        self._emit(f'{result} = {shared}.get({shared_id}, None)')
+        self._emit(f'if {result} is None:')
+        self._indent += 1
+        value = self._generate_node(expr)
+        self._emit(f'{result} = {shared}[{shared_id}] = {value}')
+        self._indent -= 1
+        return result
+
+    # ===========================================================================
+    # leaves
+    # ===========================================================================
+
+    def _generate_constant(self, expr):
+        return self._info(expr)
+
+    def _generate_pvar(self, expr):
+        var, args = expr.args
+        result = f't{expr.id}'
+
+        # free variable (e.g., ?x) and object converted to canonical index
+        is_value, cached_info = self.traced.cached_sim_info(expr)
+        if is_value:
+            return self._info(expr, '1')
+
+        # extract variable value
+        self._emit(f'{result} = subs.get({var!r}, None)')
+        self._emit(f'if {result} is None:')
+        self._emit(f'    _undefined({var!r}, {self._ref(expr)})')
+        if var in self.sim._widen:
+            widen = self._bind(f'_widen{expr.id}', f'sim._widen[{var!r}]')
+            self._emit(f'{result} = _cast({result}, {widen})')
+        if cached_info is None:
+            return result
+
+        # slice and/or reshape value tensor
+        slices, axis, _, op_code, _ = cached_info
+        if slices:
+            if op_code == RDDLObjectsTracer.NUMPY_OP_CODE.NESTED_SLICE:
+                offset = len(slices) - len(args)
+                runtime_slices = []
+                for (i, _slice) in enumerate(slices):
+                    if _slice is None:
+                        arg = self._generate_expr(args[i - offset])
+                        runtime_slices.append(arg)
+                    else:
+                        runtime_slices.append(self._info(expr, f'1][0][{i}'))
+                runtime_slices = ', '.join(runtime_slices)
+                self._emit(f'{result} = {result}[({runtime_slices},)]')
+            else:
+                self._emit(f'{result} = {result}[{self._info(expr, "1][0")}]')
+        if axis:
+            self._emit(f'{result} = np.broadcast_to(np.expand_dims('
+                       f'{result}, axis={self._info(expr, "1][1")}), '
+                       f'shape={self._info(expr, "1][2")})')
+        if op_code == RDDLObjectsTracer.NUMPY_OP_CODE.EINSUM:
+            self._emit(f'{result} = np.einsum('
+                       f'{result}, *{self._info(expr, "1][4")})')
+        elif op_code == RDDLObjectsTracer.NUMPY_OP_CODE.TRANSPOSE:
+            self._emit(f'{result} = np.transpose('
+                       f'{result}, axes={self._info(expr, "1][4")})')
+        return result
+
+    # ===========================================================================
+    # arithmetic
+    # ===========================================================================
+
+    def _generate_arithmetic(self, expr):
+        _, op = expr.etype
+        args = expr.args
+        n = len(args)
+        result = f't{expr.id}'
+        if op not in self.sim.ARITHMETIC_OPS:
+            return self._delegate('_sample_arithmetic', expr)
+        numpy_op = self._bind(f'_op{expr.id}', f'sim.ARITHMETIC_OPS[{op!r}]')
+
+        # unary negation
+        if n == 1 and op == '-':
+            arg = self._generate_expr(args[0])
+            self._emit(f'{result} = -1 * {arg}')
+            return result
+
+        # binary operator: for * try to short-circuit if possible
+        elif n == 2:
+            lhs, rhs = args
+            if op == '*':
+                if self._is_simple(rhs):
+                    lhs, rhs = rhs, lhs
+                lhs = self._generate_expr(lhs)
+                self._emit(f'{result} = 1 * {lhs}')
+                self._emit(f'if np.any({result}):')
+                self._indent += 1
+                rhs = self._generate_expr(rhs)
+                self._emit(f'{result} = {result} * {rhs}')
+                self._indent -= 1
+            else:
+                lhs = self._generate_expr(lhs)
+                rhs = self._generate_expr(rhs)
+                self._emit(f'{lhs}_, {rhs}_ = 1 * {lhs}, 1 * {rhs}')
+                self._emit('try:')
+                self._emit(f'    {result} = {numpy_op}({lhs}_, {rhs}_)')
+                self._emit('except:')
+                self._emit(f'    _arithmetic_error({op!r}, {lhs}_, {rhs}_, '
+                           f'{self._ref(expr)})')
+            return result
+
+        # for a grounded domain can short-circuit * and +
+        elif n > 0 and not self.traced.cached_objects_in_scope(expr):
+            if op == '*':
+                ordered = [arg for arg in args if self._is_simple(arg)] + \
+                          [arg for arg in args if not self._is_simple(arg)]
+                self._emit(f'{result} = 1')
+                for (i, arg) in enumerate(ordered):
+                    if i > 0:
+                        self._emit(f'if not ({result} == 0):')
+                        self._indent += 1
+                    arg = self._generate_expr(arg)
+                    self._emit(f'{result} = {result} * {arg}')
+                    if i > 0:
+                        self._indent -= 1
+                return result
+            elif op == '+':
+                terms = [self._generate_expr(arg) for arg in args]
+                terms = ', '.join(f'1 * {term}' for term in terms)
+                self._emit(f'{result} = sum(({terms},))')
+                return result
+
+        return self._delegate('_sample_arithmetic', expr)
+
+    # ===========================================================================
+    # boolean
+    # ===========================================================================
+
+    def _generate_relational(self, expr):
+        _, op = expr.etype
+        args = expr.args
+        result = f't{expr.id}'
+        if op not in self.sim.RELATIONAL_OPS or len(args) != 2:
+            return self._delegate('_sample_relational', expr)
+        numpy_op = self._bind(f'_op{expr.id}', f'sim.RELATIONAL_OPS[{op!r}]')
+
+        lhs, rhs = args
+        lhs = self._generate_expr(lhs)
+        rhs = self._generate_expr(rhs)
+        self._emit(f'{result} = {numpy_op}(1 * {lhs}, 1 * {rhs})')
+        return result
+
+    def _generate_logical(self, expr):
+        _, op = expr.etype
+        if op == '&':
+            op = '^'
+        args = expr.args
+        n = len(args)
+        result = f't{expr.id}'
+        ref = self._ref(expr)
+        if op not in self.sim.LOGICAL_OPS:
+            return self._delegate('_sample_logical', expr)
+        numpy_op = self._bind(f'_op{expr.id}', f'sim.LOGICAL_OPS[{op!r}]')
+
+        if n == 1 and op == '~':
+            arg = self._generate_expr(args[0])
+            self._emit_check(f"_check_type({arg}, bool, {op!r}, {ref}, arg='')")
+            self._emit(f'{result} = np.logical_not({arg})')
+            return result
+
+        # try to short-circuit ^ and | if possible
+        elif n == 2:
+            lhs, rhs = args
+            if op == '^' or op == '|':
+                if self._is_simple(rhs):
+                    lhs, rhs = rhs, lhs
+                lhs = self._generate_expr(lhs)
+                self._emit_check(f'_check_type({lhs}, bool, {op!r}, {ref}, arg=1)')
+                self._emit(f'{result} = {lhs}')
+                if op == '^':
+                    self._emit(f'if np.any({result}):')
+                else:
+                    self._emit(f'if not np.all({result}):')
+                self._indent += 1
+                rhs = self._generate_expr(rhs)
+                self._emit_check(f'_check_type({rhs}, bool, {op!r}, {ref}, arg=2)')
+                self._emit(f'{result} = {numpy_op}({lhs}, {rhs})')
+                self._indent -= 1
+            else:
+                lhs = self._generate_expr(lhs)
+                rhs = self._generate_expr(rhs)
+                self._emit_check(f'_check_type({lhs}, bool, {op!r}, {ref}, arg=1)')
+                self._emit_check(f'_check_type({rhs}, bool, {op!r}, {ref}, arg=2)')
+                self._emit(f'{result} = {numpy_op}({lhs}, {rhs})')
+            return result
+
+        # for a grounded domain, we can short-circuit ^ and |
+        elif n > 0 and (op == '^' or op == '|') \
+        and not self.traced.cached_objects_in_scope(expr):
+            use_and = op == '^'
+            ordered = [(i, arg) for (i, arg) in enumerate(args)
+                       if self._is_simple(arg)] + \
+                      [(i, arg) for (i, arg) in enumerate(args)
+                       if not self._is_simple(arg)]
+            self._emit(f'{result} = {use_and}')
+            for (k, (i, arg)) in enumerate(ordered):
+                if k > 0:
+                    self._emit(f'if {result} is {use_and}:')
+                    self._indent += 1
+                arg = self._generate_expr(arg)
+                self._emit_check(f'_check_type({arg}, bool, {op!r}, {ref}, arg={i + 1})')
+                if use_and:
+                    self._emit(f'if not bool({arg}):')
+                else:
+                    self._emit(f'if bool({arg}):')
+                self._emit(f'    {result} = {not use_and}')
+                if k > 0:
+                    self._indent -= 1
+            return result
+
+        return self._delegate('_sample_logical', expr)
+
+    # ===========================================================================
+    # aggregation
+    # ===========================================================================
+
+    def _generate_aggregation(self, expr):
+        _, op = expr.etype
+        result = f't{expr.id}'
+        if expr.id in self.sim.sparse_aggregations:
+            sparse = self._bind(f'_sp{expr.id}',
+                                f'sim.sparse_aggregations[{expr.id}].sample')
+            self._emit(f'{result} = {sparse}(subs)')
+            return result
+        if op not in self.sim.AGGREGATION_OPS:
+            return self._delegate('_sample_aggregation', expr)
+        numpy_op = self._bind(f'_op{expr.id}', f'sim.AGGREGATION_OPS[{op!r}]')
+        axes = self._info(expr, '1')
+
+        * _, arg = expr.args
+        arg = self._generate_expr(arg)
+        if op in self.sim.AGGREGATION_BOOL:
+            self._emit_check(f"_check_type({arg}, bool, {op!r}, {self._ref(expr)}, arg='')")
+            self._emit(f'{result} = {numpy_op}({arg}, axis={axes})')
+        else:
+            self._emit(f'{result} = {numpy_op}(1 * {arg}, axis={axes})')
+        return result
+
+    # ===========================================================================
+    # function
+    # ===========================================================================
+
+    def _generate_func(self, expr):
+        _, name = expr.etype
+        args = expr.args
+        result = f't{expr.id}'
+        ref = self._ref(expr)
+
+        # unary function
+        if name in self.sim.UNARY:
+            if len(args) != 1:
+                return self._delegate('_sample_func', expr)
+            unary_op = self._bind(f'_op{expr.id}', f'sim.UNARY[{name!r}]')
+            arg = self._generate_expr(args[0])
+            self._emit(f'{arg}_ = 1 * {arg}')
+            self._emit('try:')
+            self._emit(f'    {result} = {unary_op}({arg}_)')
+            self._emit('except:')
+            self._emit(f'    _unary_error({name!r}, {arg}_, {ref})')
+            return result
+
+        # binary function
+        if name in self.sim.BINARY and len(args) == 2:
+            binary_op = self._bind(f'_op{expr.id}', f'sim.BINARY[{name!r}]')
+            lhs, rhs = args
+            lhs = self._generate_expr(lhs)
+            rhs = self._generate_expr(rhs)
+            self._emit(f'{lhs}_, {rhs}_ = 1 * {lhs}, 1 * {rhs}')
+            if name in self.sim.BINARY_REQUIRES_INT:
+                self._emit_check(f'_check_type({lhs}_, INT, {name!r}, {ref}, arg=1)')
+                self._emit_check(f'_check_type({rhs}_, INT, {name!r}, {ref}, arg=2)')
+            self._emit('try:')
+            self._emit(f'    {result} = {binary_op}({lhs}_, {rhs}_)')
+            self._emit('except:')
+            self._emit(f'    _binary_error({name!r}, {lhs}_, {rhs}_, {ref})')
+            return result
+
+        return self._delegate('_sample_func', expr)
+
+    # ===========================================================================
+    # control flow
+    # ===========================================================================
+
+    def _generate_control(self, expr):
+        _, op = expr.etype
+        args = expr.args
+        result = f't{expr.id}'
+        if op != 'if' or len(args) != 3:
+            return self._delegate('_sample_control', expr)
+
+        # each branch is evaluated only when required by the predicate
+        pred, arg1, arg2 = args
+        pred = self._generate_expr(pred)
+        self._emit_check(f"_check_type({pred}, bool, 'If predicate', {self._ref(expr)})")
+        self._emit(f'{result}_first = bool({pred}.flat[0] '
+                   f'if np.ndim({pred}) else {pred})')
+        self._emit(f'{result}_all = np.all({pred} == {result}_first)')
+        self._emit(f'if {result}_first or not {result}_all:')
+        self._indent += 1
+        arg1 = self._generate_expr(arg1)
+        self._emit(f'{result} = {arg1}')
+        self._indent -= 1
+        self._emit(f'if not {result}_first or not {result}_all:')
+        self._indent += 1
+        arg2 = self._generate_expr(arg2)
+        self._emit(f'{result} = {arg2}')
+        self._indent -= 1
+        self._emit(f'if not {result}_all:')
+        self._emit(f'    {result} = np.where({pred}, {arg1}, {arg2})')
+        return result
+
+    # ===========================================================================
+    # random variables
+    # ===========================================================================
+
+    def _generate_random(self, expr):
+        _, name = expr.etype
+        if name not in RDDLCodeGenerator.INLINE_RANDOM:
+            sampler = RDDLClosureCompiler.RANDOM_SAMPLERS.get(name, None)
+            if sampler is None:
+                return self._delegate_random('_sample_random', expr)
+            method_name, kwargs = sampler
+            return self._delegate_random(method_name, expr, **kwargs)
+
+        # discrete distributions with enum support
+        args = expr.args
+        result = f't{expr.id}'
+        ref = self._ref(expr)
+        if expr.id in self.sim.alias_tables:
+            table = self._bind(f'_alias{expr.id}', f'sim.alias_tables[{expr.id}]')
+            self._emit_keyed_rng(expr)
+            self._emit(f'{result} = {table}.sample(rng)')
+            return result
+        elif name == 'Discrete' or name == 'UnnormDiscrete':
+            unnorm = name == 'UnnormDiscrete'
+            sorted_args = self.traced.cached_sim_info(expr)
+            samples = [self._generate_expr(arg) for arg in sorted_args]
+            samples = ', '.join(samples)
+            self._emit_keyed_rng(expr)
+            self._emit(f'{result} = _discrete('
+                       f'np.stack(({samples},), axis=-1), {unnorm}, {ref}, rng)')
+            return result
+        elif name == 'Discrete(p)' or name == 'UnnormDiscrete(p)':
+            unnorm = name == 'UnnormDiscrete(p)'
+            _, (arg,) = args
+            pdf = self._generate_expr(arg)
+            self._emit_keyed_rng(expr)
+            self._emit(f'{result} = _discrete({pdf}, {unnorm}, {ref}, rng)')
+            return result
+
+        # other distributions with arity check done by the simulator
+        arity = 1 if name in {'KronDelta', 'DiracDelta', 'Bernoulli',
+                              'Poisson', 'Exponential'} else 2
+        if len(args) != arity:
+            return self._delegate_random('_sample_random', expr)
+        samples = [self._generate_expr(arg) for arg in args]
+        if name not in ('KronDelta', 'DiracDelta'):
+            self._emit_keyed_rng(expr)
+
+        if name == 'KronDelta':
+            arg, = samples
+            self._emit_check(f"_check_types({arg}, (bool, INT), "
+                             f"'Argument of KronDelta', {ref})")
+            self._emit(f'{result} = {arg}')
+        elif name == 'DiracDelta':
+            arg, = samples
+            self._emit_check(f"_check_type({arg}, REAL, 'Argument of DiracDelta', {ref})")
+            self._emit(f'{result} = {arg}')
+        elif name == 'Uniform':
+            lb, ub = samples
+            self._emit_check(f"_check_bounds({lb}, {ub}, 'Uniform', {ref})")
+            self._emit(f'{result} = rng.uniform(low={lb}, high={ub})')
+        elif name == 'Bernoulli':
+            pr, = samples
+            self._emit_check(f"_check_range({pr}, 0, 1, 'Bernoulli p', {ref})")
+            self._emit(f'{result} = rng.uniform(size=np.shape({pr}) '
+                       f'if np.ndim({pr}) else None) <= {pr}')
+        elif name == 'Normal':
+            mean, var = samples
+            self._emit_check(f"_check_positive({var}, False, 'Normal variance', {ref})")
+            self._emit(f'{result} = rng.normal(loc={mean}, scale=np.sqrt({var}))')
+        elif name == 'Poisson':
+            rate, = samples
+            self._emit_check(f"_check_positive({rate}, False, 'Poisson rate', {ref})")
+            self._emit(f'{result} = rng.poisson(lam={rate})')
+        elif name == 'Exponential':
+            scale, = samples
+            self._emit_check(f"_check_positive({scale}, True, 'Exponential rate', {ref})")
+            self._emit(f'{result} = rng.exponential(scale={scale})')
+        elif name == 'Gamma':
+            shape, scale = samples
+            self._emit_check(f"_check_positive({shape}, True, 'Gamma shape', {ref})")
+            self._emit_check(f"_check_positive({scale}, True, 'Gamma scale', {ref})")
+            self._emit(f'{result} = rng.gamma(shape={shape}, scale={scale})')
+        elif name == 'Binomial':
+            count, pr = samples
+            self._emit_check(f"_check_type({count}, INT, 'Binomial count', {ref})")
+            self._emit_check(f"_check_positive({count}, False, 'Binomial count', {ref})")
+            self._emit_check(f"_check_range({pr}, 0, 1, 'Binomial p', {ref})")
+            self._emit(f'{result} = rng.binomial(n={count}, p={pr})')
+        elif name == 'Beta':
+            shape, rate = samples
+            self._emit_check(f"_check_positive({shape}, True, 'Beta shape', {ref})")
+            self._emit_check(f"_check_positive({rate}, True, 'Beta rate', {ref})")
+            self._emit(f'{result} = rng.beta(a={shape}, b={rate})')
+        return result
@@ -0,0 +1,64 @@
+from collections.abc import Mapping
+import numpy as np
+from typing import Any, Dict, Iterable, Iterator, Tuple
+
+from pyRDDLGym.core.compiler.model import RDDLPlanningModel
+
+GroundingTable = Dict[str, Tuple[str, int]]
+
+
+class RDDLGroundedView(Mapping):
+    '''A read-only dictionary of grounded fluent names to values, that is a
+    view over the tensors of the lifted fluents.
+
+    Grounded names are mapped to their lifted fluent and flat index in its
+    tensor by a table that is computed once, so creating the view takes
+    constant time, and a value is only read from its tensor when it is
+    accessed. The view behaves like the dictionary returned by
+    RDDLPlanningModel.ground_vars_with_values(), and dict(view) creates that
+    dictionary.
+    '''
+
+    __slots__ = ('_values', '_table')
+
+    def __init__(self, values: Dict[str, Any], table: GroundingTable) -> None:
+        '''Creates a new view over the given tensors.
+
+        :param values: dictionary mapping each lifted fluent to its tensor,
+        which are read when values are accessed (and not copied)
+        :param table: dictionary mapping each grounded name to its lifted
+        fluent and flat index, as computed by RDDLGroundedView.table()
+        '''
+        self._values = values
+        self._table = table
+
+    @staticmethod
+    def table(rddl: RDDLPlanningModel, variables: Iterable[str]) -> GroundingTable:
+        '''Returns the table mapping the grounded names of the given lifted
+        fluents to their lifted fluent and flat index, in grounding order.'''
+        table = {}
+        for var in variables:
+            for (index, name) in enumerate(rddl.variable_groundings[var]):
+                table[name] = (var, index)
+        return table
+
+    def __getitem__(self, name: str) -> Any:
+        var, index = self._table[name]
+        return np.ravel(self._values[var])[index]
+
+    def __contains__(self, name: object) -> bool:
+        return name in self._table
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self._table)
+
+    def __len__(self) -> int:
+        return len(self._table)
+
+    def copy(self) -> 'RDDLGroundedView':
+        '''Returns a view over the same tensors, that is not affected by
+        tensors that are later replaced in this view.'''
+        return RDDLGroundedView(dict(self._values), self._table)
+
+    def __repr__(self) -> str:
+        return repr(dict(self))
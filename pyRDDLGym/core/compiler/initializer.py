@@ -2,6 +2,7 @@ import numpy as np
 from typing import Dict, Optional, Union
 
 from pyRDDLGym.core.compiler.model import RDDLPlanningModel
+from pyRDDLGym.core.compiler.sparse import RDDLSparseTensor
 from pyRDDLGym.core.debug.exception import (
     RDDLInvalidObjectError,
     RDDLTypeError
@@ -28,9 +29,14 @@ class RDDLValueInitializer:
         'real': 0.0,
         'bool': False
     }
+    
+    # the largest fraction of nonzero elements of a sparse non-fluent
+    SPARSE_MAX_DENSITY = 0.1
         
     def __init__(self, rddl: RDDLPlanningModel, 
-                 logger: Optional[Logger]=None) -> None:
+                 logger: Optional[Logger]=None,
+                 sparse_threshold: Optional[int]=None,
+                 dtypes: Optional[Dict[str, type]]=None) -> None:
         '''Creates a new object to compile initial values from a RDDL file. 
         Initial values of parameterized variables are stored in numpy arrays.
         For a variable var(?x1, ?x2, ... ?xn), the numpy array has n dimensions, 
@@ -39,9 +45,19 @@ class RDDLValueInitializer:
         
         :param rddl: the RDDL file whose initial values to extract
         :param logger: to log information about initial values to file
+        :param sparse_threshold: if specified, parameterized non-fluents with 
+        zero default value and at least this many elements, of which at most a 
+        fraction SPARSE_MAX_DENSITY are nonzero, are stored as RDDLSparseTensor
+        :param dtypes: optional dictionary mapping pvariables to the (narrower)
+        dtypes of their tensors, which override the default dtypes of their 
+        ranges (see RDDLMemoryAnalysis)
         '''
         self.rddl = rddl
         self.logger = logger
+        self.sparse_threshold = sparse_threshold
+        if dtypes is None:
+            dtypes = {}
+        self.dtypes = dtypes
     
     def initialize(self) -> Dict[str, Union[np.ndarray, np.integer, np.floating, bool]]:
         '''Compiles all initial values of all variables for the current RDDL file.
@@ -85,7 +101,9 @@ class RDDLValueInitializer:
             if ptypes:
                 shape = rddl.object_counts(ptypes)     
                 values = init_values.get(var, None)           
-                if values is None:
+                if self._is_sparse(var, shape, values, default):
+                    values = RDDLSparseTensor.from_values(values, shape, dtype)
+                elif values is None:
                     values = np.full(shape=shape, fill_value=default, dtype=dtype)
                 else:
                     values = np.reshape(
@@ -108,24 +126,66 @@ class RDDLValueInitializer:
                         f'Initial value {values} for variable <{var}> '
                         f'cannot be cast to required type <{prange}>.')
                 values = dtype(values)         
-                       
+            
+            # store in a narrower type if requested
+            narrow = self.dtypes.get(var, None)
+            if narrow is not None:
+                values = self.cast(values, narrow)
+                
             np_init_values[var] = values
         
         # log shapes of initial values
         if self.logger is not None:
-            tensor_info = '\n\t'.join((
-                f'{k}{rddl.variable_params[k]}, '
-                f'shape={v.shape if type(v) is np.ndarray else ()}, '
-                f'dtype={v.dtype if type(v) is np.ndarray else type(v).__name__}'
-            ) for (k, v) in np_init_values.items())
-            message = (
-                f'[info] initializing pvariable tensors:' 
-                f'\n\t{tensor_info}\n'
-            )
-            self.logger.log(message)
+            def _message():
+                tensor_info = '\n\t'.join((
+                    f'{k}{rddl.variable_params[k]}, '
+                    f'shape={v.shape if type(v) in (np.ndarray, RDDLSparseTensor) else ()}, '
+                    f'dtype={v.dtype if type(v) in (np.ndarray, RDDLSparseTensor) else type(v).__name__}'
+                    + (f', nnz={v.nnz}' if type(v) is RDDLSparseTensor else '')
+                    + f', nbytes={self.nbytes(v)}'
+                ) for (k, v) in np_init_values.items())
+                total = sum(self.nbytes(v) for v in np_init_values.values())
+                return (
+                    f'[info] initializing pvariable tensors:' 
+                    f'\n\t{tensor_info}'
+                    f'\n\ttotal nbytes={total}\n'
+                )
+            self.logger.log(_message, Logger.DEBUG)
         
         return np_init_values
     
+    @staticmethod
+    def nbytes(values) -> int:
+        '''Returns the number of bytes used by the given initial values.'''
+        if type(values) in (np.ndarray, RDDLSparseTensor):
+            return int(values.nbytes)
+        return int(np.asarray(values).nbytes)
+    
+    @staticmethod
+    def cast(values, dtype):
+        '''Casts the given initial values or sample of a fluent to the given
+        dtype, preserving whether it is a scalar, tensor or sparse tensor.'''
+        if type(values) is RDDLSparseTensor:
+            return RDDLSparseTensor(
+                values.shape, values.coords, values.values.astype(dtype))
+        elif type(values) is np.ndarray:
+            return values.astype(dtype)
+        else:
+            return np.dtype(dtype).type(values)
+    
+    def _is_sparse(self, var, shape, values, default):
+        rddl = self.rddl
+        if self.sparse_threshold is None \
+        or rddl.variable_types[var] != 'non-fluent' \
+        or rddl.variable_ranges[var] in rddl.enum_types \
+        or default != 0 or values is None:
+            return False
+        size = int(np.prod(shape, dtype=np.int64))
+        if size < self.sparse_threshold:
+            return False
+        nnz = sum(1 for value in values if value)
+        return nnz <= RDDLValueInitializer.SPARSE_MAX_DENSITY * size
+    
     def _objects_to_ints(self, literals, prange, var):
         is_scalar = isinstance(literals, str)
         if is_scalar:
@@ -216,16 +216,18 @@ class RDDLLevelAnalysis:
         
         # log dependency graph information to file
         if self.logger is not None: 
-            graph_info = '\n\t'.join(f"{rddl.variable_types[k]} {k}: "
-                                     f"{{{', '.join(v)}}}"
-                                     for (k, v) in graph.items())
-            self.logger.log(f'[info] computed fluent dependencies in CPFs:\n' 
-                            f'\t{graph_info}\n')
+            def _graph_message():
+                graph_info = '\n\t'.join(f"{rddl.variable_types[k]} {k}: "
+                                          f"{{{', '.join(v)}}}"
+                                          for (k, v) in graph.items())
+                return f'[info] computed fluent dependencies in CPFs:\n\t{graph_info}\n'
+            self.logger.log(_graph_message, Logger.DEBUG)
             
-            levels_info = '\n\t'.join(f"{k}: {{{', '.join(v)}}}"
-                                      for (k, v) in result.items())
-            self.logger.log(f'[info] computed order of CPF evaluation:\n' 
-                            f'\t{levels_info}\n')
+            def _levels_message():
+                levels_info = '\n\t'.join(f"{k}: {{{', '.join(v)}}}"
+                                           for (k, v) in result.items())
+                return f'[info] computed order of CPF evaluation:\n\t{levels_info}\n'
+            self.logger.log(_levels_message, Logger.DEBUG)
         
         return result
     
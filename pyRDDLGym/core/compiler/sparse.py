@@ -0,0 +1,297 @@
+import numpy as np
+from typing import Any, Dict, List, Optional, Sequence, Set, Tuple
+
+from pyRDDLGym.core.compiler.model import RDDLPlanningModel
+from pyRDDLGym.core.debug.exception import (
+    print_stack_trace,
+    RDDLTypeError,
+    RDDLUndefinedVariableError
+)
+from pyRDDLGym.core.parser.expr import Expression
+
+
+class RDDLSparseTensor:
+    '''A tensor in coordinate (COO) format that stores only its nonzero
+    elements, whose other elements are all zero (or False).
+    '''
+
+    def __init__(self, shape: Tuple[int, ...], coords: Tuple[np.ndarray, ...],
+                 values: np.ndarray) -> None:
+        '''Creates a new sparse tensor.
+
+        :param shape: the shape of the dense tensor
+        :param coords: a tuple of integer arrays, holding the index of each
+        nonzero element along each axis
+        :param values: the values of the nonzero elements
+        '''
+        self.shape = tuple(shape)
+        self.coords = coords
+        self.values = values
+
+    @staticmethod
+    def from_values(values: Sequence[Any], shape: Tuple[int, ...],
+                    dtype: type) -> 'RDDLSparseTensor':
+        '''Creates a sparse tensor from the flat list of values of a tensor in
+        row-major order, where None stands for zero, without creating the
+        dense tensor.'''
+        indices = [i for (i, value) in enumerate(values) if value]
+        coords = np.unravel_index(np.asarray(indices, dtype=np.int64), shape)
+        values = np.asarray([values[i] for i in indices], dtype=dtype)
+        return RDDLSparseTensor(shape, coords, values)
+
+    @property
+    def dtype(self):
+        return self.values.dtype
+
+    @property
+    def ndim(self) -> int:
+        return len(self.shape)
+
+    @property
+    def size(self) -> int:
+        return int(np.prod(self.shape, dtype=np.int64))
+
+    @property
+    def nnz(self) -> int:
+        return self.values.size
+
+    @property
+    def nbytes(self) -> int:
+        return self.values.nbytes + sum(coord.nbytes for coord in self.coords)
+
+    def toarray(self) -> np.ndarray:
+        '''Returns the dense tensor.'''
+        dense = np.zeros(self.shape, dtype=self.dtype)
+        dense[self.coords] = self.values
+        return dense
+
+    def __repr__(self) -> str:
+        return (f'RDDLSparseTensor(shape={self.shape}, dtype={self.dtype}, '
+                f'nnz={self.nnz})')
+
+
+class RDDLSparseAggregation:
+    '''Samples an aggregation sum, avg or exists whose argument is a product
+    (or conjunction) of a sparse non-fluent with other pvariables, by only
+    evaluating the product at the nonzero elements of the sparse non-fluent.
+
+    The other factors are gathered from their tensors at the coordinates of
+    the nonzero elements, and the products are scattered into the result, so
+    no tensor of the size of the aggregation scope is ever created.
+    '''
+
+    def __init__(self, expr: Expression, op: str, chain_op: str,
+                 var: str, tensor: RDDLSparseTensor, scope_coords: List[np.ndarray],
+                 out_shape: Tuple[int, ...], out_axes: List[int],
+                 count: int, factors: List[Tuple[Any, ...]],
+                 widen: Optional[Dict[str, type]]=None) -> None:
+        if widen is None:
+            widen = {}
+        self.expr = expr
+        self.op = op
+        self.chain_op = chain_op
+        self.values = tensor.values
+        self.dtype = widen.get(var, None)
+        self.out_shape = out_shape
+        self.size = int(np.prod(out_shape, dtype=np.int64))
+        self.count = count
+        if out_axes:
+            self.out_index = np.ravel_multi_index(
+                tuple(scope_coords[axis] for axis in out_axes), out_shape)
+        else:
+            self.out_index = None
+
+        # the index of each factor into its own tensor
+        self.factors = []
+        for (kind, value, axes, factor_expr) in factors:
+            if kind == 'pvar':
+                index = tuple(scope_coords[axis] for axis in axes)
+                self.factors.append(
+                    (value, index, factor_expr, widen.get(value, None)))
+            else:
+                self.factors.append((None, value, factor_expr, None))
+
+    def sample(self, subs: Dict[str, Any]) -> Any:
+        '''Samples the aggregation given the current fluent values.'''
+        product = self.values
+        if self.dtype is not None:
+            product = product.astype(self.dtype)
+        conjunction = self.chain_op == '^'
+        if conjunction:
+            product = product.astype(bool)
+        for (var, index, expr, dtype) in self.factors:
+            if var is None:
+                value = index
+            else:
+                value = subs.get(var, None)
+                if value is None:
+                    raise RDDLUndefinedVariableError(
+                        f'Variable <{var}> is referenced before assignment.\n' +
+                        print_stack_trace(expr))
+                value = np.asarray(value)[index]
+                if dtype is not None:
+                    value = value.astype(dtype)
+            if conjunction:
+                if not np.can_cast(np.atleast_1d(value), bool):
+                    raise RDDLTypeError(
+                        f'Argument of ^ must evaluate to {bool}, got {value} '
+                        f'of type {value.dtype}.\n' + print_stack_trace(expr))
+                product = np.logical_and(product, value)
+            else:
+                product = product * value
+
+        # scatter the products into the result
+        op = self.op
+        if op == 'exists':
+            if self.out_index is None:
+                return np.any(product)
+            result = np.zeros(self.size, dtype=bool)
+            result[self.out_index[product]] = True
+            return np.reshape(result, self.out_shape)
+
+        product = 1 * product
+        if self.out_index is None:
+            result = np.sum(product)
+        else:
+            result = np.bincount(self.out_index, weights=product,
+                                 minlength=self.size)
+            if np.issubdtype(product.dtype, np.integer):
+                result = result.astype(product.dtype)
+            result = np.reshape(result, self.out_shape)
+        if op == 'avg':
+            result = result / self.count
+        return result
+
+
+class RDDLSparseCompiler:
+    '''Finds the aggregations of a simulator that can be sampled directly from
+    the sparse non-fluents in its initial values.
+
+    An aggregation sum, avg or exists is supported if its argument is a chain
+    of * (or ^ for exists and sum) whose factors are constants or pvariables
+    with free objects as arguments, and exactly one factor is a sparse
+    non-fluent whose distinct arguments cover all the objects in the scope of
+    the aggregation argument.
+    '''
+
+    AGGREGATIONS = {'sum', 'avg', 'exists'}
+
+    def __init__(self, simulator) -> None:
+        '''Creates a new compiler for the sparse aggregations of a simulator.
+
+        :param simulator: the RDDLSimulator instance whose traced expressions
+        and sparse initial values are used
+        '''
+        self.sim = simulator
+        self.rddl = simulator.rddl
+        self.traced = simulator.traced
+
+    def compile(self) -> Tuple[Dict[int, RDDLSparseAggregation], Set[str]]:
+        '''Returns a dictionary mapping the id of each supported aggregation to
+        its sparse sampler, and the set of sparse non-fluents that are also
+        referenced elsewhere and thus must be stored as dense tensors.'''
+        self.sparse = {var: value
+                       for (var, value) in self.sim.subs.items()
+                       if isinstance(value, RDDLSparseTensor)}
+        aggregations, covered, references = {}, set(), []
+        if self.sparse:
+            for expr in self.sim._root_expressions():
+                self._visit(expr, aggregations, covered, references)
+        dense = {var for (identifier, var) in references
+                 if identifier not in covered}
+        return aggregations, dense
+
+    def _visit(self, expr, aggregations, covered, references):
+        etype, op = expr.etype
+        if etype == 'aggregation' and op in RDDLSparseCompiler.AGGREGATIONS:
+            aggregation = self._compile_aggregation(expr, covered)
+            if aggregation is not None:
+                aggregations[expr.id] = aggregation
+        elif etype == 'pvar':
+            var, _ = expr.args
+            if var in self.sparse:
+                references.append((expr.id, var))
+        for arg in self.sim._sub_expressions(expr):
+            self._visit(arg, aggregations, covered, references)
+
+    def _factors(self, expr, chain_op, factors):
+        etype, op = expr.etype
+        if op == '&':
+            op = '^'
+        if etype in ('arithmetic', 'boolean') and op == chain_op \
+        and len(expr.args) == 2:
+            for arg in expr.args:
+                if not self._factors(arg, chain_op, factors):
+                    return False
+            return True
+        elif etype == 'constant':
+            factors.append(expr)
+            return True
+        elif etype == 'pvar':
+            var, args = expr.args
+            is_value, _ = self.traced.cached_sim_info(expr)
+            if is_value:
+                return False
+            for arg in (args or []):
+                if not (isinstance(arg, str)
+                        and RDDLPlanningModel.is_free_object(arg)):
+                    return False
+            factors.append(expr)
+            return True
+        return False
+
+    def _compile_aggregation(self, expr, covered):
+        _, op = expr.etype
+        * _, arg = expr.args
+        scope, reduced_axes = self.traced.cached_sim_info(expr)
+        scope_vars = [name for (name, _) in scope]
+        scope_types = [ptype for (_, ptype) in scope]
+
+        # find the sparse factor and the other factors of the chain
+        etype, chain_op = arg.etype
+        if chain_op == '&':
+            chain_op = '^'
+        if etype == 'pvar':
+            chain_op = '^' if op == 'exists' else '*'
+        if chain_op not in ('*', '^') or (op == 'exists' and chain_op != '^'):
+            return None
+        factors = []
+        if not self._factors(arg, chain_op, factors):
+            return None
+        sparse_factors = [factor for factor in factors
+                          if factor.etype[0] == 'pvar'
+                          and factor.args[0] in self.sparse]
+        if len(sparse_factors) != 1:
+            return None
+        sparse_expr, = sparse_factors
+        var, args = sparse_expr.args
+        args = args or []
+        if len(set(args)) != len(args) or set(args) != set(scope_vars):
+            return None
+        tensor = self.sparse[var]
+        if chain_op == '^' and not np.can_cast(tensor.dtype, bool):
+            return None
+        scope_coords = [tensor.coords[args.index(name)] for name in scope_vars]
+
+        # the other factors are gathered along their arguments
+        compiled = []
+        for factor in factors:
+            if factor is sparse_expr:
+                continue
+            if factor.etype[0] == 'constant':
+                value = np.ravel(self.traced.cached_sim_info(factor))[0]
+                compiled.append(('constant', value, None, factor))
+            else:
+                factor_var, factor_args = factor.args
+                axes = [scope_vars.index(name) for name in (factor_args or [])]
+                compiled.append(('pvar', factor_var, axes, factor))
+
+        out_axes = [axis for axis in range(len(scope)) if axis not in reduced_axes]
+        out_shape = tuple(self.rddl.object_counts(
+            [scope_types[axis] for axis in out_axes]))
+        count = int(np.prod(self.rddl.object_counts(
+            [scope_types[axis] for axis in reduced_axes]), dtype=np.int64))
+        covered.add(sparse_expr.id)
+        return RDDLSparseAggregation(
+            expr, op, chain_op, var, tensor, scope_coords, out_shape, out_axes,
+            count, compiled, widen=self.sim._widen)
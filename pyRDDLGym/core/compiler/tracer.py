@@ -203,12 +203,14 @@ class RDDLObjectsTracer:
         
         # log the fluent types
         if self.logger is not None:
-            message = '[info] computed whether each CPF expression is fluent:\n'
-            for cpfs in levels.values():
-                for cpf in cpfs:
-                    is_fluent = out._cached_is_fluent_cpf[cpf]
-                    message += f'\t{cpf}: {is_fluent}\n'
-            self.logger.log(message)
+            def _message():
+                message = '[info] computed whether each CPF expression is fluent:\n'
+                for cpfs in levels.values():
+                    for cpf in cpfs:
+                        is_fluent = out._cached_is_fluent_cpf[cpf]
+                        message += f'\t{cpf}: {is_fluent}\n'
+                return message
+            self.logger.log(_message, Logger.INFO)
             
         return out
         
@@ -324,12 +326,11 @@ class RDDLObjectsTracer:
                 if is_fluent is None:
                     is_fluent = True
                     if self.logger is not None:
-                        message = (
-                            f'[warning] cannot establish whether CPF is fluent:'
-                            f'\n\taddress of expression ={str(expr)}'
-                            f'\n\tCPF to check          ={primed_var}\n'
-                        )
-                        self.logger.log(message)
+                        def _message():
+                            return (f'[warning] cannot establish whether CPF is fluent:'
+                                    f'\n\taddress of expression ={str(expr)}'
+                                    f'\n\tCPF to check          ={primed_var}\n')
+                        self.logger.log(_message, Logger.WARNING)
             else:
                 is_fluent = rddl.variable_types[var] != 'non-fluent'
 
@@ -510,18 +511,17 @@ class RDDLObjectsTracer:
         
         # log information about the new transformation
         if self.logger is not None:
-            message = (
-                f'[info] computing info for pvariable tensor transformation:' 
-                f'\n\taddress of expression   ={super(Expression, expr).__str__()}'
-                f'\n\tvariable                ={var}'
-                f'\n\tvariable evaluated at   ={list(zip(args, args_types))}'
-                f'\n\tfree object(s) in scope ={objects}'
-                f'\n\tslice                   ={slices}'
-                f'\n\tnew axes to append      ={new_axis}'
-                f'\n\tbroadcast shape         ={new_shape}'
-                f'\n\ttransform operation     ={op_code} with argument(s) {op_args}\n'
-            )
-            self.logger.log(message)
+            def _message():
+                return (f'[info] computing info for pvariable tensor transformation:'
+                        f'\n\taddress of expression   ={super(Expression, expr).__str__()}'
+                        f'\n\tvariable                ={var}'
+                        f'\n\tvariable evaluated at   ={list(zip(args, args_types))}'
+                        f'\n\tfree object(s) in scope ={objects}'
+                        f'\n\tslice                   ={slices}'
+                        f'\n\tnew axes to append      ={new_axis}'
+                        f'\n\tbroadcast shape         ={new_shape}'
+                        f'\n\ttransform operation     ={op_code} with argument(s) {op_args}\n')
+            self.logger.log(_message, Logger.DEBUG)
             
         return (slices, new_axis, new_shape, op_code, op_args)
     
@@ -662,13 +662,14 @@ class RDDLObjectsTracer:
         
         # log information about aggregation operation
         if self.logger is not None:
-            message = (f'[info] computing object info for aggregation:'
-                       f'\n\taggregation variables(s)      ={pvars}'
-                       f'\n\tfree object(s) in outer scope ={objects}'
-                       f'\n\tfree object(s) in inner scope ={new_objects}'
-                       f'\n\taggregation operation         ={op}'
-                       f'\n\taggregation axes              ={reduced_axes}\n')
-            self.logger.log(message)        
+            def _message():
+                return (f'[info] computing object info for aggregation:'
+                        f'\n\taggregation variables(s)      ={pvars}'
+                        f'\n\tfree object(s) in outer scope ={objects}'
+                        f'\n\tfree object(s) in inner scope ={new_objects}'
+                        f'\n\taggregation operation         ={op}'
+                        f'\n\taggregation axes              ={reduced_axes}\n')
+            self.logger.log(_message, Logger.DEBUG)
         
     # ===========================================================================
     # control flow
@@ -794,11 +795,12 @@ class RDDLObjectsTracer:
         # log cases ordering
         if self.logger is not None:
             active_expr = [i for (i, e) in enumerate(expressions) if e is not None]
-            message = (f'[info] computing case info for {expr.etype[1]}:'
-                       f'\n\tenum type ={enum_type}'
-                       f'\n\tcases     ={active_expr}'
-                       f'\n\tdefault   ={default_expr is not None}\n')
-            self.logger.log(message)     
+            def _message():
+                return (f'[info] computing case info for {expr.etype[1]}:'
+                        f'\n\tenum type ={enum_type}'
+                        f'\n\tcases     ={active_expr}'
+                        f'\n\tdefault   ={default_expr is not None}\n')
+            self.logger.log(_message, Logger.DEBUG)
         
         return (expressions, default_expr)
     
@@ -1054,13 +1056,14 @@ class RDDLObjectsTracer:
         
         # log information about matrix operation
         if self.logger is not None:
-            message = (f'[info] computing object info for matrix operation:'
-                       f'\n\tmatrix operation              =det'
-                       f'\n\tdimension variables(s)        ={pvars}'
-                       f'\n\tfree object(s) in outer scope ={objects}'
-                       f'\n\tfree object(s) in inner scope ={new_objects}'
-                       f'\n\treduction axes                ={reduced_axes}\n')
-            self.logger.log(message)        
+            def _message():
+                return (f'[info] computing object info for matrix operation:'
+                        f'\n\tmatrix operation              =det'
+                        f'\n\tdimension variables(s)        ={pvars}'
+                        f'\n\tfree object(s) in outer scope ={objects}'
+                        f'\n\tfree object(s) in inner scope ={new_objects}'
+                        f'\n\treduction axes                ={reduced_axes}\n')
+            self.logger.log(_message, Logger.DEBUG)
         
     def _trace_matrix_inv(self, expr, objects, out, pseudo):
         _, op = expr.etype
@@ -1112,10 +1115,11 @@ class RDDLObjectsTracer:
         
         # log information about matrix operation
         if self.logger is not None:
-            message = (f'[info] computing object info for matrix operation:'
-                       f'\n\tmatrix operation              ={op}'
-                       f'\n\tdimension variables(s)        ={pvars}'
-                       f'\n\tfree object(s) in outer scope ={objects}'
-                       f'\n\tfree object(s) in inner scope ={new_objects}'
-                       f'\n\tindices in outer scope        ={pvar_indices}\n')
-            self.logger.log(message)        
+            def _message():
+                return (f'[info] computing object info for matrix operation:'
+                        f'\n\tmatrix operation              ={op}'
+                        f'\n\tdimension variables(s)        ={pvars}'
+                        f'\n\tfree object(s) in outer scope ={objects}'
+                        f'\n\tfree object(s) in inner scope ={new_objects}'
+                        f'\n\tindices in outer scope        ={pvar_indices}\n')
+            self.logger.log(_message, Logger.DEBUG)
@@ -1,7 +1,54 @@
 import numpy as np
+from typing import Dict, List, Tuple
 
 from pyRDDLGym.core.debug.exception import print_stack_trace, raise_warning
-from pyRDDLGym.core.simulator import RDDLSimulator
+from pyRDDLGym.core.debug.logger import Logger
+from pyRDDLGym.core.simulator import Args, RDDLSimulator
+
+
+class RDDLBoxInvariants:
+    '''Checks all state invariants that are box constraints at once, by 
+    comparing the concatenated values of the state-fluents they bound to the 
+    concatenated lower and upper bounds in a single vectorized operation.
+    
+    Since strict inequalities are tightened by a tolerance, and bounds from 
+    box parts of other invariants may also apply, the bounds can be tighter 
+    than the invariants: a passing check implies that all box invariants hold, 
+    whereas a failing check must be confirmed by evaluating the invariants.
+    '''
+    
+    def __init__(self, bounds: Dict[str, Tuple[np.ndarray, np.ndarray]],
+                 is_box: List[bool]) -> None:
+        '''Creates a new check of the box invariants.
+        
+        :param bounds: dictionary mapping each state-fluent to its lower and
+        upper bound tensors
+        :param is_box: whether each state invariant is a box constraint
+        '''
+        self.vars = []
+        lower, upper = [], []
+        for (var, (lb, ub)) in bounds.items():
+            lb, ub = np.ravel(lb), np.ravel(ub)
+            if np.any(np.isfinite(lb)) or np.any(np.isfinite(ub)):
+                self.vars.append(var)
+                lower.append(lb)
+                upper.append(ub)
+        if self.vars:
+            self.lower = np.concatenate(lower).astype(np.float64)
+            self.upper = np.concatenate(upper).astype(np.float64)
+        else:
+            self.lower = self.upper = np.zeros(0)
+        self.is_box = is_box
+        
+        # the invariants that must still be evaluated when the check passes
+        self.other_invariants = [i for (i, box) in enumerate(is_box) if not box]
+    
+    def check(self, subs: Args) -> bool:
+        '''Returns whether the state-fluents in subs are within their bounds.'''
+        if not self.vars:
+            return True
+        values = np.concatenate([np.ravel(subs[var]) for var in self.vars])
+        return bool(np.all((self.lower <= values) & (values <= self.upper)))
 
 
 class RDDLConstraints:
@@ -59,6 +106,8 @@ class RDDLConstraints:
 
         for (name, bounds) in self._bounds.items():
             RDDLSimulator._check_bounds(*bounds, f'Variable <{name}>', bounds)
+        self._state_bounds = {var: tuple(np.copy(value) for value in self._bounds[var])
+                              for var in rddl.state_fluents}
         
         # ground the bounds if not vectorized
         if self.vectorized:
@@ -76,10 +125,11 @@ class RDDLConstraints:
         
         # log bounds to file
         if simulator.logger is not None:
-            bounds_info = '\n\t'.join(f'{k}: {v}' 
-                                      for (k, v) in self._bounds.items())
-            simulator.logger.log(f'[info] computed simulation bounds:\n' 
-                                 f'\t{bounds_info}\n')
+            def _message():
+                bounds_info = '\n\t'.join(f'{k}: {v}' 
+                                           for (k, v) in self._bounds.items())
+                return f'[info] computed simulation bounds:\n\t{bounds_info}\n'
+            simulator.logger.log(_message, Logger.DEBUG)
         
     def _parse_bounds(self, tag, expr, objects, search_vars):
         etype, op = expr.etype
@@ -221,3 +271,8 @@ class RDDLConstraints:
     def is_box_invariants(self):
         return self._is_box_invariant
     
+    def box_invariants(self) -> RDDLBoxInvariants:
+        '''Returns a check of all state invariants that are box constraints at 
+        once, that can be assigned to the box_invariants field of a simulator.'''
+        return RDDLBoxInvariants(self._state_bounds, self._is_box_invariant)
+    
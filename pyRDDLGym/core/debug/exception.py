@@ -104,5 +104,9 @@ class RDDLEpisodeAlreadyEndedError(RuntimeError):
     pass
 
 
+class RDDLSessionError(RuntimeError):
+    pass
+
+
 class RDDLRandPolicyVecNotImplemented(NotImplementedError):
     pass
\ No newline at end of file
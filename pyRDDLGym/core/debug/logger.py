@@ -1,22 +1,90 @@
 import datetime
+import glob
+import logging
+import numpy as np
+import os
+from typing import Callable, Optional, Union
+
+from pyRDDLGym.core.compiler.model import RDDLPlanningModel
+from pyRDDLGym.core.debug.trajectory import RDDLTrajectoryWriter
 
 
 class Logger:
-    '''Provides functionality for writing messages to a log file.'''
+    '''Provides functionality for writing messages to a log file.
+    
+    The file is kept open and written through a buffer until the logger is 
+    flushed or closed. Only messages whose level is at least the level of the 
+    logger are written, and a message can be passed as a callable that returns
+    it, which is only called if the message is written, so that large messages
+    are never formatted unless their level is enabled.'''
+    
+    DEBUG = logging.DEBUG
+    INFO = logging.INFO
+    WARNING = logging.WARNING
+    ERROR = logging.ERROR
     
-    def __init__(self, filename: str) -> None:
+    LEVELS = {'debug': DEBUG, 'info': INFO, 'warning': WARNING, 'error': ERROR}
+    
+    def __init__(self, filename: str, level: Union[int, str]=DEBUG,
+                 buffer_size: int=1 << 16) -> None:
+        '''Creates a new logger that writes to the given file.
+        
+        :param filename: the path of the log file
+        :param level: the minimum level of the messages to write, either as one
+        of the levels of the logging module or as its name in LEVELS
+        :param buffer_size: the size of the write buffer in bytes
+        '''
+        if isinstance(level, str):
+            if level not in Logger.LEVELS:
+                raise ValueError(f'Log level must be one of '
+                                 f'{tuple(Logger.LEVELS)}, got {level}.')
+            level = Logger.LEVELS[level]
         self.filename = filename
+        self.level = level
+        self.buffer_size = buffer_size
+        self._fp = None
     
+    def _open(self, mode: str) -> None:
+        if self._fp is not None:
+            self._fp.close()
+        self._fp = open(self.filename, mode, buffering=self.buffer_size)
+        
     def clear(self) -> None:
-        fp = open(self.filename, 'w')
-        fp.write('')
-        fp.close()
+        self._open('w')
     
-    def log(self, msg: str) -> None:
-        fp = open(self.filename, 'a')
+    def enabled(self, level: int) -> bool:
+        '''Returns whether messages of the given level are written.'''
+        return level >= self.level
+    
+    def log(self, msg: Union[str, Callable[[], str]], level: int=INFO) -> None:
+        if level < self.level:
+            return
+        if callable(msg):
+            msg = msg()
+        if self._fp is None:
+            self._open('a')
         timestamp = str(datetime.datetime.now())
-        fp.write(f'{timestamp}: {msg}\n')
-        fp.close()
+        self._fp.write(f'{timestamp}: {msg}\n')
+    
+    def flush(self) -> None:
+        if self._fp is not None:
+            self._fp.flush()
+    
+    def close(self) -> None:
+        if self._fp is not None:
+            self._fp.close()
+            self._fp = None
+    
+    def __getstate__(self):
+        
+        # the file is reopened in append mode after unpickling
+        self.flush()
+        state = self.__dict__.copy()
+        state['_fp'] = None
+        return state
+    
+    def __del__(self) -> None:
+        self.close()
     
         
 class SimLogger:
@@ -67,7 +135,73 @@ class SimLogger:
 
     def log_free(self, text) -> None:
         self.data.append(text)
+    
+    def start_episode(self) -> None:
+        '''Marks the start of a new episode in the log.'''
+        self.log_free('######################################################\n'
+                      'New Trial\n'
+                      '######################################################')
 
     def close(self):
         if self.data:
             self._write_data()
+
+
+class BinarySimLogger:
+    '''Provides functionality for writing simulation data to a directory of
+    binary columnar chunks, whose layout is derived once from the groundings
+    of the model (see RDDLTrajectoryWriter). The logged episodes are loaded
+    back as arrays by RDDLTrajectoryReader.'''
+    
+    def __init__(self, path: str, rddl: RDDLPlanningModel,
+                 write_freq: int=1000, vectorized: bool=False) -> None:
+        '''Creates a new logger of simulation data.
+        
+        :param path: the directory to which chunks are written
+        :param rddl: the RDDL model
+        :param write_freq: the number of records per chunk
+        :param vectorized: whether the observations and actions are logged as
+        dictionaries of lifted fluents to tensors (if True), or of grounded 
+        fluents to values
+        '''
+        self.path = path
+        self.rddl = rddl
+        self.write_freq = write_freq
+        self.vectorized = vectorized
+        self.writer: Optional[RDDLTrajectoryWriter] = None
+        
+    def clear(self, overwrite: bool=True) -> None:
+        chunks = sorted(glob.glob(os.path.join(self.path, 'chunk-*.npz')))
+        
+        # episodes that are appended continue the numbering of the last chunk
+        self.episode = -1
+        if overwrite:
+            for filename in chunks:
+                os.remove(filename)
+        elif chunks:
+            with np.load(chunks[-1]) as chunk:
+                self.episode = int(chunk['round'][-1])
+        self.writer = RDDLTrajectoryWriter(
+            self.path, self.rddl, chunk_size=self.write_freq)
+    
+    def log(self, obs, action, reward, done, step) -> None:
+        if self.vectorized:
+            self.writer.write_tensors(
+                max(self.episode, 0), step, obs, action, reward, done)
+        else:
+            self.writer.write(
+                max(self.episode, 0), step, obs, action, reward, done)
+    
+    def log_free(self, text) -> None:
+        
+        # free text is not stored
+        pass
+    
+    def start_episode(self) -> None:
+        '''Marks the start of a new episode, whose records are logged with the
+        next episode number.'''
+        self.episode += 1
+    
+    def close(self):
+        if self.writer is not None:
+            self.writer.close()
@@ -0,0 +1,203 @@
+import time
+from typing import Callable, Iterable, List, Optional, Tuple
+
+from pyRDDLGym.core.debug.decompiler import RDDLDecompiler
+from pyRDDLGym.core.parser.expr import Expression
+
+
+class RDDLProfiler:
+    '''Accumulates the wall time and number of calls of every traced expression
+    of a simulator.
+
+    Times are measured around the evaluation of each expression, so they
+    include the time spent in its sub-expressions, and the time spent in the
+    expression itself is recovered by subtracting the times of its children.
+    The roots of the CPFs, reward and constraints give the time per CPF, reward,
+    invariant, precondition and termination condition. Expressions evaluated
+    by generated code (see RDDLSimulatorCodegen) are not measured individually,
+    but the generated code measures the time of each CPF at its root.
+    '''
+
+    def __init__(self, simulator) -> None:
+        '''Creates a new profiler for the given simulator.
+
+        :param simulator: the RDDLSimulator instance whose expressions to time
+        '''
+        self.sim = simulator
+        self.traced = simulator.traced
+        self._decompiler = RDDLDecompiler()
+        self._texts = {}
+
+        num_ids = self.traced._current_id
+        self.times = [0.0] * num_ids
+        self.calls = [0] * num_ids
+
+        # name the roots of the CPFs, reward and constraints
+        rddl = simulator.rddl
+        self.roots = {}
+        for (cpf, expr, _) in simulator.cpfs:
+            self.roots[expr.id] = f'CPF {cpf}'
+        self.roots[rddl.reward.id] = 'Reward'
+        for (name, expr) in zip(simulator.invariant_names, rddl.invariants):
+            self.roots[expr.id] = name
+        for (name, expr) in zip(simulator.precond_names, rddl.preconditions):
+            self.roots[expr.id] = name
+        for (name, expr) in zip(simulator.terminal_names, rddl.terminations):
+            self.roots[expr.id] = name
+
+    # ===========================================================================
+    # instrumentation
+    # ===========================================================================
+
+    def wrap(self, identifier: int, closure: Callable) -> Callable:
+        '''Returns a closure that samples the expression with the given id
+        using the given closure, and accumulates the time spent in it.'''
+        times, calls = self.times, self.calls
+        clock = time.perf_counter
+
+        def _timed(subs):
+            start = clock()
+            sample = closure(subs)
+            times[identifier] += clock() - start
+            calls[identifier] += 1
+            return sample
+
+        return _timed
+
+    def attach(self) -> None:
+        '''Instruments the tree-walking interpreter of the simulator, by
+        wrapping its recursive sampling function (compiled closures are instead
+        wrapped by RDDLClosureCompiler).'''
+        sim = self.sim
+        times, calls = self.times, self.calls
+        clock = time.perf_counter
+        sample = sim._sample
+
+        def _timed(expr, subs):
+            start = clock()
+            value = sample(expr, subs)
+            times[expr.id] += clock() - start
+            calls[expr.id] += 1
+            return value
+
+        sim._sample = _timed
+
+    def clear(self) -> None:
+        '''Resets all accumulated times and counts to zero.'''
+        for i in range(len(self.times)):
+            self.times[i] = 0.0
+            self.calls[i] = 0
+
+    # ===========================================================================
+    # statistics
+    # ===========================================================================
+
+    @staticmethod
+    def _children(expr: Expression) -> Iterable[Expression]:
+        stack = list(expr.args) if isinstance(expr.args, (list, tuple)) else [expr.args]
+        while stack:
+            arg = stack.pop()
+            if isinstance(arg, Expression):
+                yield arg
+            elif isinstance(arg, (list, tuple)):
+                stack.extend(arg)
+
+    def self_time(self, identifier: int) -> float:
+        '''Returns the time spent in the expression with the given id,
+        excluding the time spent in its sub-expressions.'''
+        expr = self.traced.lookup(identifier)
+        total = self.times[identifier]
+        for child in self._children(expr):
+            if child.id is not None and child.id != identifier:
+                total -= self.times[child.id]
+        return max(total, 0.0)
+
+    def text(self, identifier: int, max_length: int=80) -> str:
+        '''Returns the decompiled RDDL text of the expression with the given id
+        on a single line, truncated to the given length.'''
+        text = self._texts.get(identifier, None)
+        if text is None:
+            expr = self.traced.lookup(identifier)
+            try:
+                text = self._decompiler.decompile_expr(expr)
+            except Exception:
+                text = str(expr.etype)
+            text = ' '.join(text.split())
+            self._texts[identifier] = text
+        if len(text) > max_length:
+            text = text[:max_length - 3] + '...'
+        return text
+
+    def root_stats(self) -> List[Tuple[str, int, float]]:
+        '''Returns a list of (name, calls, total time) for the roots of the CPFs,
+        reward and constraints, sorted by decreasing total time.'''
+        stats = [(name, self.calls[i], self.times[i])
+                 for (i, name) in self.roots.items()]
+        return sorted(stats, key=lambda stat: -stat[2])
+
+    def expr_stats(self) -> List[Tuple[int, int, float, float]]:
+        '''Returns a list of (id, calls, self time, total time) for all
+        expressions that were evaluated, sorted by decreasing self time.'''
+        stats = [(i, calls, self.self_time(i), self.times[i])
+                 for (i, calls) in enumerate(self.calls) if calls > 0]
+        return sorted(stats, key=lambda stat: -stat[2])
+
+    # ===========================================================================
+    # export
+    # ===========================================================================
+
+    def report(self, top: Optional[int]=20) -> str:
+        '''Returns a text report of the time spent in each CPF, reward and
+        constraint, followed by the expressions with the largest self time.
+
+        :param top: the number of expressions to include, or None for all
+        '''
+        roots = self.root_stats()
+        total = sum(stat[2] for stat in roots) or 1.0
+        lines = [f'{"root":<40} {"calls":>9} {"total ms":>11} {"mean us":>10} {"%":>6}']
+        for (name, calls, elapsed) in roots:
+            mean = 1e6 * elapsed / calls if calls else 0.0
+            lines.append(f'{name[:40]:<40} {calls:>9} {1e3 * elapsed:>11.3f} '
+                         f'{mean:>10.2f} {100.0 * elapsed / total:>6.1f}')
+
+        exprs = self.expr_stats()
+        if top is not None:
+            exprs = exprs[:top]
+        lines.append('')
+        lines.append(f'{"id":>6} {"calls":>9} {"self ms":>11} {"total ms":>11}  expression')
+        for (i, calls, self_time, elapsed) in exprs:
+            lines.append(f'{i:>6} {calls:>9} {1e3 * self_time:>11.3f} '
+                         f'{1e3 * elapsed:>11.3f}  {self.text(i)}')
+        return '\n'.join(lines)
+
+    def collapsed_stacks(self) -> List[str]:
+        '''Returns the self times of all evaluated expressions in the collapsed
+        stack format of flamegraph tools, i.e. one line per expression holding
+        the frames from its root separated by semicolons and its self time in
+        microseconds.'''
+        lines = []
+
+        def _frame(identifier):
+            return f'{self.text(identifier)} [{identifier}]'.replace(';', ',')
+
+        def _visit(expr, stack):
+            identifier = expr.id
+            if identifier is None or not self.calls[identifier]:
+                return
+            stack = stack + [_frame(identifier)]
+            micros = int(round(1e6 * self.self_time(identifier)))
+            if micros > 0:
+                lines.append(f'{";".join(stack)} {micros}')
+            for child in self._children(expr):
+                if child.id != identifier:
+                    _visit(child, stack)
+
+        for (identifier, name) in self.roots.items():
+            _visit(self.traced.lookup(identifier), [name.replace(';', ',')])
+        return lines
+
+    def save_collapsed_stacks(self, path: str) -> None:
+        '''Writes the collapsed stacks to the given file, which can be passed
+        to flamegraph tools (e.g. flamegraph.pl or speedscope).'''
+        with open(path, 'w') as fp:
+            fp.write('\n'.join(self.collapsed_stacks()) + '\n')
@@ -0,0 +1,317 @@
+import glob
+import json
+import math
+import numpy as np
+import os
+from typing import Any, Dict, Iterable, List, Optional
+
+from pyRDDLGym.core.compiler.model import RDDLPlanningModel
+
+# columns of every record that do not belong to a fluent
+INDEX_COLUMNS = {
+    'round': np.int64,
+    'turn': np.int64,
+    'reward': np.float64,
+    'done': np.bool_
+}
+
+
+def _fluent_dtype(rddl: RDDLPlanningModel, prange: str) -> np.dtype:
+    if prange == 'bool':
+        return np.dtype(np.bool_)
+    elif prange == 'int':
+        return np.dtype(np.int64)
+    elif prange == 'real':
+        return np.dtype(np.float64)
+    objects = rddl.type_to_objects.get(prange)
+    if not objects:
+        objects = rddl.object_to_type.keys()
+    return np.dtype(f'<U{max(map(len, objects), default=1)}')
+
+
+def _fill_value(dtype: np.dtype) -> Any:
+    '''Returns the value stored in place of a missing value of the given type 
+    (e.g. an observation before the first action of a POMDP).'''
+    if dtype.kind == 'f':
+        return math.nan
+    elif dtype.kind == 'U':
+        return ''
+    return dtype.type(0)
+
+
+def _parse_value(value: Any, prange: str) -> Any:
+    '''Converts a value received as a string (i.e. from a planner) to the type
+    of its range, and returns other values unchanged.'''
+    if not isinstance(value, str):
+        return value
+    if prange == 'bool':
+        return value.strip().lower() == 'true'
+    elif prange == 'int':
+        return int(value)
+    elif prange == 'real':
+        return float(value)
+    return value
+
+
+class RDDLTrajectoryWriter:
+    '''Streams typed records of states, actions and rewards to a directory of
+    columnar .npz chunks, so that the memory used does not grow with the
+    length of the trajectory.
+
+    Every record holds the round and turn, the state before the action, the
+    action, the reward and whether the round is done. The values of each
+    lifted fluent are stored as one column of shape (records, groundings) with
+    the type of the fluent, and the layout of the columns is written once to
+    a schema.json file in the directory. Every state column has a boolean mask
+    column of the same shape (named in the schema), which is False where the 
+    value is missing (e.g. the observations of a POMDP before the first 
+    action), in which case NaN, zero, False or an empty string is stored. Chunks that already exist in the
+    directory are kept, and new chunks are appended after them.
+    '''
+
+    def __init__(self, path: str, rddl: RDDLPlanningModel,
+                 state_fluents: Optional[Iterable[str]]=None,
+                 chunk_size: int=1024,
+                 compress: bool=False) -> None:
+        '''Creates a new writer of trajectories of the given model.
+
+        :param path: the directory to which chunks are written, which is
+        created if it does not exist
+        :param rddl: the RDDL model
+        :param state_fluents: the lifted fluents of the states to record, which
+        defaults to the observ-fluents of a POMDP and to the state-fluents
+        otherwise
+        :param chunk_size: the number of records that are kept in memory
+        before they are written as one chunk
+        :param compress: whether to compress the chunks
+        '''
+        if state_fluents is None:
+            state_fluents = rddl.observ_fluents or rddl.state_fluents
+        self.path = path
+        self.rddl = rddl
+        self.chunk_size = chunk_size
+        self.compress = compress
+
+        # the layout of the columns is fixed by the groundings of the fluents
+        self._fluents = []
+        for (prefix, variables) in (('state', state_fluents),
+                                    ('action', rddl.action_fluents)):
+            for var in variables:
+                prange = rddl.variable_ranges[var]
+                self._fluents.append((
+                    f'{prefix}/{var}', var, prange, _fluent_dtype(rddl, prange),
+                    list(rddl.variable_groundings[var])))
+        
+        # defaults of unparameterized action-fluents are scalars
+        self._defaults = {name: np.ravel(rddl.action_fluents[var]).tolist()
+                          for (name, var, *_) in self._fluents
+                          if name.startswith('action/')}
+        self._objects = {name: np.asarray(rddl.type_to_objects[prange])
+                         for (name, _, prange, *_) in self._fluents
+                         if prange in rddl.type_to_objects}
+        self._masks = {name: f'{name}/valid' for (name, *_) in self._fluents
+                       if name not in self._defaults}
+        self._fills = {name: _fill_value(dtype) 
+                       for (name, _, _, dtype, _) in self._fluents}
+        self._columns = {
+            name: np.empty((chunk_size,), dtype=dtype)
+            for (name, dtype) in INDEX_COLUMNS.items()
+        }
+        for (name, _, _, dtype, groundings) in self._fluents:
+            shape = (chunk_size, len(groundings))
+            self._columns[name] = np.empty(shape, dtype=dtype)
+            if name in self._masks:
+                self._columns[self._masks[name]] = np.empty(shape, dtype=np.bool_)
+        self._size = 0
+
+        os.makedirs(path, exist_ok=True)
+        self._chunk = len(glob.glob(os.path.join(path, 'chunk-*.npz')))
+        schema = {
+            'chunk_size': chunk_size,
+            'columns': {name: {'fluent': var, 'range': prange,
+                               'dtype': dtype.str, 'groundings': groundings,
+                               'mask': self._masks.get(name)}
+                        for (name, var, prange, dtype, groundings) in self._fluents}
+        }
+        with open(os.path.join(path, 'schema.json'), 'w') as fp:
+            json.dump(schema, fp)
+
+    def write(self, round: int, turn: int, state: Dict[str, Any],
+              actions: Optional[Dict[str, Any]], reward: float,
+              done: bool=False) -> None:
+        '''Appends a record to the trajectory.
+
+        :param round: the round (episode) of the record
+        :param turn: the turn (decision epoch) of the record
+        :param state: dictionary mapping grounded fluents to their values, 
+        which are None if they are missing
+        :param actions: dictionary mapping grounded action-fluents to their
+        values (which are parsed if they are strings), where missing actions
+        take their default values, or None if no action was taken
+        :param reward: the reward received for the action, or NaN if no action
+        was taken
+        :param done: whether the round is done
+        '''
+        row = self._write_index(round, turn, reward, done)
+        columns = self._columns
+        objects = self._objects
+        for (name, _, prange, _, groundings) in self._fluents:
+            if name in self._defaults:
+                values = self._defaults[name]
+                if actions:
+                    values = [_parse_value(actions.get(key, default), prange)
+                              for (key, default) in zip(groundings, values)]
+            else:
+                values = self._fill_missing(
+                    name, row, [state[key] for key in groundings])
+            if name in objects:
+                values = self._object_names(name, values)
+            columns[name][row] = values
+        self._next_row()
+
+    def write_tensors(self, round: int, turn: int, state: Dict[str, Any],
+                      actions: Optional[Dict[str, Any]], reward: float,
+                      done: bool=False) -> None:
+        '''Appends a record to the trajectory, whose state and actions map 
+        lifted fluents to the tensors of their values (e.g. as returned by a 
+        vectorized environment), which are copied without grounding them.
+
+        :param round: the round (episode) of the record
+        :param turn: the turn (decision epoch) of the record
+        :param state: dictionary mapping lifted fluents to their tensors, which
+        are None if they are missing
+        :param actions: dictionary mapping lifted action-fluents to their 
+        tensors, where missing actions take their default values, or None if 
+        no action was taken
+        :param reward: the reward received for the action, or NaN if no action
+        was taken
+        :param done: whether the round is done
+        '''
+        row = self._write_index(round, turn, reward, done)
+        columns = self._columns
+        objects = self._objects
+        for (name, var, _, _, _) in self._fluents:
+            if name in self._defaults:
+                values = self._defaults[name]
+                if actions and var in actions:
+                    values = np.ravel(actions[var])
+            else:
+                values = np.ravel(state[var])
+                
+                # tensors of missing values hold None
+                if values.dtype == object:
+                    values = self._fill_missing(name, row, values.tolist())
+                    if name in objects:
+                        values = self._object_names(name, values)
+                else:
+                    columns[self._masks[name]][row] = True
+            
+            # tensors of enum values hold the indices of their objects
+            if name in objects and np.issubdtype(np.asarray(values).dtype, np.integer):
+                values = objects[name][values]
+            columns[name][row] = values
+        self._next_row()
+
+    def _fill_missing(self, name, row, values):
+        valid = [value is not None for value in values]
+        self._columns[self._masks[name]][row] = valid
+        if all(valid):
+            return values
+        fill = self._fills[name]
+        return [fill if value is None else value for value in values]
+
+    def _object_names(self, name, values):
+        
+        # enum values given as the indices of their objects are stored by name
+        objects = self._objects[name]
+        return [objects[value] if isinstance(value, (int, np.integer)) else value
+                for value in values]
+
+    def _write_index(self, round, turn, reward, done):
+        row = self._size
+        columns = self._columns
+        columns['round'][row] = round
+        columns['turn'][row] = turn
+        columns['reward'][row] = reward
+        columns['done'][row] = done
+        return row
+
+    def _next_row(self):
+        self._size += 1
+        if self._size >= self.chunk_size:
+            self.flush()
+
+    def end_round(self, round: int, turn: int, state: Dict[str, Any]) -> None:
+        '''Appends the final state of a round, in which no action is taken.'''
+        self.write(round, turn, state, None, math.nan, done=True)
+
+    def flush(self) -> None:
+        '''Writes the records in memory to a new chunk.'''
+        if self._size == 0:
+            return
+        size = self._size
+        columns = {name: values[:size] for (name, values) in self._columns.items()}
+        filename = os.path.join(self.path, f'chunk-{self._chunk:06d}.npz')
+        if self.compress:
+            np.savez_compressed(filename, **columns)
+        else:
+            np.savez(filename, **columns)
+        self._size = 0
+        self._chunk += 1
+
+    def close(self) -> None:
+        '''Writes the remaining records in memory.'''
+        self.flush()
+
+
+class RDDLTrajectoryReader:
+    '''Reads a trajectory written by RDDLTrajectoryWriter.'''
+
+    def __init__(self, path: str) -> None:
+        '''Creates a new reader of the trajectory in the given directory.
+
+        :param path: the directory of the trajectory
+        '''
+        self.path = path
+        with open(os.path.join(path, 'schema.json')) as fp:
+            schema = json.load(fp)
+        self.columns = schema['columns']
+        self.filenames = sorted(glob.glob(os.path.join(path, 'chunk-*.npz')))
+
+    def groundings(self, name: str) -> List[str]:
+        '''Returns the grounded fluents of the given column, e.g. state/var.'''
+        return self.columns[name]['groundings']
+
+    def mask(self, name: str) -> Optional[str]:
+        '''Returns the mask column of the given column, which is False where 
+        its values are missing, or None if its values are never missing.'''
+        return self.columns[name].get('mask')
+
+    def chunks(self) -> Iterable[Dict[str, np.ndarray]]:
+        '''Iterates over the chunks of the trajectory, each as a dictionary
+        mapping columns to arrays.'''
+        for filename in self.filenames:
+            with np.load(filename) as chunk:
+                yield {name: chunk[name] for name in chunk.files}
+
+    def read(self) -> Dict[str, np.ndarray]:
+        '''Returns the whole trajectory as a dictionary mapping columns to
+        arrays.'''
+        chunks = list(self.chunks())
+        if not chunks:
+            return {}
+        return {name: np.concatenate([chunk[name] for chunk in chunks])
+                for name in chunks[0]}
+
+    def episodes(self) -> List[Dict[str, np.ndarray]]:
+        '''Returns the records of every round of the trajectory, each as a
+        dictionary mapping columns to arrays.'''
+        data = self.read()
+        if not data:
+            return []
+        rounds = data['round']
+        splits = np.flatnonzero(rounds[1:] != rounds[:-1]) + 1
+        bounds = zip(np.concatenate([[0], splits]),
+                     np.concatenate([splits, [len(rounds)]]))
+        return [{name: values[start:end] for (name, values) in data.items()}
+                for (start, end) in bounds]
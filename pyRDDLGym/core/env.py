@@ -6,17 +6,19 @@ import pygame
 import typing
 from typing import Any, List, Optional, Type, Tuple
 
+from pyRDDLGym.core.compiler.cache import RDDLCompilationCache
 from pyRDDLGym.core.compiler.model import RDDLLiftedModel
 from pyRDDLGym.core.constraints import RDDLConstraints
 from pyRDDLGym.core.debug.exception import (
     RDDLEpisodeAlreadyEndedError,
+    RDDLInvalidActionError,
     RDDLLogFolderError,
     RDDLTypeError
 )
-from pyRDDLGym.core.debug.logger import Logger, SimLogger
-from pyRDDLGym.core.parser.parser import RDDLParser
+from pyRDDLGym.core.debug.logger import BinarySimLogger, Logger, SimLogger
+from pyRDDLGym.core.parser.parser import shared_parser
 from pyRDDLGym.core.parser.reader import RDDLReader
-from pyRDDLGym.core.simulator import RDDLSimulator
+from pyRDDLGym.core.simulator import RDDLSimulator, RDDLSimulatorPrecompiled
 from pyRDDLGym.core.visualizer.chart import ChartVisualizer
 from pyRDDLGym.core.visualizer.heatmap import HeatmapVisualizer
 from pyRDDLGym.core.visualizer.text import TextVisualizer
@@ -42,10 +44,18 @@ class RDDLEnv(gym.Env):
                  enforce_action_constraints: bool=False,
                  enforce_action_count_non_bool: bool=True,
                  vectorized: bool=False,
+                 flat: bool=False,
+                 zero_copy: bool=False,
+                 validation: str='full',
+                 validation_steps: int=100,
                  debug_path: Optional[str]=None,
+                 debug_level: str='debug',
                  log_path: Optional[str]=None,
+                 log_format: str='csv',
                  backend: Type[RDDLSimulator]=RDDLSimulator,
-                 backend_kwargs: typing.Dict={}) -> None:
+                 backend_kwargs: typing.Dict={},
+                 cache_dir: Optional[str]=None,
+                 compiled_info: Optional[typing.Dict]=None) -> None:
         '''Creates a new gym environment from the given RDDL domain + instance.
         
         :param domain: the RDDL domain
@@ -56,14 +66,41 @@ class RDDLEnv(gym.Env):
         in check that number of nondef actions don't exceed max-nondef-actions
         :param vectorized: whether actions and states are represented as
         dictionaries of numpy arrays (if True), or as dictionaries of scalars
+        :param flat: whether actions and states are represented as single flat
+        numpy arrays, in which the values of all fluents are concatenated in a 
+        fixed order (implies vectorized)
+        :param zero_copy: whether the simulator updates persistent buffers in 
+        place, and observations are returned as read-only views of them that 
+        are only valid until the next call to step() or reset(), so that the 
+        caller must copy any observation it wants to keep
+        :param validation: how often the number of actions and the values of 
+        expressions are checked at run time: 'full' checks every step,
+        'sampled' checks one step in every validation_steps steps, and 'off' 
+        checks the first validation_steps steps only, which trusts the agent
+        and the domain afterwards (the state invariants are still checked at 
+        every step, so that violations truncate the episode)
+        :param validation_steps: the number of steps of the validation level
         :param debug_path: absolute path to file where debug log is saved,
         excluding the file extension, None means no debugging
+        :param debug_level: the minimum level of the messages in the debug log,
+        one of 'debug', 'info', 'warning' or 'error': 'info' skips the large
+        dumps of tensors, bounds, expressions and generated code
         :param log_path: absolute path to file where simulation log is saved,
         excluding the file extension, None means no logging
+        :param log_format: the format of the simulation log: 'csv' writes a
+        row of text per step, and 'binary' writes typed columnar chunks to a
+        directory, which are read back by RDDLTrajectoryReader
         :param backend: the subclass of RDDLSimulator to use as backend for
         simulation (currently supports numpy and Jax)
         :param backend_kwargs: dictionary of additional named arguments to
         pass to backend (must not include logger)
+        :param cache_dir: optional directory of the compilation cache: the
+        compiled model is loaded from the cache if the same domain and instance
+        were compiled before, and saved to the cache otherwise
+        :param compiled_info: optional compiled information of the same domain 
+        and instance returned by compiled_info() of another environment, from 
+        which the model is restored instead of being parsed and compiled 
+        again (in which case the cache is not used)
         '''
         super(RDDLEnv, self).__init__()
         
@@ -71,17 +108,27 @@ class RDDLEnv(gym.Env):
         self.instance_text = instance
         self.enforce_action_constraints = enforce_action_constraints
         self.enforce_count_non_bool = enforce_action_count_non_bool
-        self.vectorized = vectorized
+        self.vectorized = vectorized or flat
+        self.flat = flat
+        self.zero_copy = zero_copy
         
-        # read and parse domain and instance
+        # read domain and instance
         reader = RDDLReader(domain, instance)
         domain = reader.rddltxt
-        parser = RDDLParser(lexer=None, verbose=False)
-        parser.build()
-        rddl = parser.parse(domain)
         
-        # define the RDDL model
-        self.model = RDDLLiftedModel(rddl)
+        # load the compiled model if the domain and instance were compiled before
+        cache, cache_key, compiled = None, None, compiled_info
+        if compiled is None and cache_dir is not None:
+            cache = RDDLCompilationCache(cache_dir)
+            cache_key = cache.key(domain)
+            compiled = cache.load(cache_key)
+        
+        # parse domain and instance and define the RDDL model
+        if compiled is None:
+            rddl = shared_parser().parse(domain)
+            self.model = RDDLLiftedModel(rddl)
+        else:
+            self.model = compiled['model']
         self.horizon = self.model.horizon
         self.discount = self.model.discount
         self.max_allowed_actions = self.model.max_allowed_actions 
@@ -90,25 +137,74 @@ class RDDLEnv(gym.Env):
         self.logger = None
         if debug_path is not None and debug_path:
             new_debug_path = _make_dir(debug_path)
-            self.logger = Logger(f'{new_debug_path}.log')
+            self.logger = Logger(f'{new_debug_path}.log', level=debug_level)
             self.logger.clear()
         
         # for logging simulation data
         self.simlogger = None
         if log_path is not None and log_path:
             new_log_path = _make_dir(log_path)
-            self.simlogger = SimLogger(f'{new_log_path}_log.csv')
+            if log_format == 'csv':
+                self.simlogger = SimLogger(f'{new_log_path}_log.csv')
+            elif log_format == 'binary':
+                self.simlogger = BinarySimLogger(
+                    f'{new_log_path}_log', self.model, vectorized=self.vectorized)
+            else:
+                raise ValueError(f'Log format must be one of (\'csv\', \'binary\'), '
+                                 f'got {log_format}.')
             self.simlogger.clear(overwrite=False)
         
-        # define the simulation backend  
-        self.sampler = backend(self.model,
-                               logger=self.logger,
-                               keep_tensors=self.vectorized,
-                               **backend_kwargs)
+        # define the simulation backend: the default backend can be restored 
+        # directly from the compiled information in the cache
+        if zero_copy:
+            backend_kwargs = {**backend_kwargs, 'zero_copy': True}
+        if validation != 'full':
+            backend_kwargs = {**backend_kwargs, 'validation': validation,
+                              'validation_steps': validation_steps}
+        restorable = backend is RDDLSimulator and \
+            set(backend_kwargs.keys()) <= {'rng', 'compile_closures', 'zero_copy', 
+                                           'profile', 'num_threads', 'keyed_rng',
+                                           'validation', 'validation_steps',
+                                           'lazy_grounding', 'alias_sampling'}
+        use_cache = cache is not None and restorable
+        if restorable and compiled is not None:
+            if self.logger is not None:
+                source = 'compiled_info' if cache is None else cache.path(cache_key)
+                self.logger.log(f'[info] restored compiled model from {source}\n')
+            self.sampler = RDDLSimulatorPrecompiled(
+                self.model,
+                init_values=compiled['init_values'],
+                levels=compiled['levels'],
+                trace_info=compiled['traced'],
+                logger=self.logger,
+                keep_tensors=self.vectorized,
+                **backend_kwargs)
+        else:
+            self.sampler = backend(self.model,
+                                   logger=self.logger,
+                                   keep_tensors=self.vectorized,
+                                   **backend_kwargs)
         
-        # compute the bounds on fluents from the constraints
-        constraints = RDDLConstraints(self.sampler, vectorized=self.vectorized)
-        self._bounds = constraints.bounds
+        # compute the bounds on fluents from the constraints, and the check of
+        # the invariants that are box constraints
+        bounds_key = 'bounds_vectorized' if self.vectorized else 'bounds'
+        if restorable and compiled is not None and bounds_key in compiled:
+            self._bounds = compiled[bounds_key]
+            box_invariants = compiled.get('box_invariants', None)
+        else:
+            constraints = RDDLConstraints(self.sampler, vectorized=self.vectorized)
+            self._bounds = constraints.bounds
+            box_invariants = constraints.box_invariants()
+        self.sampler.box_invariants = box_invariants
+        if self.logger is not None:
+            self.logger.flush()
+        
+        # save the compiled information to the cache
+        if use_cache and (compiled is None or bounds_key not in compiled):
+            if compiled is None:
+                compiled = {}
+            compiled.update(self.compiled_info())
+            cache.save(cache_key, compiled)
         self._shapes = {var: np.shape(values[0]) 
                         for (var, values) in self._bounds.items()}
         
@@ -132,6 +228,21 @@ class RDDLEnv(gym.Env):
             
         self.action_space = self._rddl_to_gym_bounds(self._action_ranges)
         
+        # flat observations and actions are laid out in contiguous vectors
+        if self.flat:
+            self._observ_layout, self.observation_names, self.observation_space = \
+                self._compile_flat_layout(state_ranges)
+            self._action_layout, self.action_names, self.action_space = \
+                self._compile_flat_layout(self._action_ranges)
+            self._flat_obs = np.zeros(shape=self.observation_space.shape,
+                                      dtype=self.observation_space.dtype)
+            self._flat_noop_actions = np.zeros(shape=self.action_space.shape,
+                                               dtype=self.action_space.dtype)
+            for (var, (start, stop, _, _)) in self._action_layout.items():
+                self._flat_noop_actions[start:stop] = np.ravel(self._noop_actions[var])
+            self._flat_obs_view = self._flat_obs.view()
+            self._flat_obs_view.flags.writeable = False
+        
         # set the visualizer
         self._visualizer = ChartVisualizer(self.model)
         self._movie_generator = None
@@ -189,6 +300,96 @@ class RDDLEnv(gym.Env):
                 
         return result
     
+    def _compile_flat_layout(self, ranges):
+        '''Assigns each fluent a contiguous slice of a flat vector in the order 
+        of ranges, and returns the slices, the grounded names of the entries of 
+        the vector and the Box space of the vector. The vector is integer-valued
+        unless some fluent is real-valued.'''
+        model = self.model
+        layout, names, lows, highs = {}, [], [], []
+        is_real = False
+        start = 0
+        for (var, prange) in ranges.items():
+            shape = self._shapes[var]
+            if prange in model.enum_types:
+                low, high = 0, len(model.type_to_objects[prange]) - 1
+                dtype = np.int64
+            elif prange == 'bool':
+                low, high = 0, 1
+                dtype = np.bool_
+            elif prange == 'int':
+                low, high = self._bounds[var]
+                dtype = np.int64
+            elif prange == 'real':
+                low, high = self._bounds[var]
+                dtype = np.float64
+                is_real = True
+            else:
+                raise RDDLTypeError(
+                    f'Type <{prange}> of fluent <{var}> is not valid, '
+                    f'must be an enumerated or primitive type (real, int, bool).')
+            stop = start + int(np.prod(shape, dtype=np.int64))
+            layout[var] = (start, stop, shape, dtype)
+            names.extend(model.variable_groundings[var])
+            lows.append(np.ravel(np.broadcast_to(low, shape)))
+            highs.append(np.ravel(np.broadcast_to(high, shape)))
+            start = stop
+        
+        low = np.concatenate(lows) if lows else np.zeros((0,))
+        high = np.concatenate(highs) if highs else np.zeros((0,))
+        if is_real:
+            space = Box(low, high, dtype=np.float64)
+        else:
+            info = np.iinfo(np.int32)
+            low = np.clip(low, info.min, info.max).astype(np.int32)
+            high = np.clip(high, info.min, info.max).astype(np.int32)
+            space = Box(low, high, dtype=np.int32)
+        return layout, names, space
+    
+    def _flatten_obs(self, obs):
+        buffer = self._flat_obs
+        for (var, (start, stop, _, _)) in self._observ_layout.items():
+            value = obs[var]
+            if value is None:
+                buffer[start:stop] = 0
+            else:
+                buffer[start:stop] = np.ravel(value)
+        if self.zero_copy:
+            return self._flat_obs_view
+        return buffer.copy()
+    
+    def _unflatten_actions(self, actions):
+        actions = np.asarray(actions)
+        if actions.shape != self.action_space.shape:
+            raise RDDLInvalidActionError(
+                f'Flat action vector must be of shape {self.action_space.shape}, '
+                f'got array of shape {actions.shape}.')
+        is_float = np.issubdtype(actions.dtype, np.floating)
+        result = {}
+        for (var, (start, stop, shape, dtype)) in self._action_layout.items():
+            values = actions[start:stop]
+            if dtype is np.bool_:
+                values = values != 0
+            elif dtype is np.int64 and is_float:
+                values = np.rint(values).astype(dtype)
+            else:
+                values = values.astype(dtype)
+            result[var] = values.reshape(shape)
+        return result
+    
+    def compiled_info(self) -> typing.Dict[str, Any]:
+        '''Returns the compiled information of the domain and instance (i.e.
+        the model, initial values, CPF levels, traced information and bounds),
+        from which other environments of the same domain and instance can be 
+        created without compiling them again (see the compiled_info argument).'''
+        bounds_key = 'bounds_vectorized' if self.vectorized else 'bounds'
+        return {'model': self.model,
+                'init_values': self.sampler.init_values,
+                'levels': self.sampler.levels,
+                'traced': self.sampler.traced,
+                bounds_key: self._bounds,
+                'box_invariants': self.sampler.box_invariants}
+        
     def seed(self, seed: Optional[int]=None) -> List[Optional[int]]:
         self.sampler.seed(seed)
         return [seed]
@@ -214,7 +415,12 @@ class RDDLEnv(gym.Env):
         self.to_render = False
     
     def _fix_boolean_actions(self, actions):
-        fixed_actions = self._noop_actions.copy()
+        
+        # the simulator fills in the default actions itself
+        if self.zero_copy:
+            fixed_actions = {}
+        else:
+            fixed_actions = self._noop_actions.copy()
         for (var, values) in actions.items():
             if self._action_ranges.get(var, '') == 'bool':
                 if np.shape(values):
@@ -234,8 +440,13 @@ class RDDLEnv(gym.Env):
                 'current episode has terminated or truncated: please call reset().')
             
         # fix actions and check constraints
-        actions = self._fix_boolean_actions(actions)
-        sampler.check_default_action_count(actions, self.enforce_count_non_bool)
+        if self.flat:
+            actions = self._unflatten_actions(actions)
+        else:
+            actions = self._fix_boolean_actions(actions)
+        validating = sampler.validating
+        if validating:
+            sampler.check_default_action_count(actions, self.enforce_count_non_bool)
         if self.enforce_action_constraints:
             sampler.check_action_preconditions(actions, silent=False)
         
@@ -244,16 +455,17 @@ class RDDLEnv(gym.Env):
         self.state = sampler.states
             
         # produce array outputs for vectorized option
-        if self.vectorized:
+        if self.vectorized and not self.flat:
             obs = {var: np.atleast_1d(value) for (var, value) in obs.items()}
             
-        # check if the state invariants are satisfied
+        # check if the state invariants are satisfied, which is also done in
+        # steps that are not validated since violations truncate the episode
         truncated = not sampler.check_state_invariants(silent=True)
         self.done = terminated or truncated
             
         # log to file
         if self.simlogger is not None:
-            if self.vectorized:
+            if self.vectorized and isinstance(self.simlogger, SimLogger):
                 log_obs = self.model.ground_vars_with_values(obs)
                 log_action = self.model.ground_vars_with_values(actions)
             else:
@@ -267,6 +479,8 @@ class RDDLEnv(gym.Env):
             truncated = True
             self.done = True
         
+        if self.flat:
+            obs = self._flatten_obs(obs)
         return obs, reward, terminated, truncated, {}
 
     def reset(self, seed: Optional[int]=None, 
@@ -283,7 +497,9 @@ class RDDLEnv(gym.Env):
         self.timestep = 0
         
         # produce array outputs for vectorized option
-        if self.vectorized:
+        if self.flat:
+            obs = self._flatten_obs(obs)
+        elif self.vectorized:
             obs = {var: np.atleast_1d(value) for (var, value) in obs.items()}
             
         # update movie generator
@@ -303,10 +519,7 @@ class RDDLEnv(gym.Env):
         
         # logging
         if self.simlogger:
-            text = ('######################################################\n'
-                    'New Trial\n'
-                    '######################################################')
-            self.simlogger.log_free(text)
+            self.simlogger.start_episode()
             
         return obs, {}
 
@@ -349,8 +562,11 @@ class RDDLEnv(gym.Env):
         return image
     
     def close(self) -> None:
+        self.sampler.close()
         if self.simlogger:
             self.simlogger.close()
+        if self.logger is not None:
+            self.logger.close()
         
         # close rendering and save animation  
         if self.to_render:
@@ -0,0 +1,193 @@
+import numpy as np
+from typing import Dict, Optional
+
+from pyRDDLGym.core.compiler.initializer import RDDLValueInitializer
+from pyRDDLGym.core.compiler.model import RDDLPlanningModel
+from pyRDDLGym.core.constraints import RDDLConstraints
+from pyRDDLGym.core.debug.exception import raise_warning
+from pyRDDLGym.core.debug.logger import Logger
+from pyRDDLGym.core.intervals import Bounds, RDDLIntervalAnalysis
+from pyRDDLGym.core.simulator import RDDLSimulator
+
+
+class RDDLMemoryAnalysis:
+    '''Reports the memory used by the tensors of the pvariables of a RDDL
+    domain and instance, and computes the narrowest dtypes that can hold the
+    values of the fluents.
+    '''
+
+    # candidate integer types, from the narrowest to the widest
+    INT_TYPES = (np.int8, np.int16, np.int32)
+
+    # the variable types whose tensors can be narrowed
+    NARROW_VARIABLE_TYPES = {'non-fluent', 'state-fluent', 'interm-fluent',
+                             'derived-fluent', 'observ-fluent'}
+
+    def __init__(self, rddl: RDDLPlanningModel,
+                 logger: Optional[Logger]=None) -> None:
+        '''Creates a new memory analysis for the given RDDL domain.
+
+        :param rddl: the RDDL domain to analyze
+        :param logger: to log information about the analysis to file
+        '''
+        self.rddl = rddl
+        self.logger = logger
+
+    def footprint(self, values: Optional[Dict[str, object]]=None) -> Dict[str, int]:
+        '''Returns a dictionary mapping each pvariable to the number of bytes
+        of its tensor.
+
+        :param values: the tensors of the pvariables, defaults to the initial
+        values computed by RDDLValueInitializer
+        '''
+        if values is None:
+            values = RDDLValueInitializer(self.rddl).initialize()
+        return {var: RDDLValueInitializer.nbytes(value)
+                for (var, value) in values.items()}
+
+    def narrow_dtypes(self, use_float32: bool=False,
+                      action_bounds: Optional[Bounds]=None) -> Dict[str, type]:
+        '''Returns a dictionary mapping each fluent and non-fluent that can be
+        stored in a narrower dtype than the default to that dtype.
+
+        Integer and enum-valued pvariables are stored in the narrowest of int8,
+        int16 and int32 that contains the bounds computed by
+        RDDLIntervalAnalysis over the horizon, and real-valued pvariables
+        optionally in float32. The dtype of each state-fluent also applies to
+        its next-state fluent. Action-fluents and unbounded pvariables keep
+        their default dtypes, as do all integer-valued pvariables if the 
+        interval analysis fails on the domain.
+
+        :param use_float32: whether to store real-valued pvariables in float32,
+        which loses precision
+        :param action_bounds: optional bounds on action fluents that are passed
+        to the interval analysis, which default to the box bounds implied by 
+        the action-preconditions (see action_bounds())
+        '''
+        rddl = self.rddl
+        if action_bounds is None:
+            action_bounds = self.action_bounds()
+        try:
+            bounds = RDDLIntervalAnalysis(rddl, logger=self.logger).bound(
+                action_bounds=action_bounds, per_epoch=False)
+        except Exception as error:
+            raise_warning(f'Integer-valued pvariables keep their default dtype, '
+                          f'since their bounds could not be computed: {error}')
+            bounds = {}
+
+        dtypes = {}
+        for (var, prange) in rddl.variable_ranges.items():
+            if rddl.variable_types[var] not in \
+            RDDLMemoryAnalysis.NARROW_VARIABLE_TYPES:
+                continue
+            if prange == 'real':
+                if use_float32:
+                    dtypes[var] = np.float32
+            elif prange in rddl.enum_types:
+                dtypes[var] = self._narrow_int(0, len(rddl.type_to_objects[prange]) - 1)
+            elif prange == 'int':
+                names = [var, rddl.next_state.get(var, var)]
+                try:
+                    lower = min(np.min(bounds[name][0]) for name in names)
+                    upper = max(np.max(bounds[name][1]) for name in names)
+                except (KeyError, TypeError, ValueError):
+                    continue
+                if np.isfinite(lower) and np.isfinite(upper):
+                    dtypes[var] = self._narrow_int(lower, upper)
+        dtypes = {var: dtype for (var, dtype) in dtypes.items() if dtype is not None}
+
+        # next-state fluents are stored with the same dtype as their state
+        for (state, next_state) in rddl.next_state.items():
+            if state in dtypes:
+                dtypes[next_state] = dtypes[state]
+
+        if self.logger is not None:
+            def _message():
+                message = '[info] computed narrow dtypes of pvariables:\n'
+                for (var, dtype) in dtypes.items():
+                    message += f'\t{var}: {np.dtype(dtype).name}\n'
+                return message
+            self.logger.log(_message, Logger.INFO)
+        return dtypes
+
+    def action_bounds(self) -> Bounds:
+        '''Returns the bounds on every action-fluent implied by the box
+        action-preconditions (see RDDLConstraints), and by the ranges of
+        bool and enum-valued action-fluents. Actions without finite bounds are
+        bounded by [-inf, inf], so that fluents that depend on them are never
+        narrowed.'''
+        rddl = self.rddl
+        try:
+            bounds = RDDLConstraints(RDDLSimulator(rddl), vectorized=True).bounds
+        except Exception as error:
+            raise_warning(f'Action-fluents are assumed to be unbounded, '
+                          f'since their bounds could not be computed: {error}')
+            bounds = {}
+        
+        action_bounds = {}
+        for var in rddl.action_fluents:
+            shape = rddl.object_counts(rddl.variable_params[var])
+            lower, upper = bounds.get(var, (-np.inf, np.inf))
+            lower = np.broadcast_to(np.asarray(lower, dtype=np.float64), shape)
+            upper = np.broadcast_to(np.asarray(upper, dtype=np.float64), shape)
+            prange = rddl.variable_ranges[var]
+            if prange == 'bool':
+                lower, upper = np.maximum(lower, 0), np.minimum(upper, 1)
+            elif prange in rddl.enum_types:
+                count = len(rddl.type_to_objects[prange])
+                lower, upper = np.maximum(lower, 0), np.minimum(upper, count - 1)
+            action_bounds[var] = (lower, upper)
+        return action_bounds
+
+    @staticmethod
+    def _narrow_int(lower, upper):
+        for dtype in RDDLMemoryAnalysis.INT_TYPES:
+            info = np.iinfo(dtype)
+            if info.min <= lower and upper <= info.max:
+                return dtype
+        return None
+
+    def report(self, values: Optional[Dict[str, object]]=None,
+               dtypes: Optional[Dict[str, type]]=None) -> str:
+        '''Returns a text report of the bytes used by the tensor of every
+        pvariable, sorted by decreasing size, with the totals per variable type.
+
+        :param values: the tensors of the pvariables, defaults to the initial
+        values computed by RDDLValueInitializer
+        :param dtypes: optional narrow dtypes (e.g. from narrow_dtypes()), in
+        which case the bytes used with these dtypes are also reported
+        '''
+        rddl = self.rddl
+        if values is None:
+            values = RDDLValueInitializer(rddl).initialize()
+        if dtypes is None:
+            dtypes = {}
+
+        rows, totals = [], {}
+        for (var, value) in values.items():
+            vtype = rddl.variable_types[var]
+            size = RDDLValueInitializer.nbytes(value)
+            dtype = np.dtype(getattr(value, 'dtype', type(value)))
+            narrow = np.dtype(dtypes.get(var, dtype))
+            count = getattr(value, 'nnz', np.size(value))
+            narrow_size = size + count * (narrow.itemsize - dtype.itemsize)
+            rows.append((var, vtype, np.shape(value), dtype.name, size,
+                         narrow.name, narrow_size))
+            total, narrow_total = totals.get(vtype, (0, 0))
+            totals[vtype] = (total + size, narrow_total + narrow_size)
+        rows.sort(key=lambda row: -row[4])
+
+        lines = [f'{"pvariable":<32} {"type":<17} {"shape":<16} {"dtype":<8} '
+                 f'{"bytes":>12} {"narrow":<8} {"bytes":>12}']
+        for (var, vtype, shape, dtype, size, narrow, narrow_size) in rows:
+            lines.append(f'{var[:32]:<32} {vtype:<17} {str(shape)[:16]:<16} '
+                         f'{dtype:<8} {size:>12} {narrow:<8} {narrow_size:>12}')
+        lines.append('')
+        for (vtype, (total, narrow_total)) in sorted(totals.items()):
+            lines.append(f'{"total":<32} {vtype:<17} {"":<16} {"":<8} '
+                         f'{total:>12} {"":<8} {narrow_total:>12}')
+        total = sum(total for (total, _) in totals.values())
+        narrow_total = sum(narrow_total for (_, narrow_total) in totals.values())
+        lines.append(f'{"total":<32} {"":<17} {"":<16} {"":<8} '
+                     f'{total:>12} {"":<8} {narrow_total:>12}')
+        return '\n'.join(lines)
@@ -2,9 +2,13 @@
 # https://github.com/thiagopbueno/pyrddl
 # it was adapted and extended for pyRDDLGym
 
+import hashlib
+import importlib.util
 import logging
 import os
 import tempfile
+import threading
+import ply
 from ply import lex, yacc
 
 from pyRDDLGym.core.parser.rddl import RDDL
@@ -15,6 +19,7 @@ from pyRDDLGym.core.parser.pvariable import PVariable
 from pyRDDLGym.core.parser.expr import Expression
 from pyRDDLGym.core.parser.cpf import CPF
 from pyRDDLGym.core.debug.exception import RDDLParseError
+from pyRDDLGym.core.paths import ply_table_dir
 
 alpha = r'[A-Za-z]'
 digit = r'[0-9]'
@@ -25,6 +30,54 @@ variable = r'\?(' + alpha + r'|' + digit + r'|\-|\_)*(' + alpha + r'|' + digit +
 enum_value = r'\@(' + alpha + r'|' + digit + r'|\-|\_)*(' + alpha + r'|' + digit + r')'
 
 
+# ===========================================================================
+# lexer and parser tables
+# ===========================================================================
+
+def _table_dir():
+    '''Returns the directory where the generated lexer and parser tables are 
+    stored, or None if writing them is disabled or it cannot be created.'''
+    table_dir = ply_table_dir()
+    if table_dir is None:
+        return None
+    try:
+        os.makedirs(table_dir, exist_ok=True)
+    except OSError:
+        return None
+    return table_dir
+
+
+def _table_name(prefix, module):
+    '''Returns the name of the table module for the given lexer or parser 
+    object, which includes a hash of its grammar so that tables generated for 
+    an older grammar or version of ply are never loaded.'''
+    digest = hashlib.sha256(ply.__version__.encode('utf-8'))
+    digest.update(repr(sorted(module.tokens)).encode('utf-8'))
+    digest.update(repr(getattr(module, 'precedence', None)).encode('utf-8'))
+    for name in sorted(dir(module)):
+        if name.startswith(('t_', 'p_')):
+            value = getattr(module, name)
+            if callable(value):
+                value = getattr(value, 'regex', value.__doc__)
+            digest.update(f'{name}={value!r}'.encode('utf-8'))
+    return f'{prefix}_{digest.hexdigest()[:16]}'
+
+
+def _load_table(name, table_dir):
+    '''Loads the table module with the given name from the table directory,
+    returning None if it does not exist or is not readable.'''
+    path = os.path.join(table_dir, f'{name}.py')
+    if not os.path.isfile(path):
+        return None
+    try:
+        spec = importlib.util.spec_from_file_location(name, path)
+        module = importlib.util.module_from_spec(spec)
+        spec.loader.exec_module(module)
+    except Exception:
+        return None
+    return module
+
+
 class RDDLlex(object):
 
     def __init__(self):
@@ -219,11 +272,21 @@ class RDDLlex(object):
         t.lexer.skip(1)
 
     def build(self, **kwargs):
+        
+        # load the lexer table from the table directory or generate it there
+        table_dir = None if kwargs else _table_dir()
+        if table_dir is not None:
+            name = _table_name('rddl_lextab', self)
+            table = _load_table(name, table_dir)
+            kwargs = {'optimize': True, 
+                      'lextab': name if table is None else table, 
+                      'outputdir': table_dir}
         self._lexer = lex.lex(object=self, **kwargs)
 
     def input(self, data):
-        if self._lexer is None:
+        if getattr(self, '_lexer', None) is None:
             self.build()
+        self._lexer.lineno = 1
         self._lexer.input(data)
 
     def token(self):
@@ -266,6 +329,7 @@ class RDDLParser(object):
         )
         self.parsing_logfile = None
         self.debugging = False
+        self._lock = threading.RLock()
 
     def p_rddl(self, p):
         '''rddl : rddl_block'''
@@ -1080,17 +1144,68 @@ class RDDLParser(object):
         raise RDDLParseError(exception_str)
 
     def build(self, **kwargs):
-        self._parser = yacc.yacc(module=self, **kwargs)
+        if kwargs:
+            self._parser = yacc.yacc(module=self, **kwargs)
+            return
+        
+        # the table is generated in memory only if it cannot be stored
+        table_dir = _table_dir()
+        if table_dir is None:
+            self._parser = yacc.yacc(module=self, write_tables=False, debug=False)
+            return
+        
+        # load the pickled parser table from the table directory
+        name = _table_name('rddl_parsetab', self)
+        path = os.path.join(table_dir, f'{name}.pickle')
+        if os.path.isfile(path):
+            try:
+                self._parser = yacc.yacc(
+                    module=self, picklefile=path, optimize=True, debug=False)
+                return
+            except Exception:
+                pass
+        
+        # otherwise generate it, and move it into place once it is complete 
+        # so other processes never read a partially written table
+        temp_path = f'{path}.{os.getpid()}.tmp'
+        self._parser = yacc.yacc(
+            module=self, picklefile=temp_path, optimize=True, debug=False)
+        try:
+            os.replace(temp_path, path)
+        except OSError:
+            pass
 
     def parse(self, input):
-        self._input = input
-        if self.debugging:
-            self.parsing_logfile = os.path.join(tempfile.gettempdir(), 'rddl_parse.log')
-            log = logging.getLogger(__name__)
-            log.addHandler(logging.FileHandler(self.parsing_logfile))
-            return self._parser.parse(input=input, lexer=self.lexer, debug=log)
-        return self._parser.parse(input=input, lexer=self.lexer)
+        with self._lock:
+            self._input = input
+            if self.debugging:
+                self.parsing_logfile = os.path.join(tempfile.gettempdir(), 'rddl_parse.log')
+                log = logging.getLogger(__name__)
+                log.addHandler(logging.FileHandler(self.parsing_logfile))
+                return self._parser.parse(input=input, lexer=self.lexer, debug=log)
+            return self._parser.parse(input=input, lexer=self.lexer)
 
     def _print_verbose(self, p_name):
         if self._verbose:
             print('>> Parsed `{}` ...'.format(p_name))
+
+
+# ===========================================================================
+# shared parser
+# ===========================================================================
+
+_SHARED_PARSER = None
+_SHARED_PARSER_LOCK = threading.Lock()
+
+
+def shared_parser() -> RDDLParser:
+    '''Returns a parser instance that is shared by the whole process, which 
+    is built on the first call. Parsing with the shared parser is serialized 
+    by a lock, so it is safe to call from multiple threads.'''
+    global _SHARED_PARSER
+    with _SHARED_PARSER_LOCK:
+        if _SHARED_PARSER is None:
+            parser = RDDLParser(lexer=None, verbose=False)
+            parser.build()
+            _SHARED_PARSER = parser
+    return _SHARED_PARSER
@@ -0,0 +1,34 @@
+import os
+from typing import Optional
+
+# environment variable that overrides the default location of the cache
+CACHE_DIR_VARIABLE = 'PYRDDLGYM_CACHE_DIR'
+
+# environment variable that disables writing the lexer and parser tables of the
+# RDDL grammar to disk when it is set to one of DISABLED_VALUES
+PLY_TABLES_VARIABLE = 'PYRDDLGYM_PLY_TABLES'
+DISABLED_VALUES = ('0', 'false', 'off', 'no')
+
+
+def default_cache_dir() -> str:
+    '''Returns the default directory of the compilation cache, which is read
+    from the PYRDDLGYM_CACHE_DIR environment variable if it is set, and
+    otherwise is a pyRDDLGym folder in the user cache directory.'''
+    cache_dir = os.environ.get(CACHE_DIR_VARIABLE, None)
+    if cache_dir is None:
+        root = os.environ.get('XDG_CACHE_HOME', None)
+        if root is None:
+            root = os.path.join(os.path.expanduser('~'), '.cache')
+        cache_dir = os.path.join(root, 'pyRDDLGym')
+    return cache_dir
+
+
+def ply_table_dir() -> Optional[str]:
+    '''Returns the directory where the lexer and parser tables of the RDDL
+    grammar are stored, which is the ply folder of the default cache directory,
+    or None if writing the tables is disabled by the PYRDDLGYM_PLY_TABLES
+    environment variable.'''
+    value = os.environ.get(PLY_TABLES_VARIABLE, '')
+    if value.strip().lower() in DISABLED_VALUES:
+        return None
+    return os.path.join(default_cache_dir(), 'ply')
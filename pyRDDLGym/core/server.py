@@ -1,184 +1,199 @@
+import asyncio
 import base64
+from concurrent.futures import ThreadPoolExecutor
+import itertools
 import json
+import numpy as np
+import os
 import socket
+from typing import Dict, Optional
 import xml.etree.ElementTree as xmltree
 
 from pyRDDLGym.core.compiler.model import RDDLPlanningModel
+from pyRDDLGym.core.debug.exception import RDDLSessionError
+from pyRDDLGym.core.debug.trajectory import RDDLTrajectoryWriter
 from pyRDDLGym.core.env import RDDLEnv
 
 
-class RDDLSimServer:
-    """Creates a TCP/IP server that listens to the provided port and passes
-    messages between a pyRDDLGym environment and a client that is
-    designed to interact with rddlsim (https://github.com/ssanner/rddlsim)."""
-
-    def __init__(self, domain: str, instance: str, numrounds: int, time: int, 
-                 port: int=2323):
-        # concatenate domain and instance files
-        f = open(domain)
-        self.task = f.read()
-        f.close()
-        f = open(instance)
-        self.task = self.task + f.read()
-        f.close()
-
-        # encode task
-        print("INFO: Encoding task for sharing in TCP connections...", flush=True)
-        self.task = base64.b64encode(str.encode(self.task))
-        self.task = self.task.decode("ascii")
-
-        # create RDDLEnv
-        print("INFO: Creating RDDL environment...", flush=True)
-        self.env = RDDLEnv(domain=domain, instance=instance)
-        print("INFO: Created RDDL environment.\n", flush=True)
-        # initialize RDDLSimAgent
+def fluent_templates(model: RDDLPlanningModel) -> Dict[str, str]:
+    """Returns a dictionary mapping the grounded name of every state-fluent
+    and observ-fluent of the model to the beginning of its observed-fluent
+    element in a state message, up to its value."""
+    templates = {}
+    for var in itertools.chain(model.state_fluents, model.observ_fluents):
+        for key in model.variable_groundings[var]:
+            templates[key] = _fluent_template(key)
+    return templates
+
+
+def _fluent_template(key):
+    fluent_name, *objects = key.split(RDDLPlanningModel.FLUENT_SEP)
+    objects = RDDLPlanningModel.FLUENT_SEP.join(objects)
+    objects = objects.split(RDDLPlanningModel.OBJECT_SEP)
+    args = "".join(f"<fluent-arg>{object}</fluent-arg>" for object in objects)
+    return (f"<observed-fluent><fluent-name>{fluent_name}</fluent-name>"
+            f"{args}<fluent-value>")
+
+
+def _json_value(value):
+    if isinstance(value, np.generic):
+        return value.item()
+    return value
+
+
+class RDDLMessageBuffer:
+    """Collects the bytes received from a client and splits them into the 
+    messages of the client, which are terminated by a null character."""
+
+    def __init__(self):
+        self.buffer = bytearray()
+        self._scanned = 0
+
+    def feed(self, data) -> None:
+        """Appends the given received bytes to the buffer."""
+        self.buffer += data
+
+    def pop(self) -> Optional[str]:
+        """Removes and returns the first complete message in the buffer, or 
+        returns None if the buffer does not contain a complete message."""
+        buffer = self.buffer
+        end = buffer.find(b"\0", self._scanned)
+        if end < 0:
+            self._scanned = len(buffer)
+            return None
+        message = buffer[:end].decode("UTF-8")
+        del buffer[:end + 1]
+        self._scanned = 0
+        return message
+
+
+def _advance(messages, data=None):
+    """Resumes a session with the given message from the client, and returns
+    the next request of the session, or None if the session has ended."""
+    try:
+        return messages.send(data)
+    except StopIteration:
+        return None
+
+
+class RDDLSimSession:
+    """Holds the state of a session between a pyRDDLGym environment and a
+    client that is designed to interact with rddlsim, and implements the
+    messages of the session independently of how they are transmitted."""
+
+    # requests the next message from the client
+    RECEIVE = object()
+
+    def __init__(self, env: RDDLEnv, task: str, numrounds: int, time: int,
+                 session_id: int=0, templates: Optional[Dict[str, str]]=None,
+                 writer: Optional[RDDLTrajectoryWriter]=None):
+        if templates is None:
+            templates = fluent_templates(env.model)
+        self.env = env
+        self.templates = templates
+        self.task = task
         self.roundsleft = numrounds
         self.currentround = 0
         self.time = time
-        self.address = ("127.0.0.1", port)
+        self.session_id = session_id
         self.client = ""
         self.problem = ""
         self.total_reward = 0.0
 
-        # Data in case there is a dump request
+        # Data in case there is a dump request, which is only kept in memory
+        # if the trajectory is not streamed to disk by the writer
+        self.writer = writer
         self.logs = []
 
-    def run(self):
-        """Starts the RDDLSimAgent to wait for a planner to connect."""
-
-        print("INFO: Establishing socket...", flush=True)
-        sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
-
-        with sock:
-            # Force the connection to this port (sometimes it stays locked after repeated runs).
-            # https://stackoverflow.com/questions/4465959/python-errno-98-address-already-in-use
-            print("INFO: Forcing connection...", flush=True)
-            sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
-
-            sock.bind(self.address)
-            print(f"INFO: Listening at address {self.address[0]} "
-                  f"with port {self.address[1]}.\n", flush=True)
-            sock.listen(1)
-            connection, client_address = sock.accept()
-            with connection:
-                self.run_session(connection)
-            connection.close()
-            
-        sock.close()
-        self.env.close()
-        print("INFO: Socket closed.\n", flush=True)
-
-    def run_session(self, connection):
-        """Runs an interactive session between the pyRDDLGym environment
-        and a connected rddlsim client and terminates afterwards."""
+    def messages(self):
+        """Returns a generator that runs the session: it yields every message
+        to send to the client, or RECEIVE when it expects the next message from
+        the client, which must then be passed to it with send()."""
 
         # handle session request
-        data = self.receive_message(connection)
+        data = yield RDDLSimSession.RECEIVE
         self.process_init_session_request(data)
         print(f"INFO: Session request received from {self.client} "
               f"for {self.problem}.", flush=True)
-        msg = self.build_session_request_msg()
-        self.send_message(connection, msg)
-        session_request_expected = False
+        yield self.build_session_request_msg()
         print("INFO: Session initialized.\n", flush=True)
 
         while self.roundsleft > 0:
-            self.run_round(connection)
+            yield from self.round_messages()
+
+        yield self.build_session_end_msg()
 
-        msg = self.build_session_end_msg()
-        self.send_message(connection, msg)
+    def summary(self):
+        """Returns a summary of the session, which does not hold its logs."""
+        return {"session_id": self.session_id, "client": self.client,
+                "problem": self.problem, "rounds": self.currentround,
+                "total_reward": float(self.total_reward)}
 
-    def run_round(self, connection):
-        self.logs.append([])
+    def close(self):
+        """Writes the remaining records of the trajectory, if any."""
+        if self.writer is not None:
+            self.writer.close()
+
+    def round_messages(self):
+        writer = self.writer
+        if writer is None:
+            self.logs.append([])
 
         # handle round request
-        data = self.receive_message(connection)
+        data = yield RDDLSimSession.RECEIVE
         self.process_round_request(data)
         print(f"INFO: Starting round {self.currentround}...", flush=True)
-        msg = self.build_round_request_msg()
-        self.send_message(connection, msg)
+        yield self.build_round_request_msg()
 
         # initialize round
         state, _ = self.env.reset()
         round_reward = 0.0
         turn = 1
-        msg = self.build_state_msg(state, turn, 0.0)
-        self.send_message(connection, msg)
+        yield self.build_state_msg(state, turn, 0.0)
 
         # run round
         while True:
-            data = self.receive_message(connection)
+            data = yield RDDLSimSession.RECEIVE
             actions = self.process_action(data)
 
-            self.logs[-1].append({
-                "state": json.loads(
-                    str(state)
-                    .replace('\'', '"')
-                    .replace('np.True_', 'true')
-                    .replace('np.False_', 'false')
-                    .replace('True', 'true')
-                    .replace('False', 'false')
-                ),
-                "actions": json.loads(
-                    str(actions)
-                    .replace('\'', '"')
-                    .replace('"true"', 'true')
-                ),
-            })
-
             next_state, reward, _, _, _ = self.env.step(actions)
 
-            self.logs[-1][-1]["reward"] = float(reward)
+            if writer is None:
+                self.logs[-1].append({
+                    "state": {key: _json_value(value)
+                              for (key, value) in state.items()},
+                    "actions": {key: (True if value == "true" else value)
+                                for (key, value) in actions.items()},
+                    "reward": float(reward)
+                })
+            else:
+                writer.write(self.currentround, turn, state, actions, reward)
 
             round_reward += reward
             state = next_state
 
             turn = turn + 1
             if turn == self.env.horizon:
-                msg = self.build_round_end_msg(reward, round_reward)
-                self.send_message(connection, msg)
+                yield self.build_round_end_msg(reward, round_reward)
                 self.total_reward += round_reward
 
-                self.logs[-1].append({
-                    "state": json.loads(
-                        str(state)
-                        .replace('\'', '"')
-                        .replace('np.True_', 'true')
-                        .replace('np.False_', 'false')
-                        .replace('True', 'true')
-                        .replace('False', 'false')),
-                    "actions": False,
-                    "round_reward": float(round_reward)
-                })
+                if writer is None:
+                    self.logs[-1].append({
+                        "state": {key: _json_value(value)
+                                  for (key, value) in state.items()},
+                        "actions": False,
+                        "round_reward": float(round_reward)
+                    })
+                else:
+                    writer.end_round(self.currentround, turn, state)
                 break
 
-            msg = self.build_state_msg(state, turn, reward)
-            self.send_message(connection, msg)
-
-    def dump_data(self, fn):
-        """Dumps the data to a json file."""
-        with open(fn, "w") as f:
-            json.dump(self.logs, f)
-
-    def send_message(self, connection, msg):
-        # print(f"sending message: {msg}")
-        connection.send(str.encode(msg))
-
-    def receive_message(self, connection):
-        data = connection.recv(8192)
-        if data:
-            data = data.decode("UTF-8")
-            data = data[:-1]
-            # print(f"received message: {data}")
-        else:
-            print("FATAL: connection lost.")
-            exit(1)
-        return data
+            yield self.build_state_msg(state, turn, reward)
 
     def build_session_request_msg(self):
         msg = "<session-init>"
         msg = msg + "<task>" + str(self.task) + "</task>"
-        msg = msg + "<session-id>0</session-id>"
+        msg = msg + "<session-id>" + str(self.session_id) + "</session-id>"
         msg = msg + "<num-rounds>" + str(self.roundsleft) + "</num-rounds>"
         msg = msg + "<time-allowed>" + str(self.time) + "</time-allowed>"
         msg = msg + "</session-init>"
@@ -189,30 +204,22 @@ class RDDLSimServer:
         msg = msg + "<round-num>" + str(self.currentround) + "</round-num>"
         msg = msg + "<time-left>1000</time-left>"
         msg = msg + "<rounds-left>" + str(self.roundsleft) + "</rounds-left>"
-        msg = msg + "<sessionID>0</sessionID>"
+        msg = msg + "<sessionID>" + str(self.session_id) + "</sessionID>"
         msg = msg + "</round-init>"
         return msg
 
     def build_state_msg(self, state, turn, rew):
-        # print(state)
-        msg = "<turn>"
-        msg = msg + "<turn-num>" + str(turn) + "</turn-num>"
-        msg = msg + "<time-left>1000</time-left>"
-        msg = msg + "<immediate-reward>" + str(rew) + "</immediate-reward>"
-        for key in state:
-            msg = msg + "<observed-fluent>"
-            fluent_name = key.split(RDDLPlanningModel.FLUENT_SEP)[0]
-            objects = key.split(RDDLPlanningModel.FLUENT_SEP)[1:]
-            objects = RDDLPlanningModel.FLUENT_SEP.join(objects)
-            objects = objects.split(RDDLPlanningModel.OBJECT_SEP)
-            var = key.split("_")
-            msg = msg + "<fluent-name>" + fluent_name + "</fluent-name>"
-            for object in objects:
-                msg = msg + "<fluent-arg>" + object + "</fluent-arg>"
-            msg = msg + "<fluent-value>" + str(state[key]).lower() + "</fluent-value>"
-            msg = msg + "</observed-fluent>"
-        msg = msg + "</turn>"
-        return msg
+        # the element of each fluent is filled into its precomputed template
+        templates = self.templates
+        parts = [f"<turn><turn-num>{turn}</turn-num><time-left>1000</time-left>"
+                 f"<immediate-reward>{rew}</immediate-reward>"]
+        for (key, value) in state.items():
+            template = templates.get(key)
+            if template is None:
+                template = templates[key] = _fluent_template(key)
+            parts.append(f"{template}{str(value).lower()}</fluent-value></observed-fluent>")
+        parts.append("</turn>")
+        return "".join(parts)
 
     def build_round_end_msg(self, rew, round_reward):
         msg = "<round-end>"
@@ -233,38 +240,38 @@ class RDDLSimServer:
         msg = msg + "<rounds-used>" + str(self.currentround) + "</rounds-used>"
         msg = msg + "<time-used>0</time-used>"
         msg = msg + "<client-name>" + self.client + "</client-name>"
-        msg = msg + "<session-id>0</session-id>"
+        msg = msg + "<session-id>" + str(self.session_id) + "</session-id>"
         msg = msg + "<time-left>1000</time-left>"
         msg = msg + "</session-end>"
         return msg
 
+    def error(self, message):
+        print(f"ERROR: {message}", flush=True)
+        raise RDDLSessionError(message)
+
     def process_init_session_request(self, data):
         parser = xmltree.XMLParser()
         root = xmltree.fromstring(data, parser)
         if root.tag != "session-request":
-            print("ERROR: Malformed session request message: "
-                  "session-request tag missing.", flush=True)
-            exit(1)
+            self.error("Malformed session request message: "
+                       "session-request tag missing.")
         self.problem = root.find("problem-name").text
         self.client = root.find("client-name").text
         input_language = root.find("input-language").text
         if input_language != "rddl":
-            print("ERROR: Malformed session request message: "
-                  "input language must be rddl.", flush=True)
-            exit(1)
+            self.error("Malformed session request message: "
+                       "input language must be rddl.")
 
     def process_round_request(self, data):
         parser = xmltree.XMLParser()
         root = xmltree.fromstring(data, parser)
         if root.tag != "round-request":
-            print("ERROR: Malformed round request message: "
-                  "round-request tag missing.", flush=True)
-            exit(1)
+            self.error("Malformed round request message: "
+                       "round-request tag missing.")
         execute = root.find("execute-policy").text.strip()
         if execute != "yes":
-            print("ERROR: Malformed round request message: "
-                  "policy must be executed.", flush=True)
-            exit(1)
+            self.error("Malformed round request message: "
+                       "policy must be executed.")
         self.currentround += 1
         self.roundsleft -= 1
 
@@ -272,9 +279,7 @@ class RDDLSimServer:
         parser = xmltree.XMLParser()
         root = xmltree.fromstring(data, parser)
         if root.tag != "actions":
-            print("ERROR: Malformed action message: actions tag missing.",
-                  flush=True)
-            exit(1)
+            self.error("Malformed action message: actions tag missing.")
         actions = root.findall("action")
         result = {}
         for act in actions:
@@ -287,3 +292,315 @@ class RDDLSimServer:
             value = act.find("action-value").text
             result[name] = value
         return result
+
+
+class RDDLSimServer:
+    """Creates a TCP/IP server that listens to the provided port and passes
+    messages between a pyRDDLGym environment and a client that is
+    designed to interact with rddlsim (https://github.com/ssanner/rddlsim).
+
+    The server runs either a single session (run()), or any number of
+    concurrent sessions, each with its own environment from a pool (serve()).
+
+    If log_dir is given, the trajectory of every session is streamed to the
+    subdirectory session-<id> of log_dir as columnar chunks of log_chunk_size
+    records (see RDDLTrajectoryWriter), and is not kept in memory for
+    dump_data().
+
+    The state of the session of run(), or of the last session completed by 
+    serve(), is held by the session field, and its logs, rewards and messages 
+    are also available through the server. Only the summaries of the sessions 
+    completed by serve() are kept in the sessions field."""
+
+    def __init__(self, domain: str, instance: str, numrounds: int, time: int,
+                 port: int=2323, num_envs: int=1, cache_dir: Optional[str]=None,
+                 log_dir: Optional[str]=None, log_chunk_size: int=1024):
+        # concatenate domain and instance files
+        f = open(domain)
+        self.task = f.read()
+        f.close()
+        f = open(instance)
+        self.task = self.task + f.read()
+        f.close()
+
+        # encode task
+        print("INFO: Encoding task for sharing in TCP connections...", flush=True)
+        self.task = base64.b64encode(str.encode(self.task))
+        self.task = self.task.decode("ascii")
+
+        # create RDDLEnv
+        print("INFO: Creating RDDL environment...", flush=True)
+        self.domain = domain
+        self.instance = instance
+        self.cache_dir = cache_dir
+        self.env = RDDLEnv(domain=domain, instance=instance, cache_dir=cache_dir)
+        print("INFO: Created RDDL environment.\n", flush=True)
+        # initialize RDDLSimAgent
+        self.numrounds = numrounds
+        self.time = time
+        self.address = ("127.0.0.1", port)
+        self.num_envs = num_envs
+        self.log_dir = log_dir
+        self.log_chunk_size = log_chunk_size
+        self.templates = fluent_templates(self.env.model)
+        self.session = RDDLSimSession(self.env, self.task, numrounds, time,
+                                      templates=self.templates,
+                                      writer=self._writer(0))
+
+        # received bytes are read into a reusable chunk
+        self._chunk = bytearray(65536)
+        self._received = RDDLMessageBuffer()
+
+        # summaries of the sessions completed by serve()
+        self.sessions = []
+
+    # ===========================================================================
+    # state of the current session
+    # ===========================================================================
+
+    @property
+    def logs(self):
+        return self.session.logs
+
+    @property
+    def total_reward(self):
+        return self.session.total_reward
+
+    @property
+    def currentround(self):
+        return self.session.currentround
+
+    @property
+    def roundsleft(self):
+        return self.session.roundsleft
+
+    @property
+    def client(self):
+        return self.session.client
+
+    @property
+    def problem(self):
+        return self.session.problem
+
+    def build_session_request_msg(self):
+        return self.session.build_session_request_msg()
+
+    def build_round_request_msg(self):
+        return self.session.build_round_request_msg()
+
+    def build_state_msg(self, state, turn, rew):
+        return self.session.build_state_msg(state, turn, rew)
+
+    def build_round_end_msg(self, rew, round_reward):
+        return self.session.build_round_end_msg(rew, round_reward)
+
+    def build_session_end_msg(self):
+        return self.session.build_session_end_msg()
+
+    def process_init_session_request(self, data):
+        return self.session.process_init_session_request(data)
+
+    def process_round_request(self, data):
+        return self.session.process_round_request(data)
+
+    def process_action(self, data):
+        return self.session.process_action(data)
+
+    # ===========================================================================
+    # single session
+    # ===========================================================================
+
+    def _writer(self, session_id):
+        if self.log_dir is None:
+            return None
+        path = os.path.join(self.log_dir, f"session-{session_id}")
+        return RDDLTrajectoryWriter(path, self.env.model,
+                                    chunk_size=self.log_chunk_size)
+
+    def run(self):
+        """Starts the RDDLSimAgent to wait for a planner to connect."""
+
+        print("INFO: Establishing socket...", flush=True)
+        sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+
+        with sock:
+            # Force the connection to this port (sometimes it stays locked after repeated runs).
+            # https://stackoverflow.com/questions/4465959/python-errno-98-address-already-in-use
+            print("INFO: Forcing connection...", flush=True)
+            sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+
+            sock.bind(self.address)
+            print(f"INFO: Listening at address {self.address[0]} "
+                  f"with port {self.address[1]}.\n", flush=True)
+            sock.listen(1)
+            connection, client_address = sock.accept()
+            with connection:
+                self.run_session(connection)
+            connection.close()
+
+        sock.close()
+        self.env.close()
+        print("INFO: Socket closed.\n", flush=True)
+
+    def run_session(self, connection):
+        """Runs an interactive session between the pyRDDLGym environment
+        and a connected rddlsim client and terminates afterwards."""
+        messages = self.session.messages()
+        try:
+            request = _advance(messages)
+            while request is not None:
+                if request is RDDLSimSession.RECEIVE:
+                    request = _advance(messages, self.receive_message(connection))
+                else:
+                    self.send_message(connection, request)
+                    request = _advance(messages)
+        except RDDLSessionError:
+            exit(1)
+        finally:
+            self.session.close()
+
+    # ===========================================================================
+    # concurrent sessions
+    # ===========================================================================
+
+    def run_concurrent(self, max_sessions: Optional[int]=None,
+                       session_timeout: Optional[float]=None):
+        """Starts the server to accept any number of planners concurrently
+        (see serve()), and blocks until it stops."""
+        asyncio.run(self.serve(max_sessions, session_timeout))
+
+    async def serve(self, max_sessions: Optional[int]=None,
+                    session_timeout: Optional[float]=None):
+        """Accepts planners concurrently on an asyncio event loop, and runs the
+        session of each on its own environment drawn from a pool of num_envs
+        environments, so that at most num_envs sessions run at the same time
+        and later planners wait for an environment to be returned to the pool.
+        The environments are stepped by a pool of num_envs threads.
+
+        :param max_sessions: the number of sessions after which the server
+        stops, or None to serve until cancelled
+        :param session_timeout: the time in seconds after which a session is
+        closed, or None for no time limit
+        """
+
+        # the environments after the first are loaded from the cache if given
+        print(f"INFO: Creating {self.num_envs} RDDL environment(s)...", flush=True)
+        pool = asyncio.Queue()
+        pool.put_nowait(self.env)
+        for _ in range(self.num_envs - 1):
+            pool.put_nowait(RDDLEnv(domain=self.domain, instance=self.instance,
+                                    cache_dir=self.cache_dir))
+        executor = ThreadPoolExecutor(max_workers=self.num_envs,
+                                      thread_name_prefix='RDDLSimServer')
+        session_ids = itertools.count()
+        stopped = asyncio.Event()
+        self.sessions = []
+
+        async def _handle(reader, writer):
+            session_id = next(session_ids)
+            env = await pool.get()
+            session = RDDLSimSession(env, self.task, self.numrounds, self.time,
+                                     session_id=session_id, templates=self.templates,
+                                     writer=self._writer(session_id))
+            try:
+                await self._run_session_async(
+                    session, reader, writer, executor, session_timeout)
+            except asyncio.TimeoutError:
+                print(f"ERROR: Session {session_id} timed out.", flush=True)
+            except Exception as error:
+                # any failure (e.g. a malformed message or an invalid action) 
+                # only ends its own session, and the server keeps serving
+                print(f"ERROR: Session {session_id} failed: "
+                      f"{type(error).__name__}: {error}", flush=True)
+            finally:
+                writer.close()
+                session.close()
+                pool.put_nowait(env)
+                
+                # only the last session is kept with its logs, so that memory
+                # does not grow with the number of sessions served
+                self.session = session
+                self.sessions.append(session.summary())
+                print(f"INFO: Session {session_id} closed.\n", flush=True)
+                if max_sessions is not None and len(self.sessions) >= max_sessions:
+                    stopped.set()
+
+        server = await asyncio.start_server(
+            _handle, *self.address, reuse_address=True)
+        print(f"INFO: Listening at address {self.address[0]} "
+              f"with port {self.address[1]}.\n", flush=True)
+        try:
+            async with server:
+                if max_sessions is None:
+                    await server.serve_forever()
+                else:
+                    await stopped.wait()
+        finally:
+            executor.shutdown(wait=True)
+            while not pool.empty():
+                pool.get_nowait().close()
+            print("INFO: Socket closed.\n", flush=True)
+
+    async def _run_session_async(self, session, reader, writer, executor, timeout):
+        loop = asyncio.get_running_loop()
+        deadline = None if timeout is None else loop.time() + timeout
+
+        def _remaining():
+            return None if deadline is None else max(0.0, deadline - loop.time())
+
+        # the session is resumed on the executor, since it steps the environment,
+        # which is not returned to the pool until the step is finished
+        messages = session.messages()
+        received = RDDLMessageBuffer()
+        data = None
+        while True:
+            future = loop.run_in_executor(executor, _advance, messages, data)
+            try:
+                request = await asyncio.wait_for(asyncio.shield(future), _remaining())
+            except asyncio.TimeoutError:
+                await future
+                raise
+            if request is None:
+                break
+            if request is RDDLSimSession.RECEIVE:
+                data = await asyncio.wait_for(
+                    self.receive_message_async(reader, received), _remaining())
+            else:
+                writer.write(str.encode(request))
+                await asyncio.wait_for(writer.drain(), _remaining())
+                data = None
+
+    async def receive_message_async(self, reader, received):
+        data = received.pop()
+        while data is None:
+            chunk = await reader.read(len(self._chunk))
+            if not chunk:
+                raise ConnectionError("connection lost.")
+            received.feed(chunk)
+            data = received.pop()
+        return data
+
+    def dump_data(self, fn):
+        """Dumps the data of the session of run(), or of the last session 
+        completed by serve(), to a json file, if it is kept in memory."""
+        with open(fn, "w") as f:
+            json.dump(self.logs, f)
+
+    def send_message(self, connection, msg):
+        # print(f"sending message: {msg}")
+        connection.sendall(str.encode(msg))
+
+    def receive_message(self, connection):
+        """Reads from the connection until a complete message is received, 
+        which is returned without its null terminator."""
+        chunk, received = self._chunk, self._received
+        data = received.pop()
+        while data is None:
+            size = connection.recv_into(chunk)
+            if not size:
+                print("FATAL: connection lost.")
+                exit(1)
+            received.feed(memoryview(chunk)[:size])
+            data = received.pop()
+        # print(f"received message: {data}")
+        return data
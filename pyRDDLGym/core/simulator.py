@@ -1,9 +1,16 @@
+from concurrent.futures import ThreadPoolExecutor
 import numpy as np
+import threading
 from typing import Dict, Optional, Set, Union
 
+from pyRDDLGym.core.compiler.alias import RDDLAliasTable
+from pyRDDLGym.core.compiler.closures import RDDLClosureCompiler
+from pyRDDLGym.core.compiler.codegen import RDDLCodeGenerator
+from pyRDDLGym.core.compiler.grounded import RDDLGroundedView
 from pyRDDLGym.core.compiler.initializer import RDDLValueInitializer
 from pyRDDLGym.core.compiler.levels import RDDLLevelAnalysis
 from pyRDDLGym.core.compiler.model import RDDLPlanningModel
+from pyRDDLGym.core.compiler.sparse import RDDLSparseCompiler
 from pyRDDLGym.core.compiler.tracer import RDDLObjectsTracer
 from pyRDDLGym.core.debug.exception import (
     print_stack_trace,
@@ -16,19 +23,42 @@ from pyRDDLGym.core.debug.exception import (
     RDDLUndefinedVariableError,
     RDDLValueOutOfRangeError
 )
+from pyRDDLGym.core.debug.decompiler import RDDLDecompiler
 from pyRDDLGym.core.debug.logger import Logger
-from pyRDDLGym.core.parser.expr import Value
+from pyRDDLGym.core.debug.profiler import RDDLProfiler
+from pyRDDLGym.core.parser.expr import Expression, Value
 
 Args = Dict[str, Value]
 
+
+def _skip_check(*args, **kwargs):
+    pass
+
         
 class RDDLSimulator:
     
+    # the tolerance on the sum of the probabilities of Discrete distributions
+    DISCRETE_SUM_TOL = 1e-5 + 1e-8
+    
+    # the names of the Discrete distributions
+    DISCRETE = {'Discrete', 'UnnormDiscrete', 'Discrete(p)', 'UnnormDiscrete(p)'}
+    
     def __init__(self, rddl: RDDLPlanningModel,
                  allow_synchronous_state: bool=True,
                  rng: np.random.Generator=np.random.default_rng(),
                  logger: Optional[Logger]=None,
-                 keep_tensors: bool=False) -> None:
+                 keep_tensors: bool=False,
+                 compile_closures: bool=True,
+                 zero_copy: bool=False,
+                 profile: bool=False,
+                 num_threads: int=1,
+                 sparse_threshold: Optional[int]=None,
+                 dtypes: Optional[Dict[str, type]]=None,
+                 keyed_rng: bool=False,
+                 validation: str='full',
+                 validation_steps: int=100,
+                 lazy_grounding: bool=False,
+                 alias_sampling: bool=False) -> None:
         '''Creates a new simulator for the given RDDL model.
         
         :param rddl: the RDDL model
@@ -37,14 +67,97 @@ class RDDLSimulator:
         :param logger: to log information about compilation to file
         :param keep_tensors: whether the sampler takes actions and
         returns state in numpy array form
+        :param compile_closures: whether to compile expressions into closures
+        with operators and cached info resolved once, instead of walking 
+        the expression tree at every step
+        :param zero_copy: whether states and actions are kept in persistent 
+        buffers that are updated in place, and states and observations are
+        returned as read-only views that are only valid until the next call to 
+        step() or reset(), so the caller must copy any value it wants to keep
+        :param profile: whether to measure the time spent in every expression,
+        which is then available through the profiler field
+        :param num_threads: the number of threads that sample the CPFs of each
+        level concurrently, in which case every CPF samples from its own random 
+        stream derived from rng, so that results are reproducible for a given
+        seed but differ from the results of sequential sampling
+        :param sparse_threshold: if specified, large non-fluents with at least
+        this many elements that are mostly zero are stored as sparse tensors, 
+        and aggregations of their products with other fluents are sampled 
+        from their nonzero elements only (see RDDLSparseCompiler)
+        :param dtypes: optional dictionary mapping fluents and non-fluents to 
+        narrower dtypes in which their tensors are stored (e.g. as computed by 
+        RDDLMemoryAnalysis), whose values are widened back to the default dtype
+        of their range when read by expressions
+        :param keyed_rng: whether every random expression samples from its own
+        counter-based (Philox) random stream, keyed by a seed drawn from rng and
+        the id of the expression and positioned by the current episode and 
+        step, so that samples do not depend on the order in which expressions
+        are evaluated (and thus on num_threads)
+        :param validation: how often the values of expressions are checked at
+        run time (i.e., the types of CPFs and the arguments of operations and
+        distributions): 'full' checks every step, 'sampled' checks one step in 
+        every validation_steps steps, and 'off' checks the first 
+        validation_steps steps only, after which the checks are removed from 
+        the compiled closures and generated code
+        :param validation_steps: the number of steps of the validation level
+        :param lazy_grounding: whether states and observations are returned 
+        (if keep_tensors is False) as read-only views of type RDDLGroundedView,
+        which read the values of grounded fluents from the tensors of their
+        lifted fluents when accessed, instead of as dictionaries of all grounded 
+        fluents created every step
+        :param alias_sampling: whether Discrete distributions whose probabilities
+        depend only on non-fluents and constants are sampled from alias tables
+        built once (see RDDLAliasTable), which take constant time per sample but
+        map random numbers to categories differently than inverse CDF sampling,
+        so that they give different samples for the same seed
         '''
+        if validation not in RDDLSimulator.VALIDATION_LEVELS:
+            raise ValueError(f'Validation level must be one of '
+                             f'{RDDLSimulator.VALIDATION_LEVELS}, got {validation}.')
+        if validation_steps < 1:
+            raise ValueError(f'Validation steps must be positive, '
+                             f'got {validation_steps}.')
+        if dtypes is None:
+            dtypes = {}
         self.rddl = rddl
         self.allow_synchronous_state = allow_synchronous_state
+        self.num_threads = num_threads
+        self._executor = None
+        self.sparse_threshold = sparse_threshold
+        self.dtypes = dtypes
+        self.keyed_rng = keyed_rng
+        self.validation = validation
+        self.validation_steps = validation_steps
+        self.validating = True
+        self._validation_count = 0
+        if keyed_rng or num_threads > 1:
+            self._thread_state = threading.local()
+        else:
+            self._thread_state = None
         self.rng = rng
         self.logger = logger
         self.keep_tensors = keep_tensors
+        self.compile_closures = compile_closures
+        self.zero_copy = zero_copy
+        self.lazy_grounding = lazy_grounding and not keep_tensors
+        self.alias_sampling = alias_sampling
+        self.box_invariants = None
         
         self._compile()
+        if self.lazy_grounding:
+            self._state_groundings = RDDLGroundedView.table(
+                rddl, rddl.state_fluents)
+            self._observ_groundings = RDDLGroundedView.table(
+                rddl, rddl.observ_fluents)
+        if zero_copy:
+            self._allocate_buffers()
+        
+        # pvariables stored in narrow dtypes are widened when they are read
+        self._widen = {}
+        for var in self.dtypes:
+            prange = rddl.variable_ranges[var]
+            self._widen[var] = RDDLValueInitializer.NUMPY_TYPES.get(
+                prange, RDDLValueInitializer.INT)
         
         # basic operations
         self.ARITHMETIC_OPS = {
@@ -115,6 +228,37 @@ class RDDLSimulator:
         self.BINARY_REQUIRES_INT = {'div', 'mod'}
         self.CONTROL_OPS = {'if': np.where,
                             'switch': np.select}
+        
+        # sample aggregations over sparse non-fluents from the nonzero elements
+        self._compile_sparse()
+        
+        # evaluate deterministic non-fluent subexpressions once, and
+        # deterministic subexpressions repeated in several places once per step
+        self._fold_constants()
+        self._eliminate_common_subexpressions()
+        
+        # Discrete distributions with static probabilities can use alias tables
+        self._compile_alias_tables()
+        
+        # replace the tree-walking interpreter by the compiled closures
+        self.profiler = RDDLProfiler(self) if profile else None
+        if compile_closures:
+            self._closures = RDDLClosureCompiler(self, profiler=self.profiler).compile()
+            self._validated_closures = {True: self._closures}
+            self._sample = self._sample_compiled
+        else:
+            if keyed_rng:
+                self._sample_random = self._keyed_sampler(self._sample_random)
+                self._sample_random_vector = self._keyed_sampler(
+                    self._sample_random_vector)
+            if self.folded or self.shared:
+                self._sample = self._sample_cached
+            if profile:
+                self.profiler.attach()
+        
+        # sample the independent CPFs of each level concurrently
+        if num_threads > 1:
+            self._start_threads()
     
     def seed(self, seed: int) -> None:
         '''Sets the pseudo-random RNG seed for generating random numbers.
@@ -122,12 +266,33 @@ class RDDLSimulator:
         :param seed: seed value to use for all future simulations
         '''
         self.rng = np.random.default_rng(seed)
+    
+    @property
+    def rng(self) -> np.random.Generator:
+        '''The random number generator, or the random stream of the random 
+        expression or CPF that is being sampled by the current thread if 
+        streams are keyed or CPFs are sampled concurrently.'''
+        state = self._thread_state
+        if state is not None:
+            rng = getattr(state, 'rng', None)
+            if rng is not None:
+                return rng
+        return self._rng
+    
+    @rng.setter
+    def rng(self, rng: np.random.Generator) -> None:
+        self._rng = rng
+        self._cpf_rngs = None
+        if self.keyed_rng:
+            self._seed_keyed_rngs()
         
     def _compile(self):
         rddl = self.rddl
         
         # compile initial values
-        initializer = RDDLValueInitializer(rddl, logger=self.logger)
+        initializer = RDDLValueInitializer(
+            rddl, logger=self.logger, sparse_threshold=self.sparse_threshold,
+            dtypes=self.dtypes)
         self.init_values = initializer.initialize()
         
         # compute dependency graph for CPFs and sort them by evaluation order
@@ -156,6 +321,7 @@ class RDDLSimulator:
                              if rddl.variable_types[var] == 'action-fluent'}
         self.grounded_noop_actions = rddl.ground_vars_with_values(self.noop_actions)
         self.grounded_action_ranges = rddl.ground_vars_with_value(rddl.action_ranges)
+        self._compile_action_table()
         self._pomdp = bool(rddl.observ_fluents)
         
         # cached for performance
@@ -163,8 +329,255 @@ class RDDLSimulator:
         self.precond_names = [f'Precondition {i}' for i in range(len(rddl.preconditions))]
         self.terminal_names = [f'Termination {i}' for i in range(len(rddl.terminations))]        
         
+    def _compile_action_table(self):
+        '''Builds a table mapping each grounded action to its action-fluent, 
+        its index in the flattened tensor of the fluent (None if the fluent has 
+        no parameters) and its dtype, so that grounded actions are assigned 
+        without parsing their names.'''
+        rddl = self.rddl
+        self.grounded_action_indices = {}
+        for (var, values) in self.noop_actions.items():
+            dtype = np.asarray(values).dtype
+            if rddl.variable_params[var]:
+                for (index, name) in enumerate(rddl.variable_groundings[var]):
+                    self.grounded_action_indices[name] = (var, index, dtype)
+            else:
+                self.grounded_action_indices[var] = (var, None, dtype)
+        
+    # ===========================================================================
+    # sparse non-fluents
+    # ===========================================================================
+    
+    def _compile_sparse(self):
+        '''Finds the aggregations that can be sampled from the sparse 
+        non-fluents, and converts to dense tensors the sparse non-fluents that
+        are also referenced by other expressions.'''
+        self.sparse_aggregations, dense = RDDLSparseCompiler(self).compile()
+        for var in dense:
+            self.init_values[var] = self.subs[var] = self.init_values[var].toarray()
+        
+        if self.logger is not None and (self.sparse_aggregations or dense):
+            def _message():
+                decompiler = RDDLDecompiler()
+                message = '[info] sampling aggregations from sparse non-fluents:\n'
+                for (identifier, aggregation) in self.sparse_aggregations.items():
+                    text = decompiler.decompile_expr(aggregation.expr)
+                    message += f'\t{identifier}: {" ".join(text.split())}\n'
+                message += (f'\tnon-fluents converted back to dense tensors, '
+                            f'since they are referenced outside these aggregations: '
+                            f'{sorted(dense)}\n')
+                return message
+            self.logger.log(_message, Logger.INFO)
+    
+    # ===========================================================================
+    # constant folding
+    # ===========================================================================
+    
+    def _fold_constants(self):
+        '''Evaluates every maximal subexpression of the CPFs, reward and 
+        constraints that is deterministic and depends only on non-fluents and 
+        constants, and caches its value in folded (by expression id), so that
+        it is not recomputed on every step.'''
+        self.folded = {}
+        foldable = {}
+        for expr in self._root_expressions():
+            self._fold_expr(expr, foldable)
+            
+        if self.logger is not None and self.folded:
+            def _message():
+                decompiler = RDDLDecompiler()
+                message = '[info] folded non-fluent subexpressions into constants:\n'
+                for (identifier, value) in self.folded.items():
+                    text = decompiler.decompile_expr(self.traced.lookup(identifier))
+                    message += (f'\t{identifier}: {" ".join(text.split())}, '
+                                f'shape={np.shape(value)}\n')
+                return message
+            self.logger.log(_message, Logger.INFO)
+    
+    def _is_foldable(self, expr, foldable):
+        identifier = expr.id
+        result = foldable.get(identifier, None)
+        if result is None:
+            result = not self.traced.cached_is_fluent(expr)
+            etype, _ = expr.etype
+            if etype == 'pvar':
+                var, args = expr.args
+                is_value, _ = self.traced.cached_sim_info(expr)
+                if not is_value:
+                    result = result and \
+                        self.rddl.variable_types.get(var, None) == 'non-fluent'
+            for arg in self._sub_expressions(expr):
+                result = self._is_foldable(arg, foldable) and result
+            foldable[identifier] = result
+        return result
+    
+    def _fold_expr(self, expr, foldable):
+        if self._is_foldable(expr, foldable):
+            etype, _ = expr.etype
+            if etype == 'constant':
+                return
+            if etype == 'pvar' and self.traced.cached_sim_info(expr)[0]:
+                return
+            
+            # errors are left to be raised when the expression is sampled
+            try:
+                value = RDDLSimulator._sample(self, expr, self.subs)
+            except Exception:
+                value = None
+            if value is not None:
+                self.folded[expr.id] = value
+                return
+        for arg in self._sub_expressions(expr):
+            self._fold_expr(arg, foldable)
+    
+    def _compile_alias_tables(self):
+        '''Builds an alias table for every Discrete distribution whose
+        probabilities depend only on non-fluents and constants, so that it is
+        sampled in constant time per sample (see RDDLAliasTable).'''
+        self.alias_tables = {}
+        if not self.alias_sampling:
+            return
+        foldable = {}
+        for expr in self._root_expressions():
+            self._compile_alias_expr(expr, foldable)
+        
+        if self.logger is not None and self.alias_tables:
+            def _message():
+                decompiler = RDDLDecompiler()
+                message = '[info] sampling Discrete distributions from alias tables:\n'
+                for (identifier, table) in self.alias_tables.items():
+                    text = decompiler.decompile_expr(self.traced.lookup(identifier))
+                    message += (f'\t{identifier}: {" ".join(text.split())}, '
+                                f'shape={table.shape}, '
+                                f'categories={table.num_categories}\n')
+                return message
+            self.logger.log(_message, Logger.INFO)
+    
+    def _compile_alias_expr(self, expr, foldable):
+        etype, name = expr.etype
+        if etype == 'randomvar' and name in RDDLSimulator.DISCRETE:
+            is_pvar = name.endswith('(p)')
+            if is_pvar:
+                _, args = expr.args
+            else:
+                args = self.traced.cached_sim_info(expr)
+            if all(self._is_foldable(arg, foldable) for arg in args):
+                
+                # errors are left to be raised when the expression is sampled
+                try:
+                    samples = [RDDLSimulator._sample(self, arg, self.subs) 
+                               for arg in args]
+                    if is_pvar:
+                        pdf, = samples
+                    else:
+                        pdf = np.stack(samples, axis=-1)
+                    self._discrete_cdf(pdf, name.startswith('Unnorm'), expr)
+                    self.alias_tables[expr.id] = RDDLAliasTable(pdf)
+                except Exception:
+                    pass
+        for arg in self._sub_expressions(expr):
+            self._compile_alias_expr(arg, foldable)
+    
+    def _root_expressions(self):
+        rddl = self.rddl
+        return [expr for (_, expr, _) in self.cpfs] + [rddl.reward] + \
+            list(rddl.preconditions) + list(rddl.invariants) + \
+            list(rddl.terminations)
+    
+    @staticmethod
+    def _sub_expressions(expr):
+        args = expr.args
+        stack = list(args) if isinstance(args, (list, tuple)) else [args]
+        while stack:
+            arg = stack.pop()
+            if isinstance(arg, Expression):
+                yield arg
+            elif isinstance(arg, (list, tuple)):
+                stack.extend(arg)
+    
+    # ===========================================================================
+    # common subexpression elimination
+    # ===========================================================================
+    
+    def _eliminate_common_subexpressions(self):
+        '''Finds the deterministic subexpressions of the CPFs, reward and 
+        constraints that are structurally identical and have identical object 
+        scopes, and maps each of them to a shared id in shared, so that their 
+        value is computed by the first one sampled and reused by the others 
+        until the simulator moves to the next phase of the step (i.e. CPFs and 
+        reward, preconditions, invariants or terminations).'''
+        self.shared = {}
+        self._shared_values = {}
+        keys, groups, parents = {}, {}, {}
+        for expr in self._root_expressions():
+            self._group_expr(expr, None, keys, groups, parents)
+        
+        # subexpressions that only appear inside repeated subexpressions are 
+        # already computed once
+        repeated = {identifier 
+                    for ids in groups.values() if len(ids) > 1 
+                    for identifier in ids}
+        for ids in groups.values():
+            if len(ids) > 1 and not all(parents[identifier] in repeated 
+                                        for identifier in ids):
+                for identifier in ids:
+                    self.shared[identifier] = ids[0]
+        
+        if self.logger is not None and self.shared:
+            def _message():
+                decompiler = RDDLDecompiler()
+                message = '[info] shared repeated subexpressions:\n'
+                for (identifier, shared_id) in self.shared.items():
+                    if identifier == shared_id:
+                        text = decompiler.decompile_expr(self.traced.lookup(identifier))
+                        ids = [i for (i, j) in self.shared.items() if j == shared_id]
+                        message += f'\t{ids}: {" ".join(text.split())}\n'
+                return message
+            self.logger.log(_message, Logger.INFO)
+    
+    def _expr_key(self, expr, keys):
+        '''Returns a hashable key that is equal for structurally identical 
+        expressions with identical object scopes, or None if the expression 
+        is not deterministic.'''
+        identifier = expr.id
+        if identifier in keys:
+            return keys[identifier]
+        etype, _ = expr.etype
+        
+        def _arg_key(arg):
+            if isinstance(arg, Expression):
+                return self._expr_key(arg, keys)
+            elif isinstance(arg, (list, tuple)):
+                items = tuple(_arg_key(item) for item in arg)
+                return None if None in items else items
+            else:
+                return (type(arg).__name__, arg)
+        
+        key = None
+        if etype not in ('randomvar', 'randomvector'):
+            args = _arg_key(expr.args)
+            if args is not None:
+                scope = tuple(map(tuple, self.traced.cached_objects_in_scope(expr)))
+                key = (expr.etype, scope, args)
+        keys[identifier] = key
+        return key
+    
+    def _group_expr(self, expr, parent, keys, groups, parents):
+        if expr.id in self.folded:
+            return
+        etype, _ = expr.etype
+        if etype not in ('constant', 'pvar'):
+            key = self._expr_key(expr, keys)
+            if key is not None:
+                groups.setdefault(key, []).append(expr.id)
+                parents[expr.id] = parent
+        for arg in self._sub_expressions(expr):
+            self._group_expr(arg, expr.id, keys, groups, parents)
+    
     @property
     def states(self) -> Args:
+        if self.zero_copy:
+            return self.state
         return self.state.copy()
 
     @property
@@ -240,12 +653,52 @@ class RDDLSimulator:
                 f'{msg} must be in the range [{lb}, {ub}], got {value}.\n' + 
                 print_stack_trace(expr))
     
+    # ===========================================================================
+    # run-time validation levels
+    # ===========================================================================
+    
+    VALIDATION_LEVELS = ('full', 'sampled', 'off')
+    
+    # the checks of the values of expressions that can be turned off
+    VALUE_CHECKS = ('_check_type', '_check_types', '_check_positive', 
+                    '_check_bounds', '_check_range')
+    
+    def _count_validated_step(self):
+        '''Counts a step and decides whether the next step is validated.'''
+        self._validation_count += 1
+        count = self._validation_count
+        if self.validation == 'sampled':
+            validate = count % self.validation_steps == 0
+        else:
+            validate = count < self.validation_steps
+        if validate != self.validating:
+            self._set_validation(validate)
+    
+    def _set_validation(self, validate):
+        '''Turns the checks of the values of expressions on or off, by 
+        shadowing them with a no-op and switching to closures compiled with 
+        (or without) the checks.'''
+        self.validating = validate
+        for name in RDDLSimulator.VALUE_CHECKS:
+            if validate:
+                self.__dict__.pop(name, None)
+            else:
+                setattr(self, name, _skip_check)
+        if self.compile_closures:
+            closures = self._validated_closures.get(validate, None)
+            if closures is None:
+                closures = RDDLClosureCompiler(self, profiler=self.profiler).compile()
+                self._validated_closures[validate] = closures
+            self._closures = closures
+    
     # ===========================================================================
     # main sampling routines
     # ===========================================================================
     
     def _process_actions(self, actions):
         rddl = self.rddl
+        if self.zero_copy:
+            return self._process_actions_in_place(actions)
         
         # if actions are numpy arrays, just assign directly without copy
         if self.keep_tensors:
@@ -262,21 +715,45 @@ class RDDLSimulator:
         else:            
             new_actions = {action: np.copy(value) 
                            for (action, value) in self.noop_actions.items()}
-            for (action, value) in actions.items(): 
-                value = rddl.object_to_index.get(value, value)
-                if action in new_actions:  # no parameters
-                    new_actions[action] = value
-                else:  # must have parameters
-                    var, objects = RDDLPlanningModel.parse_grounded(action)
-                    tensor = new_actions.get(var, None)
-                    if tensor is None: 
-                        raise RDDLInvalidActionError(
-                            f'<{action}> is not a valid action-fluent, ' 
-                            f'must be one of {set(new_actions.keys())}.')
-                    RDDLSimulator._check_type(value, tensor.dtype, action, expr='')            
-                    tensor[rddl.object_indices(objects)] = value                
+            self._assign_grounded_actions(new_actions, actions)
         return new_actions
     
+    def _assign_grounded_actions(self, new_actions, actions):
+        '''Assigns grounded actions into the tensors in new_actions, grouping 
+        them by action-fluent so that each tensor is filled by a single np.put, 
+        and returns the set of action-fluents that were assigned.'''
+        rddl = self.rddl
+        table = self.grounded_action_indices
+        assigned = set()
+        updates = {}
+        for (action, value) in actions.items(): 
+            value = rddl.object_to_index.get(value, value)
+            if action in new_actions:  # no parameters
+                new_actions[action] = value
+                assigned.add(action)
+            else:  # must have parameters
+                entry = table.get(action, None)
+                if entry is None: 
+                    raise RDDLInvalidActionError(
+                        f'<{action}> is not a valid action-fluent, ' 
+                        f'must be one of {set(new_actions.keys())}.')
+                var, index, _ = entry
+                names, indices, values = updates.setdefault(var, ([], [], []))
+                names.append(action)
+                indices.append(index)
+                values.append(value)
+        
+        # check the types of all values of each fluent at once, and only find 
+        # the invalid value if the check fails
+        for (var, (names, indices, values)) in updates.items():
+            tensor = new_actions[var]
+            if not np.can_cast(np.asarray(values), tensor.dtype):
+                for (action, value) in zip(names, values):
+                    self._check_type(value, tensor.dtype, action, expr='')
+            np.put(tensor, indices, values)
+            assigned.add(var)
+        return assigned
+    
     def check_default_action_count(self, actions: Args, 
                                    enforce_for_non_bool: bool=True) -> None:
         '''Throws an exception if the actions do not satisfy max-nondef-actions.'''     
@@ -316,10 +793,20 @@ class RDDLSimulator:
         
     def check_state_invariants(self, silent: bool=False) -> bool:
         '''Throws an exception if the state invariants are not satisfied.'''
-        for (i, invariant) in enumerate(self.rddl.invariants):
+        invariants = self.rddl.invariants
+        
+        # if the box invariants hold, only the other invariants are evaluated
+        indices = range(len(invariants))
+        box = self.box_invariants
+        if box is not None and box.check(self.subs):
+            indices = box.other_invariants
+        
+        self._shared_values.clear()
+        for i in indices:
+            invariant = invariants[i]
             loc = self.invariant_names[i]
             sample = self._sample(invariant, self.subs)
-            RDDLSimulator._check_type(sample, bool, loc, invariant)
+            self._check_type(sample, bool, loc, invariant)
             if not bool(sample):
                 if not silent:
                     raise RDDLStateInvariantNotSatisfiedError(
@@ -332,10 +819,11 @@ class RDDLSimulator:
         actions = self._process_actions(actions)
         self.subs.update(actions)
         
+        self._shared_values.clear()
         for (i, precond) in enumerate(self.rddl.preconditions):
             loc = self.precond_names[i]
             sample = self._sample(precond, self.subs)
-            RDDLSimulator._check_type(sample, bool, loc, precond)
+            self._check_type(sample, bool, loc, precond)
             if not bool(sample):
                 if not silent:
                     raise RDDLActionPreconditionNotSatisfiedError(
@@ -346,31 +834,56 @@ class RDDLSimulator:
     
     def check_terminal_states(self) -> bool:
         '''Return True if a terminal state has been reached.'''
+        self._shared_values.clear()
         for (i, terminal) in enumerate(self.rddl.terminations):
             loc = self.terminal_names[i]
             sample = self._sample(terminal, self.subs)
-            RDDLSimulator._check_type(sample, bool, loc, terminal)
+            self._check_type(sample, bool, loc, terminal)
             if bool(sample):
                 return True
         return False
     
+    def _sample_cpfs(self, subs):
+        narrow = self.dtypes
+        for (cpf, expr, dtype) in self.cpfs:
+            sample = self._sample(expr, subs)
+            self._check_type(sample, dtype, cpf, expr)
+            if narrow and cpf in narrow:
+                sample = RDDLValueInitializer.cast(sample, narrow[cpf])
+            subs[cpf] = sample
+            
     def sample_reward(self) -> float:
         '''Samples the current reward given the current state and action.'''
+        self._shared_values.clear()
+        return self._sample_reward()
+    
+    def _sample_reward(self):
         return float(self._sample(self.rddl.reward, self.subs))
     
     def reset(self) -> Union[Dict[str, None], Args]:
         '''Resets the state variables to their initial values.'''
         rddl = self.rddl
-        subs = self.subs = self.init_values.copy()
         keep_tensors = self.keep_tensors
+        if self.keyed_rng:
+            self._advance_keyed_rngs(reset=True)
         
         # update state
-        self.state = {}
-        for state in rddl.state_fluents:
-            if keep_tensors:
-                self.state[state] = subs[state]
-            else:
-                self.state.update(rddl.ground_var_with_values(state, subs[state]))
+        if self.zero_copy:
+            subs = self.subs
+            subs.update(self.init_values)
+            self._swap_state_buffers()
+            for state in rddl.state_fluents:
+                self._assign_state(state, self.init_values[state])
+        else:
+            subs = self.subs = self.init_values.copy()
+            self.state = {}
+            for state in rddl.state_fluents:
+                if keep_tensors or self.lazy_grounding:
+                    self.state[state] = subs[state]
+                else:
+                    self.state.update(rddl.ground_var_with_values(state, subs[state]))
+            if self.lazy_grounding:
+                self.state = RDDLGroundedView(self.state, self._state_groundings)
         
         # update observation
         if self._pomdp:
@@ -396,43 +909,296 @@ class RDDLSimulator:
         actions = self._process_actions(actions)
         subs = self.subs
         subs.update(actions)
+        if self.keyed_rng:
+            self._advance_keyed_rngs(reset=False)
         
         # evaluate CPFs in topological order
-        for (cpf, expr, dtype) in self.cpfs:
-            sample = self._sample(expr, subs)
-            RDDLSimulator._check_type(sample, dtype, cpf, expr)
-            subs[cpf] = sample
+        self._shared_values.clear()
+        self._sample_cpfs(subs)
         
-        # evaluate reward
-        reward = self.sample_reward()
+        # evaluate reward, reusing subexpressions shared with the CPFs
+        reward = self._sample_reward()
         
         # update state
-        self.state = {}
-        for (state, next_state) in rddl.next_state.items():
-            subs[state] = subs[next_state]
-            if keep_tensors:
-                self.state[state] = subs[state]
-            else:
-                self.state.update(rddl.ground_var_with_values(state, subs[state]))
+        if self.zero_copy:
+            self._swap_state_buffers()
+            for (state, next_state) in rddl.next_state.items():
+                self._assign_state(state, subs[next_state])
+        else:
+            self.state = {}
+            for (state, next_state) in rddl.next_state.items():
+                subs[state] = subs[next_state]
+                if keep_tensors or self.lazy_grounding:
+                    self.state[state] = subs[state]
+                else:
+                    self.state.update(rddl.ground_var_with_values(state, subs[state]))
+            if self.lazy_grounding:
+                self.state = RDDLGroundedView(self.state, self._state_groundings)
         
         # update observation
-        if self._pomdp: 
-            obs = {}
+        if self._pomdp and self.lazy_grounding:
+            obs = RDDLGroundedView({var: subs[var] for var in rddl.observ_fluents},
+                                   self._observ_groundings)
+        elif self._pomdp: 
+            obs = self._obs if self.zero_copy else {}
             for var in rddl.observ_fluents:
                 if keep_tensors:
-                    obs[var] = subs[var]
+                    obs[var] = self._read_only(subs[var]) if self.zero_copy else subs[var]
                 else:
                     obs.update(rddl.ground_var_with_values(var, subs[var]))
         else:
             obs = self.state
         
-        done = self.check_terminal_states()        
+        done = self.check_terminal_states()
+        if self.validation != 'full':
+            self._count_validated_step()
         return obs, reward, done
         
+    # ===========================================================================
+    # concurrent sampling of the CPFs in each level
+    # ===========================================================================
+    
+    def _start_threads(self):
+        cpfs = {cpf: (cpf, expr, dtype) for (cpf, expr, dtype) in self.cpfs}
+        self._cpf_levels = [[cpfs[cpf] for cpf in level_cpfs]
+                            for level_cpfs in self.levels.values()]
+        self._executor = ThreadPoolExecutor(max_workers=self.num_threads,
+                                            thread_name_prefix='RDDLSimulator')
+        self._sample_cpfs = self._sample_cpfs_concurrent
+    
+    def close(self) -> None:
+        '''Shuts down the threads that sample the CPFs concurrently, after 
+        which the CPFs are sampled sequentially.'''
+        
+        # backends that do not call this constructor have no executor
+        if getattr(self, '_executor', None) is not None:
+            self._executor.shutdown()
+            self._executor = None
+            del self._sample_cpfs
+    
+    def _spawn_cpf_rngs(self):
+        '''Derives an independent random stream for every CPF from the random
+        number generator, so that the samples of a CPF do not depend on the
+        order in which the threads sample the CPFs.'''
+        entropy = self._rng.integers(np.iinfo(np.int64).max)
+        seeds = np.random.SeedSequence(entropy).spawn(len(self.cpfs))
+        self._cpf_rngs = {cpf: np.random.default_rng(seed)
+                          for ((cpf, _, _), seed) in zip(self.cpfs, seeds)}
+    
+    def _sample_cpf(self, cpf, expr, dtype, subs):
+        state = self._thread_state
+        state.rng = self._cpf_rngs[cpf]
+        try:
+            sample = self._sample(expr, subs)
+        finally:
+            state.rng = None
+        self._check_type(sample, dtype, cpf, expr)
+        narrow = self.dtypes.get(cpf, None)
+        if narrow is not None:
+            sample = RDDLValueInitializer.cast(sample, narrow)
+        return sample
+    
+    def _sample_cpfs_concurrent(self, subs):
+        if self._cpf_rngs is None:
+            self._spawn_cpf_rngs()
+        for level in self._cpf_levels:
+            if len(level) == 1:
+                (cpf, expr, dtype), = level
+                subs[cpf] = self._sample_cpf(cpf, expr, dtype, subs)
+            else:
+                
+                # the CPFs of a level are assigned in order once all are sampled
+                futures = [self._executor.submit(self._sample_cpf, *args, subs)
+                           for args in level]
+                for ((cpf, _, _), future) in zip(level, futures):
+                    subs[cpf] = future.result()
+
+    # ===========================================================================
+    # counter-based random streams keyed by expression
+    # ===========================================================================
+
+    def _seed_keyed_rngs(self):
+        '''Draws the seed of the keyed random streams from the random number
+        generator, and restarts the episode and step counters.'''
+        self._rng_key = int(self._rng.integers(np.iinfo(np.int64).max))
+        self._rng_episode = 0
+        self._rng_step = 0
+        self._keyed_rngs = {}
+
+    def _advance_keyed_rngs(self, reset):
+        if reset:
+            self._rng_episode += 1
+            self._rng_step = 0
+        else:
+            self._rng_step += 1
+
+    def _keyed_rng(self, identifier):
+        '''Returns the random generator of the expression with the given id,
+        positioned at the start of the block of its stream for the current
+        episode and step.'''
+        position = (self._rng_episode, self._rng_step)
+        entry = self._keyed_rngs.get(identifier, None)
+        if entry is None:
+            key = np.asarray([self._rng_key, identifier], dtype=np.uint64)
+            rng = np.random.Generator(np.random.Philox(key=key))
+            entry = self._keyed_rngs[identifier] = [None, key, rng]
+        _, key, rng = entry
+        if entry[0] != position:
+
+            # the counter holds the step and episode in its two high words,
+            # while its two low words are incremented by the draws of a step
+            counter = [0, 0, self._rng_step, self._rng_episode]
+            rng.bit_generator.state = {
+                'bit_generator': 'Philox',
+                'state': {'counter': np.asarray(counter, dtype=np.uint64), 
+                          'key': key},
+                'buffer': np.zeros(4, dtype=np.uint64),
+                'buffer_pos': 4,
+                'has_uint32': 0,
+                'uinteger': 0
+            }
+            entry[0] = position
+        return rng
+
+    def _keyed_sampler(self, sample):
+        '''Wraps a sampling subroutine of random expressions, so that it draws
+        from the keyed random stream of the expression that it samples.'''
+        state = self._thread_state
+        keyed_rng = self._keyed_rng
+
+        def _sample(expr, subs, **kwargs):
+            previous = getattr(state, 'rng', None)
+            state.rng = keyed_rng(expr.id)
+            try:
+                return sample(expr, subs, **kwargs)
+            finally:
+                state.rng = previous
+
+        return _sample
+
+    # ===========================================================================
+    # persistent buffers for zero-copy stepping
+    # ===========================================================================
+    
+    @staticmethod
+    def _read_only(value):
+        if isinstance(value, np.ndarray):
+            value = value.view()
+            value.flags.writeable = False
+        return value
+    
+    def _allocate_buffers(self):
+        rddl = self.rddl
+        
+        # tensors of state-fluents are copied into buffers that are never 
+        # shared with initial values, actions or other fluents: there are two
+        # sets of buffers used in alternation, since the next state can refer
+        # to the tensors of the current state (e.g. x' = y)
+        self._state_buffers = ({}, {})
+        self._state_views = ({}, {})
+        for state in rddl.state_fluents:
+            value = self.init_values[state]
+            if np.ndim(value):
+                for (buffers, views) in zip(self._state_buffers, self._state_views):
+                    buffer = np.array(value, copy=True)
+                    buffers[state] = buffer
+                    views[state] = self._read_only(buffer)
+        self._buffer_index = 0
+        
+        # grounded actions are assigned into tensors that are reused every step
+        self._actions = dict(self.noop_actions)
+        self._action_buffers = {}
+        if not self.keep_tensors:
+            for (action, value) in self.noop_actions.items():
+                if np.ndim(value):
+                    self._action_buffers[action] = np.array(value, copy=True)
+            self._actions.update(self._action_buffers)
+        self._dirty_actions = set()
+        
+        self.state = {}
+        self._obs = {}
+        if self.lazy_grounding:
+            self._state_tensors = {}
+            self.state = RDDLGroundedView(self._state_tensors, self._state_groundings)
+    
+    def _swap_state_buffers(self):
+        self._buffer_index = 1 - self._buffer_index
+    
+    def _assign_state(self, state, value):
+        subs = self.subs
+        index = self._buffer_index
+        buffer = self._state_buffers[index].get(state, None)
+        if buffer is None or np.shape(value) != buffer.shape:
+            subs[state] = value
+            view = self._read_only(value)
+        else:
+            
+            # the buffer takes the dtype of the sampled value, so that states
+            # have the same dtypes as without zero_copy and are never cast
+            if buffer.dtype != value.dtype:
+                buffer = np.empty_like(value)
+                self._state_buffers[index][state] = buffer
+                self._state_views[index][state] = self._read_only(buffer)
+            np.copyto(buffer, value)
+            subs[state] = buffer
+            view = self._state_views[index][state]
+        if self.keep_tensors:
+            self.state[state] = view
+        elif self.lazy_grounding:
+            self._state_tensors[state] = view
+        else:
+            self.state.update(self.rddl.ground_var_with_values(state, view))
+    
+    def _process_actions_in_place(self, actions):
+        rddl = self.rddl
+        new_actions = self._actions
+        noop_actions = self.noop_actions
+        action_buffers = self._action_buffers
+        
+        # restore the default values of actions assigned on the last step
+        for action in self._dirty_actions:
+            buffer = action_buffers.get(action, None)
+            if buffer is None:
+                new_actions[action] = noop_actions[action]
+            else:
+                np.copyto(buffer, noop_actions[action])
+        dirty = self._dirty_actions = set()
+        
+        # if actions are numpy arrays, just assign directly without copy
+        if self.keep_tensors:
+            for (action, value) in actions.items(): 
+                if action in new_actions:
+                    new_actions[action] = value
+                    dirty.add(action)
+                else:
+                    raise RDDLInvalidActionError(
+                        f'<{action}> is not a valid action-fluent, ' 
+                        f'must be one of {set(new_actions.keys())}.')
+        
+        # otherwise assign grounded values into the action buffers
+        else:
+            dirty.update(self._assign_grounded_actions(new_actions, actions))
+        return new_actions
+    
     # ===========================================================================
     # start of sampling subroutines
     # ===========================================================================
     
+    def _sample_compiled(self, expr, subs):
+        return self._closures[expr.id](subs)
+    
+    def _sample_cached(self, expr, subs):
+        value = self.folded.get(expr.id, None)
+        if value is None:
+            shared_id = self.shared.get(expr.id, None)
+            if shared_id is None:
+                return RDDLSimulator._sample(self, expr, subs)
+            value = self._shared_values.get(shared_id, None)
+            if value is None:
+                value = RDDLSimulator._sample(self, expr, subs)
+                self._shared_values[shared_id] = value
+        return value
+    
     def _sample(self, expr, subs):
         etype, _ = expr.etype
         if etype == 'constant':
@@ -483,6 +1249,8 @@ class RDDLSimulator:
             raise RDDLUndefinedVariableError(
                 f'Variable <{var}> is referenced before assignment.\n' + 
                 print_stack_trace(expr))
+        if self._widen and var in self._widen:
+            sample = RDDLValueInitializer.cast(sample, self._widen[var])
         
         # lifted domain must slice and/or reshape value tensor
         if cached_info is not None:
@@ -612,7 +1380,7 @@ class RDDLSimulator:
         if n == 1 and op == '~':
             arg, = args
             sample = self._sample(arg, subs)
-            RDDLSimulator._check_type(sample, bool, op, expr, arg='')
+            self._check_type(sample, bool, op, expr, arg='')
             return np.logical_not(sample)
         
         # try to short-circuit ^ and | if possible
@@ -623,8 +1391,8 @@ class RDDLSimulator:
             else:
                 sample_lhs = self._sample(lhs, subs)
                 sample_rhs = self._sample(rhs, subs)
-                RDDLSimulator._check_type(sample_lhs, bool, op, expr, arg=1)
-                RDDLSimulator._check_type(sample_rhs, bool, op, expr, arg=2)
+                self._check_type(sample_lhs, bool, op, expr, arg=1)
+                self._check_type(sample_rhs, bool, op, expr, arg=2)
                 return numpy_op(sample_lhs, sample_rhs)
         
         # for a grounded domain, we can short-circuit ^ and |
@@ -643,7 +1411,7 @@ class RDDLSimulator:
             lhs, rhs = rhs, lhs 
             
         sample_lhs = self._sample(lhs, subs)
-        RDDLSimulator._check_type(sample_lhs, bool, op, expr, arg=1)
+        self._check_type(sample_lhs, bool, op, expr, arg=1)
         
         # short-circuit if all True/False
         if (op == '^' and not np.any(sample_lhs)) \
@@ -651,7 +1419,7 @@ class RDDLSimulator:
             return sample_lhs
             
         sample_rhs = self._sample(rhs, subs)
-        RDDLSimulator._check_type(sample_rhs, bool, op, expr, arg=2)
+        self._check_type(sample_rhs, bool, op, expr, arg=2)
         
         if op == '^':
             return np.logical_and(sample_lhs, sample_rhs)
@@ -665,7 +1433,7 @@ class RDDLSimulator:
         for (i, arg) in enumerate(args):
             if arg.is_constant_expression() or arg.is_pvariable_expression():
                 sample = self._sample(arg, subs)
-                RDDLSimulator._check_type(sample, bool, op, expr, arg=i + 1)
+                self._check_type(sample, bool, op, expr, arg=i + 1)
                 sample = bool(sample)
                 if use_and and not sample:
                     return False
@@ -676,7 +1444,7 @@ class RDDLSimulator:
         for (i, arg) in enumerate(args):
             if not (arg.is_constant_expression() or arg.is_pvariable_expression()):
                 sample = self._sample(arg, subs)
-                RDDLSimulator._check_type(sample, bool, op, expr, arg=i + 1)
+                self._check_type(sample, bool, op, expr, arg=i + 1)
                 sample = bool(sample)
                 if use_and and not sample:
                     return False
@@ -690,6 +1458,9 @@ class RDDLSimulator:
     # ===========================================================================
     
     def _sample_aggregation(self, expr, subs):
+        sparse = self.sparse_aggregations.get(expr.id, None)
+        if sparse is not None:
+            return sparse.sample(subs)
         _, op = expr.etype
         numpy_op = RDDLSimulator._check_op(
             op, self.AGGREGATION_OPS, 'Aggregation', expr)
@@ -698,7 +1469,7 @@ class RDDLSimulator:
         * _, arg = expr.args
         sample = self._sample(arg, subs)                
         if op in self.AGGREGATION_BOOL:
-            RDDLSimulator._check_type(sample, bool, op, expr, arg='')
+            self._check_type(sample, bool, op, expr, arg='')
         else:
             sample = 1 * sample
         _, axes = self.traced.cached_sim_info(expr)
@@ -733,9 +1504,9 @@ class RDDLSimulator:
             sample_lhs = 1 * self._sample(lhs, subs)
             sample_rhs = 1 * self._sample(rhs, subs)
             if name in self.BINARY_REQUIRES_INT:
-                RDDLSimulator._check_type(
+                self._check_type(
                     sample_lhs, RDDLValueInitializer.INT, name, expr, arg=1)
-                RDDLSimulator._check_type(
+                self._check_type(
                     sample_rhs, RDDLValueInitializer.INT, name, expr, arg=2)
             try:
                 return binary_op(sample_lhs, sample_rhs)
@@ -766,11 +1537,11 @@ class RDDLSimulator:
         
         pred, arg1, arg2 = args
         sample_pred = self._sample(pred, subs)
-        RDDLSimulator._check_type(sample_pred, bool, 'If predicate', expr)
+        self._check_type(sample_pred, bool, 'If predicate', expr)
         
         # can short circuit if all elements of predicate tensor equal
         first_elem = bool(sample_pred.flat[0] 
-                          if self.traced.cached_objects_in_scope(expr) 
+                          if np.ndim(sample_pred) 
                           else sample_pred)
         all_equal = np.all(sample_pred == first_elem)
         
@@ -785,13 +1556,13 @@ class RDDLSimulator:
     def _sample_switch(self, expr, subs):
         pred, *_ = expr.args             
         sample_pred = self._sample(pred, subs)
-        RDDLSimulator._check_type(
+        self._check_type(
             sample_pred, RDDLValueInitializer.INT, 'Switch predicate', expr)
         
         # can short circuit if all elements of predicate tensor equal
         cases, default = self.traced.cached_sim_info(expr)  
         first_elem = bool(sample_pred.flat[0] 
-                          if self.traced.cached_objects_in_scope(expr) 
+                          if np.ndim(sample_pred) 
                           else sample_pred)
         all_equal = np.all(sample_pred == first_elem)
         
@@ -878,7 +1649,7 @@ class RDDLSimulator:
         
         arg, = args
         sample = self._sample(arg, subs)
-        RDDLSimulator._check_types(
+        self._check_types(
             sample, (bool, RDDLValueInitializer.INT), 'Argument of KronDelta', expr)
         return sample
     
@@ -888,7 +1659,7 @@ class RDDLSimulator:
         
         arg, = args
         sample = self._sample(arg, subs)
-        RDDLSimulator._check_type(
+        self._check_type(
             sample, RDDLValueInitializer.REAL, 'Argument of DiracDelta', expr)        
         return sample
     
@@ -899,7 +1670,7 @@ class RDDLSimulator:
         lb, ub = args
         sample_lb = self._sample(lb, subs)
         sample_ub = self._sample(ub, subs)
-        RDDLSimulator._check_bounds(sample_lb, sample_ub, 'Uniform', expr)
+        self._check_bounds(sample_lb, sample_ub, 'Uniform', expr)
         return self.rng.uniform(low=sample_lb, high=sample_ub)      
     
     def _sample_bernoulli(self, expr, subs):
@@ -908,8 +1679,8 @@ class RDDLSimulator:
         
         pr, = args
         sample_pr = self._sample(pr, subs)
-        RDDLSimulator._check_range(sample_pr, 0, 1, 'Bernoulli p', expr)
-        size = sample_pr.shape if self.traced.cached_objects_in_scope(expr) else None
+        self._check_range(sample_pr, 0, 1, 'Bernoulli p', expr)
+        size = np.shape(sample_pr) if np.ndim(sample_pr) else None
         return self.rng.uniform(size=size) <= sample_pr
     
     def _sample_normal(self, expr, subs):
@@ -919,7 +1690,7 @@ class RDDLSimulator:
         mean, var = args
         sample_mean = self._sample(mean, subs)
         sample_var = self._sample(var, subs)
-        RDDLSimulator._check_positive(sample_var, False, 'Normal variance', expr)  
+        self._check_positive(sample_var, False, 'Normal variance', expr)  
         sample_std = np.sqrt(sample_var)
         return self.rng.normal(loc=sample_mean, scale=sample_std)
     
@@ -929,7 +1700,7 @@ class RDDLSimulator:
         
         rate, = args
         sample_rate = self._sample(rate, subs)
-        RDDLSimulator._check_positive(sample_rate, False, 'Poisson rate', expr)        
+        self._check_positive(sample_rate, False, 'Poisson rate', expr)        
         return self.rng.poisson(lam=sample_rate)
     
     def _sample_exponential(self, expr, subs):
@@ -938,7 +1709,7 @@ class RDDLSimulator:
         
         scale, = expr.args
         sample_scale = self._sample(scale, subs)
-        RDDLSimulator._check_positive(sample_scale, True, 'Exponential rate', expr)
+        self._check_positive(sample_scale, True, 'Exponential rate', expr)
         return self.rng.exponential(scale=sample_scale)
     
     def _sample_weibull(self, expr, subs):
@@ -948,8 +1719,8 @@ class RDDLSimulator:
         shape, scale = args
         sample_shape = self._sample(shape, subs)
         sample_scale = self._sample(scale, subs)
-        RDDLSimulator._check_positive(sample_shape, True, 'Weibull shape', expr)
-        RDDLSimulator._check_positive(sample_scale, True, 'Weibull scale', expr)
+        self._check_positive(sample_shape, True, 'Weibull shape', expr)
+        self._check_positive(sample_scale, True, 'Weibull scale', expr)
         return sample_scale * self.rng.weibull(a=sample_shape)
     
     def _sample_gamma(self, expr, subs):
@@ -959,8 +1730,8 @@ class RDDLSimulator:
         shape, scale = args
         sample_shape = self._sample(shape, subs)
         sample_scale = self._sample(scale, subs)
-        RDDLSimulator._check_positive(sample_shape, True, 'Gamma shape', expr)            
-        RDDLSimulator._check_positive(sample_scale, True, 'Gamma scale', expr)        
+        self._check_positive(sample_shape, True, 'Gamma shape', expr)            
+        self._check_positive(sample_scale, True, 'Gamma scale', expr)        
         return self.rng.gamma(shape=sample_shape, scale=sample_scale)
     
     def _sample_binomial(self, expr, subs):
@@ -970,9 +1741,9 @@ class RDDLSimulator:
         count, pr = args
         sample_count = self._sample(count, subs)
         sample_pr = self._sample(pr, subs)
-        RDDLSimulator._check_type(sample_count, RDDLValueInitializer.INT, 'Binomial count', expr)
-        RDDLSimulator._check_positive(sample_count, False, 'Binomial count', expr)
-        RDDLSimulator._check_range(sample_pr, 0, 1, 'Binomial p', expr)
+        self._check_type(sample_count, RDDLValueInitializer.INT, 'Binomial count', expr)
+        self._check_positive(sample_count, False, 'Binomial count', expr)
+        self._check_range(sample_pr, 0, 1, 'Binomial p', expr)
         return self.rng.binomial(n=sample_count, p=sample_pr)
     
     def _sample_negative_binomial(self, expr, subs):
@@ -982,8 +1753,8 @@ class RDDLSimulator:
         count, pr = args
         sample_count = self._sample(count, subs)
         sample_pr = self._sample(pr, subs)
-        RDDLSimulator._check_positive(sample_count, True, 'NegativeBinomial r', expr)
-        RDDLSimulator._check_range(sample_pr, 0, 1, 'NegativeBinomial p', expr)        
+        self._check_positive(sample_count, True, 'NegativeBinomial r', expr)
+        self._check_range(sample_pr, 0, 1, 'NegativeBinomial p', expr)        
         return self.rng.negative_binomial(n=sample_count, p=sample_pr)
     
     def _sample_beta(self, expr, subs):
@@ -993,8 +1764,8 @@ class RDDLSimulator:
         shape, rate = args
         sample_shape = self._sample(shape, subs)
         sample_rate = self._sample(rate, subs)
-        RDDLSimulator._check_positive(sample_shape, True, 'Beta shape', expr)
-        RDDLSimulator._check_positive(sample_rate, True, 'Beta rate', expr)        
+        self._check_positive(sample_shape, True, 'Beta shape', expr)
+        self._check_positive(sample_rate, True, 'Beta rate', expr)        
         return self.rng.beta(a=sample_shape, b=sample_rate)
 
     def _sample_geometric(self, expr, subs):
@@ -1003,7 +1774,7 @@ class RDDLSimulator:
         
         pr, = args
         sample_pr = self._sample(pr, subs)
-        RDDLSimulator._check_range(sample_pr, 0, 1, 'Geometric p', expr)        
+        self._check_range(sample_pr, 0, 1, 'Geometric p', expr)        
         return self.rng.geometric(p=sample_pr)
     
     def _sample_pareto(self, expr, subs):
@@ -1013,8 +1784,8 @@ class RDDLSimulator:
         shape, scale = args
         sample_shape = self._sample(shape, subs)
         sample_scale = self._sample(scale, subs)
-        RDDLSimulator._check_positive(sample_shape, True, 'Pareto shape', expr)        
-        RDDLSimulator._check_positive(sample_scale, True, 'Pareto scale', expr)        
+        self._check_positive(sample_shape, True, 'Pareto shape', expr)        
+        self._check_positive(sample_scale, True, 'Pareto scale', expr)        
         return sample_scale * self.rng.pareto(a=sample_shape)
     
     def _sample_student(self, expr, subs):
@@ -1023,7 +1794,7 @@ class RDDLSimulator:
         
         df, = args
         sample_df = self._sample(df, subs)
-        RDDLSimulator._check_positive(sample_df, True, 'Student df', expr)            
+        self._check_positive(sample_df, True, 'Student df', expr)            
         return self.rng.standard_t(df=sample_df)
 
     def _sample_gumbel(self, expr, subs):
@@ -1033,7 +1804,7 @@ class RDDLSimulator:
         mean, scale = args
         sample_mean = self._sample(mean, subs)
         sample_scale = self._sample(scale, subs)
-        RDDLSimulator._check_positive(sample_scale, True, 'Gumbel scale', expr)
+        self._check_positive(sample_scale, True, 'Gumbel scale', expr)
         return self.rng.gumbel(loc=sample_mean, scale=sample_scale)
     
     def _sample_laplace(self, expr, subs):
@@ -1043,7 +1814,7 @@ class RDDLSimulator:
         mean, scale = args
         sample_mean = self._sample(mean, subs)
         sample_scale = self._sample(scale, subs)
-        RDDLSimulator._check_positive(sample_scale, True, 'Laplace scale', expr)
+        self._check_positive(sample_scale, True, 'Laplace scale', expr)
         return self.rng.laplace(loc=sample_mean, scale=sample_scale)
     
     def _sample_cauchy(self, expr, subs):
@@ -1053,8 +1824,8 @@ class RDDLSimulator:
         mean, scale = args
         sample_mean = self._sample(mean, subs)
         sample_scale = self._sample(scale, subs)
-        RDDLSimulator._check_positive(sample_scale, True, 'Cauchy scale', expr)
-        size = sample_mean.shape if self.traced.cached_objects_in_scope(expr) else None
+        self._check_positive(sample_scale, True, 'Cauchy scale', expr)
+        size = np.shape(sample_mean) if np.ndim(sample_mean) else None
         cauchy01 = self.rng.standard_cauchy(size=size)
         return sample_mean + sample_scale * cauchy01
     
@@ -1065,9 +1836,9 @@ class RDDLSimulator:
         shape, scale = args
         sample_shape = self._sample(shape, subs)
         sample_scale = self._sample(scale, subs)
-        RDDLSimulator._check_positive(sample_shape, True, 'Gompertz shape', expr)
-        RDDLSimulator._check_positive(sample_scale, True, 'Gompertz scale', expr)
-        size = sample_shape.shape if self.traced.cached_objects_in_scope(expr) else None
+        self._check_positive(sample_shape, True, 'Gompertz shape', expr)
+        self._check_positive(sample_scale, True, 'Gompertz scale', expr)
+        size = np.shape(sample_shape) if np.ndim(sample_shape) else None
         U = self.rng.uniform(size=size)
         return np.log(1.0 - np.log1p(-U) / sample_shape) / sample_scale
     
@@ -1077,7 +1848,7 @@ class RDDLSimulator:
         
         df, = args
         sample_df = self._sample(df, subs)
-        RDDLSimulator._check_positive(sample_df, True, 'ChiSquare df', expr)
+        self._check_positive(sample_df, True, 'ChiSquare df', expr)
         return self.rng.chisquare(df=sample_df)
     
     def _sample_kumaraswamy(self, expr, subs):
@@ -1087,9 +1858,9 @@ class RDDLSimulator:
         a, b = args
         sample_a = self._sample(a, subs)
         sample_b = self._sample(b, subs)
-        RDDLSimulator._check_positive(sample_a, True, 'Kumaraswamy a', expr)
-        RDDLSimulator._check_positive(sample_b, True, 'Kumaraswamy b', expr)
-        size = sample_a.shape if self.traced.cached_objects_in_scope(expr) else None
+        self._check_positive(sample_a, True, 'Kumaraswamy a', expr)
+        self._check_positive(sample_b, True, 'Kumaraswamy b', expr)
+        size = np.shape(sample_a) if np.ndim(sample_a) else None
         U = self.rng.uniform(size=size)
         return (1.0 - U ** (1.0 / sample_b)) ** (1.0 / sample_a)
     
@@ -1097,8 +1868,8 @@ class RDDLSimulator:
     # random variables with enum support
     # ===========================================================================
     
-    def _sample_discrete_helper(self, pdf, unnorm, expr):
-        RDDLSimulator._check_positive(pdf, False, 'Discrete probabilities', expr)
+    def _discrete_cdf(self, pdf, unnorm, expr):
+        self._check_positive(pdf, False, 'Discrete probabilities', expr)
         
         # calculate CDF       
         cdf = np.cumsum(pdf, axis=-1)
@@ -1106,22 +1877,50 @@ class RDDLSimulator:
             cdf = cdf / cdf[..., -1:]
             
         # check valid CDF - still do this for unnorm to reject nan values
-        if not np.allclose(cdf[..., -1], 1.0):
+        total = cdf[..., -1]
+        if not np.all(np.abs(total - 1.0) <= RDDLSimulator.DISCRETE_SUM_TOL):
             raise RDDLValueOutOfRangeError(
-                f'Discrete probabilities must sum to 1, got {cdf[..., -1]}.\n' + 
+                f'Discrete probabilities must sum to 1, got {total}.\n' + 
                 print_stack_trace(expr))     
+        return cdf
+    
+    def _sample_discrete_helper(self, pdf, unnorm, expr, rng=None):
+        cdf = self._discrete_cdf(pdf, unnorm, expr)
         
         # use inverse CDF sampling                  
-        U = self.rng.random(size=cdf.shape[:-1] + (1,))
+        if rng is None:
+            rng = self.rng
+        U = rng.random(size=cdf.shape[:-1] + (1,))
+        return RDDLSimulator._inverse_cdf(cdf, U)
+    
+    @staticmethod
+    def _inverse_cdf(cdf, U):
+        
+        # a single distribution is sampled by binary search on its CDF, while 
+        # a tensor of distributions is compared with U all at once, which is 
+        # faster than searching every distribution
+        if cdf.ndim == 1:
+            index, = np.searchsorted(cdf, U, side='right')
+            
+            # as with argmax, U above the rounded total gives the first category
+            if index == cdf.shape[0]:
+                index = 0
+            return RDDLValueInitializer.INT(index)
         return np.argmax(U < cdf, axis=-1)
         
     def _sample_discrete(self, expr, subs, unnorm):
+        table = self.alias_tables.get(expr.id, None)
+        if table is not None:
+            return table.sample(self.rng)
         sorted_args = self.traced.cached_sim_info(expr)
         samples = [self._sample(arg, subs) for arg in sorted_args]
         pdf = np.stack(samples, axis=-1)
         return self._sample_discrete_helper(pdf, unnorm, expr)
     
     def _sample_discrete_pvar(self, expr, subs, unnorm):
+        table = self.alias_tables.get(expr.id, None)
+        if table is not None:
+            return table.sample(self.rng)
         _, args = expr.args
         arg, = args
         pdf = self._sample(arg, subs)
@@ -1175,7 +1974,7 @@ class RDDLSimulator:
         sample_mean = self._sample(mean, subs)
         sample_cov = self._sample(cov, subs)
         sample_df = self._sample(df, subs)
-        RDDLSimulator._check_positive(sample_df, True, 'MultivariateStudent df', expr)
+        self._check_positive(sample_df, True, 'MultivariateStudent df', expr)
         
         # reparameterization trick MN(m, LL') = LZ + m, where Z ~ StudentT(0, 1)
         sample_df = sample_df[..., np.newaxis, np.newaxis]
@@ -1198,7 +1997,7 @@ class RDDLSimulator:
         sample_alpha = self._sample(alpha, subs)
         
         # sample Gamma(alpha_i, 1) and normalize across i
-        RDDLSimulator._check_positive(sample_alpha, True, 'Dirichlet alpha', expr)
+        self._check_positive(sample_alpha, True, 'Dirichlet alpha', expr)
         Gamma = self.rng.gamma(shape=sample_alpha, scale=1.0)
         sample = Gamma / np.sum(Gamma, axis=-1, keepdims=True)
         
@@ -1215,9 +2014,9 @@ class RDDLSimulator:
         trials, prob = args
         sample_trials = self._sample(trials, subs) 
         sample_prob = self._sample(prob, subs)       
-        RDDLSimulator._check_type(sample_trials, RDDLValueInitializer.INT, 'Multinomial trials', expr)
-        RDDLSimulator._check_positive(sample_trials, False, 'Multinomial trials', expr)
-        RDDLSimulator._check_positive(sample_prob, False, 'Discrete probabilities', expr)
+        self._check_type(sample_trials, RDDLValueInitializer.INT, 'Multinomial trials', expr)
+        self._check_positive(sample_trials, False, 'Multinomial trials', expr)
+        self._check_positive(sample_prob, False, 'Discrete probabilities', expr)
         
         # check valid PMF
         cum_prob = np.sum(sample_prob, axis=-1)
@@ -1309,7 +2108,17 @@ class RDDLSimulatorPrecompiled(RDDLSimulator):
                  levels: Dict[int, Set[str]], 
                  trace_info: object,
                  rng: np.random.Generator=np.random.default_rng(),
-                 keep_tensors: bool=False) -> None:
+                 logger: Optional[Logger]=None,
+                 keep_tensors: bool=False,
+                 compile_closures: bool=True,
+                 zero_copy: bool=False,
+                 profile: bool=False,
+                 num_threads: int=1,
+                 keyed_rng: bool=False,
+                 validation: str='full',
+                 validation_steps: int=100,
+                 lazy_grounding: bool=False,
+                 alias_sampling: bool=False) -> None:
         self.init_values = init_values
         self.levels = levels
         self.traced = trace_info
@@ -1318,8 +2127,17 @@ class RDDLSimulatorPrecompiled(RDDLSimulator):
             rddl=rddl, 
             allow_synchronous_state=True,
             rng=rng,
-            logger=None,
-            keep_tensors=keep_tensors)        
+            logger=logger,
+            keep_tensors=keep_tensors,
+            compile_closures=compile_closures,
+            zero_copy=zero_copy,
+            profile=profile,
+            num_threads=num_threads,
+            keyed_rng=keyed_rng,
+            validation=validation,
+            validation_steps=validation_steps,
+            lazy_grounding=lazy_grounding,
+            alias_sampling=alias_sampling)        
     
     def _compile(self):
         rddl = self.rddl
@@ -1342,10 +2160,128 @@ class RDDLSimulatorPrecompiled(RDDLSimulator):
                              if rddl.variable_types[var] == 'action-fluent'}        
         self.grounded_noop_actions = rddl.ground_vars_with_values(self.noop_actions)
         self.grounded_action_ranges = rddl.ground_vars_with_value(rddl.action_ranges)
+        self._compile_action_table()
         self._pomdp = bool(rddl.observ_fluents)
         
         # cached for performance
         self.invariant_names = [f'Invariant {i}' for i in range(len(rddl.invariants))]        
         self.precond_names = [f'Precondition {i}' for i in range(len(rddl.preconditions))]
         self.terminal_names = [f'Termination {i}' for i in range(len(rddl.terminations))]
-        
\ No newline at end of file
+        
+
+# A simulator that samples from NumPy code generated from the model
+class RDDLSimulatorCodegen(RDDLSimulator):
+    
+    def __init__(self, rddl: RDDLPlanningModel,
+                 allow_synchronous_state: bool=True,
+                 rng: np.random.Generator=np.random.default_rng(),
+                 logger: Optional[Logger]=None,
+                 keep_tensors: bool=False,
+                 compile_closures: bool=True,
+                 zero_copy: bool=False,
+                 profile: bool=False,
+                 sparse_threshold: Optional[int]=None,
+                 dtypes: Optional[Dict[str, type]]=None,
+                 keyed_rng: bool=False,
+                 validation: str='full',
+                 validation_steps: int=100,
+                 lazy_grounding: bool=False,
+                 alias_sampling: bool=False,
+                 cache_dir: Optional[str]=None,
+                 cache_key: Optional[str]=None) -> None:
+        '''Creates a new simulator for the given RDDL model, that generates and
+        executes straight-line NumPy code for the CPFs, reward and constraints.
+        
+        :param rddl: the RDDL model
+        :param allow_synchronous_state: whether state-fluent can be synchronous
+        :param rng: the random number generator
+        :param logger: to log information about compilation to file
+        :param keep_tensors: whether the sampler takes actions and
+        returns state in numpy array form
+        :param compile_closures: whether to compile expressions that are not 
+        generated as code into closures
+        :param zero_copy: whether states and actions are kept in persistent 
+        buffers that are updated in place, and states are returned as 
+        read-only views that are only valid until the next step
+        :param profile: whether to measure the time spent in every expression 
+        that is not generated as code, and in the reward and constraints
+        :param sparse_threshold: if specified, the least number of elements of
+        the non-fluents that are stored as sparse tensors
+        :param dtypes: optional dictionary mapping fluents and non-fluents to
+        the narrower dtypes in which their tensors are stored
+        :param keyed_rng: whether every random expression samples from its own
+        counter-based random stream keyed by its id
+        :param validation: how often the values of expressions are checked at
+        run time ('full', 'sampled' or 'off'), where the code generated without
+        the checks is used in the steps that are not checked
+        :param validation_steps: the number of steps of the validation level
+        :param lazy_grounding: whether states and observations are returned as
+        views that read grounded values from the lifted tensors when accessed
+        :param alias_sampling: whether Discrete distributions with static
+        probabilities are sampled from alias tables
+        :param cache_dir: optional directory where the generated code is saved
+        and reused by later simulators of the same domain and instance
+        :param cache_key: a key identifying the domain and instance in the cache
+        directory (i.e., a hash of their text), defaults to a key computed 
+        from the model
+        '''
+        super(RDDLSimulatorCodegen, self).__init__(
+            rddl=rddl,
+            allow_synchronous_state=allow_synchronous_state,
+            rng=rng,
+            logger=logger,
+            keep_tensors=keep_tensors,
+            compile_closures=compile_closures,
+            zero_copy=zero_copy,
+            profile=profile,
+            sparse_threshold=sparse_threshold,
+            dtypes=dtypes,
+            keyed_rng=keyed_rng,
+            validation=validation,
+            validation_steps=validation_steps,
+            lazy_grounding=lazy_grounding,
+            alias_sampling=alias_sampling)
+        
+        self._cache_dir = cache_dir
+        self._cache_key = cache_key
+        self._generated = {}
+        self._generate_source(logger=logger)
+    
+    def _generate_source(self, logger=None):
+        generator = RDDLCodeGenerator(self, logger=logger, validate=self.validating,
+                                      profile=self.profiler is not None)
+        self.source = generator.generate(
+            cache_dir=self._cache_dir, cache_key=self._cache_key)
+        self.source_path = generator.path
+        self._bind_source()
+    
+    def _bind_source(self):
+        filename = self.source_path or f'<rddl {self.rddl.domain_name}>'
+        namespace = {}
+        exec(compile(self.source, filename, 'exec'), namespace)
+        self._generated_cpfs, self._generated_roots = namespace['bind'](self)
+        self._generated[self.validating] = (
+            self.source, self.source_path, 
+            self._generated_cpfs, self._generated_roots)
+        
+        # the reward and constraints are sampled by the generated functions,
+        # while the generated code measures the time of each CPF itself
+        if self.compile_closures:
+            for (identifier, root) in self._generated_roots.items():
+                if self.profiler is not None:
+                    root = self.profiler.wrap(identifier, root)
+                self._closures[identifier] = root
+    
+    def _set_validation(self, validate):
+        super(RDDLSimulatorCodegen, self)._set_validation(validate)
+        
+        # the code without checks is generated the first time it is needed
+        generated = self._generated.get(validate, None)
+        if generated is None:
+            self._generate_source()
+        else:
+            (self.source, self.source_path, 
+             self._generated_cpfs, self._generated_roots) = generated
+    
+    def _sample_cpfs(self, subs):
+        self._generated_cpfs(subs)
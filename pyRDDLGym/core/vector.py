@@ -0,0 +1,423 @@
+import ctypes
+import multiprocessing
+import numpy as np
+import traceback
+from gymnasium.spaces import Box, Dict, Discrete
+from gymnasium.vector import VectorEnv
+from gymnasium.vector.utils import batch_space
+from typing import Any, Optional, Sequence, Tuple, Union
+
+from pyRDDLGym.core.debug.exception import (
+    RDDLInvalidActionError,
+    RDDLTypeError
+)
+from pyRDDLGym.core.env import RDDLEnv
+
+# gymnasium >= 1.1 declares how sub-environments are reset
+try:
+    from gymnasium.vector import AutoresetMode
+except ImportError:
+    AutoresetMode = None
+
+# arguments of RDDLEnv that name files, which are made unique per copy
+_PATH_ARGS = ('debug_path', 'log_path')
+
+
+# ===========================================================================
+# shared memory layout
+# ===========================================================================
+
+def _space_items(space):
+    '''Returns the subspaces of a dict space, or the single entry None of a 
+    flat space.'''
+    if isinstance(space, Dict):
+        return list(space.spaces.items())
+    else:
+        return [(None, space)]
+
+
+def _space_layout(space, num_envs: int, prefix: str, layout: dict,
+                  offset: int, shapes: Optional[dict]=None, 
+                  real_dtype: Optional[type]=None) -> int:
+    '''Appends the batched buffers of a dict space to the layout, and returns
+    the offset past the last buffer. Values are stored in the dtypes of the 
+    space, unless real_dtype overrides the dtype of real values, and shapes can
+    override the shapes of the boxes in the space (e.g. with the shapes of the 
+    fluents).'''
+    if shapes is None:
+        shapes = {}
+    for (key, subspace) in _space_items(space):
+        if isinstance(subspace, Box):
+            shape = shapes.get(key, subspace.shape)
+            dtype = subspace.dtype
+            if real_dtype is not None and np.issubdtype(dtype, np.floating):
+                dtype = real_dtype
+        elif isinstance(subspace, Discrete):
+            shape = ()
+            dtype = np.int64
+        else:
+            raise RDDLTypeError(
+                f'Space <{subspace}> of <{key}> cannot be stored in shared memory.')
+        offset = _add_buffer(layout, (prefix, key), (num_envs,) + shape, dtype, offset)
+    return offset
+
+
+def _add_buffer(layout, name, shape, dtype, offset):
+    dtype = np.dtype(dtype)
+    offset = -(-offset // 8) * 8
+    layout[name] = (offset, shape, dtype)
+    return offset + int(np.prod(shape)) * dtype.itemsize
+
+
+def _buffer_views(buffer, layout):
+    '''Returns numpy arrays backed by the shared buffer for every entry in the
+    layout.'''
+    views = {}
+    for (name, (offset, shape, dtype)) in layout.items():
+        count = int(np.prod(shape))
+        views[name] = np.frombuffer(
+            buffer, dtype=dtype, count=count, offset=offset).reshape(shape)
+    return views
+
+
+def _env_kwargs(env_kwargs, index):
+    '''Returns the arguments of the RDDLEnv at the given index of the vector,
+    so that copies do not write their logs to the same file.'''
+    kwargs = dict(env_kwargs)
+    for arg in _PATH_ARGS:
+        if kwargs.get(arg, None):
+            kwargs[arg] = f'{kwargs[arg]}_{index}'
+    return kwargs
+
+
+# ===========================================================================
+# worker process
+# ===========================================================================
+
+def _write_obs(views, index, obs):
+    if not isinstance(obs, dict):
+        obs = {None: obs}
+    for (key, value) in obs.items():
+        view = views[('obs', key)]
+        if value is None:
+            view[index] = 0
+        else:
+            view[index] = np.reshape(value, view.shape[1:])
+
+
+def _worker(pipe, parent_pipe, domain, instance, env_kwargs,
+            start, stop, buffer, layout):
+    parent_pipe.close()
+    try:
+        envs = [RDDLEnv(domain=domain, instance=instance,
+                        **_env_kwargs(env_kwargs, index))
+                for index in range(start, stop)]
+        views = _buffer_views(buffer, layout)
+        action_keys = [name[1] for name in layout 
+                       if isinstance(name, tuple) and name[0] == 'action']
+        rewards = views['reward']
+        terminations = views['terminated']
+        truncations = views['truncated']
+        needs_reset = [False] * len(envs)
+        pipe.send(('ok', None))
+    except Exception:
+        pipe.send(('error', traceback.format_exc()))
+        pipe.close()
+        return
+
+    while True:
+        try:
+            command, data = pipe.recv()
+        except EOFError:
+            break
+        try:
+
+            # reset every environment in the shard, seeding them if required
+            if command == 'reset':
+                for (j, env) in enumerate(envs):
+                    index = start + j
+                    if data is not None and data[j] is not None:
+                        env.seed(data[j])
+                    obs, _ = env.reset()
+                    _write_obs(views, index, obs)
+                    rewards[index] = 0.0
+                    terminations[index] = truncations[index] = False
+                    needs_reset[j] = False
+                pipe.send(('ok', None))
+
+            # step every environment in the shard with actions read from the
+            # buffer, and reset environments whose episode ended on last step
+            elif command == 'step':
+                for (j, env) in enumerate(envs):
+                    index = start + j
+                    if needs_reset[j]:
+                        obs, _ = env.reset()
+                        reward, terminated, truncated = 0.0, False, False
+                    else:
+                        if env.vectorized:
+                            actions = {key: np.array(views[('action', key)][index])
+                                       for key in action_keys}
+                        else:
+
+                            # grounded actions are passed as scalars, since values
+                            # such as enum objects are looked up by value
+                            actions = {key: views[('action', key)][index].item()
+                                       for key in action_keys}
+                        if env.flat:
+                            actions = actions[None]
+                        obs, reward, terminated, truncated, _ = env.step(actions)
+                    _write_obs(views, index, obs)
+                    rewards[index] = reward
+                    terminations[index] = terminated
+                    truncations[index] = truncated
+                    needs_reset[j] = terminated or truncated
+                pipe.send(('ok', None))
+
+            elif command == 'close':
+                for env in envs:
+                    env.close()
+                pipe.send(('ok', None))
+                break
+
+            else:
+                raise ValueError(f'Invalid command <{command}> for worker.')
+
+        except Exception:
+            pipe.send(('error', traceback.format_exc()))
+    pipe.close()
+
+
+# ===========================================================================
+# vector environment
+# ===========================================================================
+
+class RDDLVectorEnv(VectorEnv):
+    '''A gymnasium vector environment that steps several copies of a RDDLEnv
+    in worker processes.
+
+    The copies are split into contiguous shards, one per worker process.
+    Observations, actions, rewards and termination flags are exchanged through
+    buffers in shared memory, so only a short command is sent to each worker
+    on every step. The domain and instance are compiled once in the main 
+    process, and the compiled information is sent to the workers, which 
+    restore a precompiled simulator from it instead of parsing and compiling
+    them again. The compiled information is also saved to the compilation 
+    cache if cache_dir is given.
+
+    Sub-environments whose episode ended are reset on the next call to step(),
+    which ignores their actions and returns their initial observation.
+    '''
+
+    metadata = {} if AutoresetMode is None else \
+        {'autoreset_mode': AutoresetMode.NEXT_STEP}
+
+    def __init__(self, domain: str,
+                 instance: str,
+                 num_envs: int,
+                 num_workers: Optional[int]=None,
+                 copy: bool=True,
+                 context: Optional[str]=None,
+                 **env_kwargs) -> None:
+        '''Creates a new vector environment from the given RDDL domain + instance.
+
+        :param domain: the RDDL domain
+        :param instance: the RDDL instance
+        :param num_envs: the number of copies of the environment
+        :param num_workers: the number of worker processes, defaults to the
+        smaller of num_envs and the number of cpus
+        :param copy: whether reset() and step() return copies of the buffers in
+        shared memory, or views of them that are overwritten by the next call
+        :param context: the multiprocessing start method (e.g. fork, spawn),
+        defaults to the default start method of the platform
+        :param **env_kwargs: other arguments to pass to each RDDLEnv (e.g. 
+        cache_dir, see RDDLEnv)
+        '''
+        if num_envs < 1:
+            raise ValueError(f'Number of environments must be positive, got {num_envs}.')
+        if num_workers is None:
+            num_workers = min(num_envs, multiprocessing.cpu_count())
+        num_workers = max(1, min(num_workers, num_envs))
+
+        self.num_envs = num_envs
+        self.num_workers = num_workers
+        self.copy = copy
+
+        # compile the environment once, which also populates the cache if given
+        single_kwargs = {key: value for (key, value) in env_kwargs.items()
+                         if key not in _PATH_ARGS}
+        self.env = RDDLEnv(domain=domain, instance=instance, **single_kwargs)
+        self.single_observation_space = self.env.observation_space
+        self.single_action_space = self.env.action_space
+        self.observation_space = batch_space(self.single_observation_space, num_envs)
+        self.action_space = batch_space(self.single_action_space, num_envs)
+
+        # allocate the shared buffers
+        layout = {}
+        # observations are returned in the dtypes of the observation space, 
+        # while real actions are passed to the simulator in double precision
+        offset = _space_layout(self.single_observation_space, num_envs, 'obs', layout, 0)
+        offset = _space_layout(self.single_action_space, num_envs, 'action', layout,
+                              offset, shapes=self.env._shapes, real_dtype=np.float64)
+        offset = _add_buffer(layout, 'reward', (num_envs,), np.float64, offset)
+        offset = _add_buffer(layout, 'terminated', (num_envs,), np.bool_, offset)
+        offset = _add_buffer(layout, 'truncated', (num_envs,), np.bool_, offset)
+        ctx = multiprocessing.get_context(context)
+        self._buffer = ctx.RawArray(ctypes.c_byte, max(offset, 1))
+        self._views = _buffer_views(self._buffer, layout)
+        self._obs_keys = [key for (key, _) in _space_items(self.single_observation_space)]
+        self._action_keys = [key for (key, _) in _space_items(self.single_action_space)]
+
+        # default actions fill in the actions that are not provided to step()
+        if self.env.flat:
+            noop_actions = {None: self.env._flat_noop_actions}
+        else:
+            noop_actions = self.env._noop_actions
+        self._noop_actions = {}
+        for key in self._action_keys:
+            shape = self._views[('action', key)].shape
+            self._noop_actions[key] = np.broadcast_to(
+                np.reshape(noop_actions[key], shape[1:]), shape)
+
+        # start the workers, which restore their copies from the compiled 
+        # information of the environment instead of compiling them again
+        worker_kwargs = {**env_kwargs, 'compiled_info': self.env.compiled_info()}
+        self._shards = []
+        self._pipes = []
+        self._processes = []
+        self.closed = True
+        bounds = np.linspace(0, num_envs, num_workers + 1).astype(int)
+        for (start, stop) in zip(bounds[:-1], bounds[1:]):
+            parent_pipe, child_pipe = ctx.Pipe()
+            process = ctx.Process(
+                target=_worker,
+                name=f'RDDLVectorEnvWorker-{start}',
+                args=(child_pipe, parent_pipe, domain, instance, worker_kwargs,
+                      int(start), int(stop), self._buffer, layout),
+                daemon=True)
+            process.start()
+            child_pipe.close()
+            self._shards.append((int(start), int(stop)))
+            self._pipes.append(parent_pipe)
+            self._processes.append(process)
+        self.closed = False
+        self._receive()
+
+        # seed each copy from independent streams
+        self._seeds = np.random.SeedSequence().spawn(num_envs)
+
+    def _send(self, command, data=None):
+        for (pipe, (start, stop)) in zip(self._pipes, self._shards):
+            if isinstance(data, list):
+                pipe.send((command, data[start:stop]))
+            else:
+                pipe.send((command, data))
+
+    def _receive(self):
+        errors = []
+        for pipe in self._pipes:
+            status, message = pipe.recv()
+            if status == 'error':
+                errors.append(message)
+        if errors:
+            raise RuntimeError(
+                'An error occurred in a worker of the vector environment:\n' +
+                '\n'.join(errors))
+
+    def _observations(self):
+        views = self._views
+        if self.env.flat:
+            obs = views[('obs', None)]
+            return obs.copy() if self.copy else obs
+        if self.copy:
+            return {key: views[('obs', key)].copy() for key in self._obs_keys}
+        else:
+            return {key: views[('obs', key)] for key in self._obs_keys}
+
+    def _flags(self):
+        views = self._views
+        if self.copy:
+            return (views['reward'].copy(),
+                    views['terminated'].copy(),
+                    views['truncated'].copy())
+        else:
+            return views['reward'], views['terminated'], views['truncated']
+
+    def reset(self, seed: Optional[Union[int, Sequence[int]]]=None,
+              options: Optional[Any]=None) -> Tuple[Any, Any]:
+        '''Resets all copies of the environment.
+
+        :param seed: a seed from which the seeds of all copies are derived, or
+        a sequence with one seed per copy
+        :param options: not used
+        '''
+        if seed is None:
+            seeds = self._seeds
+            self._seeds = None
+        elif isinstance(seed, (int, np.integer)):
+            seeds = np.random.SeedSequence(int(seed)).spawn(self.num_envs)
+        else:
+            seeds = list(seed)
+            if len(seeds) != self.num_envs:
+                raise ValueError(f'Expected {self.num_envs} seeds, got {len(seeds)}.')
+        if seeds is not None:
+            seeds = list(seeds)
+        self._send('reset', seeds)
+        self._receive()
+        return self._observations(), {}
+
+    def step(self, actions: Any) -> Tuple[Any, np.ndarray, np.ndarray, np.ndarray, Any]:
+        '''Steps all copies of the environment.
+
+        :param actions: a dict mapping each action fluent to an array whose
+        leading axis indexes the copies: fluents that are not specified are
+        assigned their default values (or a matrix of flat action vectors, one 
+        row per copy, if the environment is flat)
+        '''
+        views = self._views
+        if self.env.flat:
+            actions = {None: actions}
+        for key in actions:
+            if ('action', key) not in views:
+                raise RDDLInvalidActionError(
+                    f'<{key}> is not a valid action fluent, '
+                    f'must be one of {self._action_keys}.')
+        for key in self._action_keys:
+            view = views[('action', key)]
+            values = actions.get(key, None)
+            if values is None:
+                view[...] = self._noop_actions[key]
+            else:
+                view[...] = np.reshape(values, view.shape)
+
+        self._send('step')
+        self._receive()
+        rewards, terminations, truncations = self._flags()
+        return self._observations(), rewards, terminations, truncations, {}
+
+    def close_extras(self, **kwargs) -> None:
+        if getattr(self, 'closed', True):
+            return
+        try:
+            self._send('close')
+            self._receive()
+        except (BrokenPipeError, EOFError, RuntimeError):
+            pass
+        for pipe in self._pipes:
+            pipe.close()
+        for process in self._processes:
+            process.join()
+        self.env.close()
+
+    def close(self, **kwargs) -> None:
+        if getattr(self, 'closed', True):
+            return
+        self.close_extras(**kwargs)
+        self.closed = True
+
+    def set_visualizer(self, *args, **kwargs) -> None:
+        '''Sets the visualizer of the environment compiled in the main process,
+        which is not used by the copies in the worker processes.'''
+        self.env.set_visualizer(*args, **kwargs)
+
+    def __del__(self):
+        self.close()
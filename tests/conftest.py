@@ -0,0 +1,201 @@
+import pytest
+
+DOMAIN = '''
+domain d1 {
+
+    types {
+        obj : object;
+        grade : {@low, @mid, @high};
+    };
+
+    pvariables {
+        n : { state-fluent, int, default = 0 };
+        x(obj) : { state-fluent, real, default = 0.0 };
+        on(obj) : { state-fluent, bool, default = false };
+        lv : { state-fluent, grade, default = @low };
+        b : { action-fluent, int, default = 0 };
+        f : { action-fluent, real, default = 0.0 };
+        push(obj) : { action-fluent, bool, default = false };
+    };
+
+    cpfs {
+        n' = n + b;
+        x'(?o) = x(?o) + f;
+        on'(?o) = push(?o);
+        lv' = if (n > 10) then @high else @mid;
+    };
+
+    reward = n;
+
+    action-preconditions {
+        b >= 0;
+    };
+
+    state-invariants {
+        n >= 0;
+    };
+}
+'''
+
+INSTANCE = '''
+non-fluents nf_d1 {
+    domain = d1;
+    objects {
+        obj : {o1, o2};
+    };
+}
+
+instance d1_inst {
+    domain = d1;
+    non-fluents = nf_d1;
+    init-state {
+        on(o1) = true;
+    };
+    max-nondef-actions = pos-inf;
+    horizon = 5;
+    discount = 1.0;
+}
+'''
+
+
+@pytest.fixture
+def d1(tmp_path):
+    '''Returns the paths of the domain and instance files of a small domain 
+    with int, real, bool and enum fluents, and unparameterized actions.'''
+    domain = tmp_path / 'domain.rddl'
+    instance = tmp_path / 'instance.rddl'
+    domain.write_text(DOMAIN)
+    instance.write_text(INSTANCE)
+    return str(domain), str(instance)
+
+
+POMDP_DOMAIN = '''
+domain p1 {
+
+    types {
+        obj : object;
+        grade : {@low, @mid, @high};
+    };
+
+    pvariables {
+        n : { state-fluent, int, default = 0 };
+        on(obj) : { state-fluent, bool, default = false };
+        seen : { observ-fluent, int };
+        lv : { observ-fluent, grade };
+        lit(obj) : { observ-fluent, bool };
+        b : { action-fluent, int, default = 0 };
+    };
+
+    cpfs {
+        n' = n + b;
+        on'(?o) = ~on(?o);
+        seen = n';
+        lv = if (n' > 2) then @high else @mid;
+        lit(?o) = on'(?o);
+    };
+
+    reward = n;
+}
+'''
+
+POMDP_INSTANCE = '''
+non-fluents nf_p1 {
+    domain = p1;
+    objects {
+        obj : {o1, o2};
+    };
+}
+
+instance p1_inst {
+    domain = p1;
+    non-fluents = nf_p1;
+    max-nondef-actions = pos-inf;
+    horizon = 5;
+    discount = 1.0;
+}
+'''
+
+
+@pytest.fixture
+def p1(tmp_path):
+    '''Returns the paths of the domain and instance files of a small POMDP 
+    with int, enum and bool observ-fluents.'''
+    domain = tmp_path / 'pomdp_domain.rddl'
+    instance = tmp_path / 'pomdp_instance.rddl'
+    domain.write_text(POMDP_DOMAIN)
+    instance.write_text(POMDP_INSTANCE)
+    return str(domain), str(instance)
+
+
+STOCHASTIC_DOMAIN = '''
+domain s1 {
+
+    types {
+        obj : object;
+        grade : {@low, @mid, @high};
+    };
+
+    pvariables {
+        W(obj) : { non-fluent, real, default = 1.0 };
+        LINK(obj, obj) : { non-fluent, bool, default = false };
+        x(obj) : { state-fluent, real, default = 0.0 };
+        on(obj) : { state-fluent, bool, default = false };
+        n : { state-fluent, int, default = 0 };
+        lv : { state-fluent, grade, default = @low };
+        f : { action-fluent, real, default = 0.0 };
+        push(obj) : { action-fluent, bool, default = false };
+    };
+
+    cpfs {
+        x'(?o) = x(?o) + Normal(f, W(?o) * W(?o) + 0.5);
+        on'(?o) = push(?o) | Bernoulli(0.3) 
+                  | (exists_{?p : obj}[LINK(?o, ?p) ^ on(?p)]);
+        n' = n + (sum_{?o : obj}[on(?o)]) + Poisson(1.0);
+        lv' = if ((sum_{?o : obj}[on(?o)]) > 1) 
+                  then Discrete(grade, @low : 0.2, @mid : 0.3, @high : 0.5)
+              else lv;
+    };
+
+    reward = (sum_{?o : obj}[x(?o)]) - n;
+
+    state-invariants {
+        n >= 0;
+    };
+}
+'''
+
+STOCHASTIC_INSTANCE = '''
+non-fluents nf_s1 {
+    domain = s1;
+    objects {
+        obj : {o1, o2, o3, o4};
+    };
+    non-fluents {
+        W(o2) = 2.0;
+        LINK(o1, o2) = true;
+    };
+}
+
+instance s1_inst {
+    domain = s1;
+    non-fluents = nf_s1;
+    init-state {
+        on(o2) = true;
+    };
+    max-nondef-actions = pos-inf;
+    horizon = 20;
+    discount = 1.0;
+}
+'''
+
+
+@pytest.fixture
+def s1(tmp_path):
+    '''Returns the paths of the domain and instance files of a small stochastic
+    domain whose expressions can be folded (W(?o) * W(?o) + 0.5), shared 
+    (sum_{?o : obj}[on(?o)]) and sampled from a sparse non-fluent (LINK).'''
+    domain = tmp_path / 'stochastic_domain.rddl'
+    instance = tmp_path / 'stochastic_instance.rddl'
+    domain.write_text(STOCHASTIC_DOMAIN)
+    instance.write_text(STOCHASTIC_INSTANCE)
+    return str(domain), str(instance)
@@ -0,0 +1,25 @@
+import numpy as np
+
+from pyRDDLGym.core.batched import RDDLBatchedSimulator
+from pyRDDLGym.core.env import RDDLEnv
+from pyRDDLGym.core.simulator import RDDLSimulator
+
+
+def test_batch_of_one_matches_simulator(s1):
+    domain, instance = s1
+    model = RDDLEnv(domain, instance).model
+    sim = RDDLSimulator(model, rng=np.random.default_rng(3))
+    batched = RDDLBatchedSimulator(model, batch_size=1, 
+                                   rng=np.random.default_rng(3))
+    sim.reset()
+    batched.reset()
+    for step in range(10):
+        actions = {'f': 0.5, 'push___o3': step % 2 == 0}
+        obs, reward, done = sim.step(actions)
+        batch_obs, batch_reward, batch_done = batched.step(actions)
+        assert batch_obs.keys() == obs.keys()
+        for (name, value) in obs.items():
+            assert np.shape(batch_obs[name]) == (1,)
+            assert np.allclose(batch_obs[name][0], value)
+        assert np.allclose(batch_reward, [reward])
+        assert np.array_equal(batch_done, [done])
@@ -0,0 +1,29 @@
+from pyRDDLGym.core.compiler import cache
+from pyRDDLGym.core.compiler.cache import RDDLCompilationCache
+
+
+def test_key_depends_on_compiler_sources(monkeypatch):
+    key = RDDLCompilationCache.key('domain', 'instance')
+    assert key == RDDLCompilationCache.key('domain', 'instance')
+    assert key != RDDLCompilationCache.key('domain', 'instance2')
+
+    # a modified compiler must not reuse the entries of the previous one
+    monkeypatch.setattr(cache, 'source_digest', lambda: 'modified')
+    assert key != RDDLCompilationCache.key('domain', 'instance')
+
+
+def test_digest_covers_constraints_and_simulator():
+    patterns = cache.SOURCE_FILES
+    assert 'constraints.py' in patterns and 'simulator.py' in patterns
+
+
+def test_cached_env_writes_debug_log(d1, tmp_path):
+    from pyRDDLGym.core.env import RDDLEnv
+    domain, instance = d1
+    for name in ('first', 'second'):
+        env = RDDLEnv(domain, instance, cache_dir=str(tmp_path / 'cache'),
+                      debug_path=str(tmp_path / name))
+        env.close()
+    assert type(env.sampler).__name__ == 'RDDLSimulatorPrecompiled'
+    log = (tmp_path / 'second.log').read_text()
+    assert '[info] restored compiled model from' in log
@@ -0,0 +1,79 @@
+import numpy as np
+import pytest
+
+from pyRDDLGym.core.env import RDDLEnv
+
+BOX_DOMAIN = '''
+domain d4 {
+
+    types {
+        obj : object;
+    };
+
+    pvariables {
+        n : { state-fluent, int, default = 0 };
+        x(obj) : { state-fluent, real, default = 0.0 };
+        b : { action-fluent, int, default = 0 };
+    };
+
+    cpfs {
+        n' = n + b;
+        x'(?o) = x(?o);
+    };
+
+    reward = 0;
+
+    state-invariants {
+        n >= 0;
+        n < 5;
+        forall_{?o : obj}[x(?o) <= 2.0];
+        x(@o1) + x(@o2) <= 3.0;
+    };
+}
+'''
+
+BOX_INSTANCE = '''
+non-fluents nf_d4 {
+    domain = d4;
+    objects {
+        obj : {o1, o2};
+    };
+}
+
+instance d4_inst {
+    domain = d4;
+    non-fluents = nf_d4;
+    max-nondef-actions = pos-inf;
+    horizon = 5;
+    discount = 1.0;
+}
+'''
+
+
+@pytest.fixture
+def d4(tmp_path):
+    domain = tmp_path / 'domain.rddl'
+    instance = tmp_path / 'instance.rddl'
+    domain.write_text(BOX_DOMAIN)
+    instance.write_text(BOX_INSTANCE)
+    return str(domain), str(instance)
+
+
+def test_box_invariants_match_evaluated_invariants(d4):
+    domain, instance = d4
+    env = RDDLEnv(domain, instance)
+    sampler = env.sampler
+    box = sampler.box_invariants
+    assert box.vars and box.other_invariants == [3]
+    rng = np.random.default_rng(0)
+    checked = set()
+    for _ in range(200):
+        sampler.subs['n'] = rng.integers(-1, 7)
+        sampler.subs['x'] = rng.choice([-1.0, 0.5, 1.5, 2.0, 2.5], size=2)
+        sampler.box_invariants = box
+        in_box = box.check(sampler.subs)
+        satisfied = sampler.check_state_invariants(silent=True)
+        sampler.box_invariants = None
+        assert satisfied == sampler.check_state_invariants(silent=True)
+        checked.add((in_box, satisfied))
+    assert checked == {(True, True), (True, False), (False, False)}
@@ -0,0 +1,50 @@
+import numpy as np
+
+from pyRDDLGym.core.env import RDDLEnv
+
+
+def test_flat_vectors_round_trip_vectorized_fluents(s1):
+    domain, instance = s1
+    env = RDDLEnv(domain, instance, vectorized=True)
+    flat_env = RDDLEnv(domain, instance, flat=True)
+    obs, _ = env.reset(seed=7)
+    flat_obs, _ = flat_env.reset(seed=7)
+    for step in range(10):
+        grounded = env.model.ground_vars_with_values(obs)
+        assert flat_obs in flat_env.observation_space
+        assert flat_env.observation_names == list(grounded)
+        assert np.allclose(flat_obs, [grounded[name] for name in grounded])
+
+        actions = {'f': 0.5, 'push': np.array([False, False, step % 2 == 0, True])}
+        grounded = env.model.ground_vars_with_values(actions)
+        flat_actions = np.array([grounded[name] for name in flat_env.action_names])
+        unflattened = flat_env._unflatten_actions(flat_actions)
+        assert unflattened.keys() == actions.keys()
+        for (var, value) in actions.items():
+            np.testing.assert_array_equal(unflattened[var], value)
+        obs, reward, _, _, _ = env.step(actions)
+        flat_obs, flat_reward, _, _, _ = flat_env.step(flat_actions)
+        assert np.isclose(flat_reward, reward)
+
+
+def test_grounded_actions_match_vectorized_actions(s1):
+    domain, instance = s1
+    env = RDDLEnv(domain, instance, vectorized=True)
+    grounded_env = RDDLEnv(domain, instance)
+    obs, _ = env.reset(seed=7)
+    grounded_obs, _ = grounded_env.reset(seed=7)
+    for step in range(10):
+        actions = {'f': 0.5, 'push': np.array([step % 2 == 0, False, True, False])}
+        grounded_actions = {'f': 0.5, 'push___o3': True}
+        if step % 2 == 0:
+            grounded_actions['push___o1'] = True
+        tensors = grounded_env.sampler._process_actions(grounded_actions)
+        for (var, value) in actions.items():
+            np.testing.assert_array_equal(tensors[var], value)
+        
+        obs, reward, _, _, _ = env.step(actions)
+        grounded_obs, grounded_reward, _, _, _ = grounded_env.step(grounded_actions)
+        assert grounded_obs.keys() == env.model.ground_vars_with_values(obs).keys()
+        for (name, value) in env.model.ground_vars_with_values(obs).items():
+            assert np.isclose(grounded_obs[name], value)
+        assert np.isclose(grounded_reward, reward)
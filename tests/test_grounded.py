@@ -0,0 +1,46 @@
+import numpy as np
+
+from pyRDDLGym.core.compiler.grounded import RDDLGroundedView
+from pyRDDLGym.core.env import RDDLEnv
+
+
+def test_view_equals_grounded_values(s1):
+    domain, instance = s1
+    env = RDDLEnv(domain, instance)
+    model = env.model
+    env.reset(seed=7)
+    env.step({'f': 0.5, 'push___o3': True})
+    values = {var: env.sampler.subs[var] for var in model.state_fluents}
+    view = RDDLGroundedView(values, RDDLGroundedView.table(model, values))
+    expected = model.ground_vars_with_values(values)
+    assert list(view) == list(expected)
+    assert dict(view) == expected
+    assert len(view) == len(expected) and 'x___o2' in view and 'x' not in view
+
+
+def test_lazy_grounding_matches_grounded_states(s1):
+    domain, instance = s1
+    env = RDDLEnv(domain, instance)
+    lazy_env = RDDLEnv(domain, instance, backend_kwargs={'lazy_grounding': True})
+    obs, _ = env.reset(seed=7)
+    lazy_obs, _ = lazy_env.reset(seed=7)
+    for step in range(5):
+        assert isinstance(lazy_obs, RDDLGroundedView)
+        assert list(lazy_obs) == list(obs)
+        for (name, value) in obs.items():
+            assert np.isclose(lazy_obs[name], value)
+        actions = {'f': 0.5, 'push___o3': step % 2 == 0}
+        obs, _, _, _, _ = env.step(actions)
+        lazy_obs, _, _, _, _ = lazy_env.step(actions)
+
+
+def test_lazy_grounding_matches_grounded_observations(p1):
+    domain, instance = p1
+    env = RDDLEnv(domain, instance)
+    lazy_env = RDDLEnv(domain, instance, backend_kwargs={'lazy_grounding': True})
+    env.reset(seed=0)
+    lazy_env.reset(seed=0)
+    for b in (1, 2, 0):
+        obs, _, _, _, _ = env.step({'b': b})
+        lazy_obs, _, _, _, _ = lazy_env.step({'b': b})
+        assert dict(lazy_obs) == obs
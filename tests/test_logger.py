@@ -0,0 +1,102 @@
+import numpy as np
+import pytest
+
+from pyRDDLGym.core.debug.logger import BinarySimLogger
+from pyRDDLGym.core.debug.trajectory import RDDLTrajectoryReader
+from pyRDDLGym.core.env import RDDLEnv
+
+# actions of two episodes, as grounded dictionaries: the log records the 
+# observation returned by each step with the action and reward of the step
+ACTIONS = [[{'b': 2, 'f': 0.5, 'push___o1': True}, {'b': 1}],
+           [{'push___o2': True}, {'b': 4, 'f': -1.0}, {}]]
+
+MODES = {
+    'plain': {},
+    'vectorized': {'vectorized': True},
+    'flat': {'flat': True},
+    'zero_copy': {'zero_copy': True}
+}
+
+
+def _env_actions(env, actions):
+    '''Converts grounded actions to the format the environment expects.'''
+    if env.flat:
+        flat = env._flat_noop_actions.copy()
+        for (key, value) in actions.items():
+            flat[env.action_names.index(key)] = value
+        return flat
+    elif not env.vectorized:
+        return actions
+    lifted = {}
+    for (key, value) in actions.items():
+        var, *_ = key.split(env.model.FLUENT_SEP)
+        tensor = np.array(env._noop_actions[var], copy=True)
+        index = list(env.model.variable_groundings[var]).index(key)
+        tensor.reshape(-1)[index] = value
+        lifted[var] = tensor
+    return lifted
+
+
+@pytest.mark.parametrize('mode', list(MODES))
+def test_binary_log_round_trip(d1, tmp_path, mode):
+    domain, instance = d1
+    env = RDDLEnv(domain, instance, log_path=str(tmp_path / 'run'),
+                  log_format='binary', **MODES[mode])
+    expected = []
+    for episode in ACTIONS:
+        env.reset(seed=0)
+        rows = []
+        for actions in episode:
+            _, reward, _, _, _ = env.step(_env_actions(env, actions))
+            state = env.sampler.states
+            if env.vectorized:
+                state = env.model.ground_vars_with_values(state)
+            rows.append((dict(state), actions, reward))
+        expected.append(rows)
+    env.close()
+
+    reader = RDDLTrajectoryReader(str(tmp_path / 'run_log'))
+    episodes = reader.episodes()
+    assert len(episodes) == len(ACTIONS)
+    objects = env.model.type_to_objects['grade']
+    for (episode, rows) in zip(episodes, expected):
+        np.testing.assert_array_equal(episode['turn'], np.arange(len(rows)))
+        np.testing.assert_allclose(episode['reward'], [row[2] for row in rows])
+        for (t, (state, actions, _)) in enumerate(rows):
+            assert episode['state/n'][t, 0] == state['n']
+            assert episode['state/lv'][t, 0] == objects[state['lv']]
+            np.testing.assert_allclose(
+                episode['state/x'][t], [state['x___o1'], state['x___o2']])
+            assert episode['action/b'][t, 0] == actions.get('b', 0)
+            assert episode['action/f'][t, 0] == actions.get('f', 0.0)
+            np.testing.assert_array_equal(
+                episode['action/push'][t],
+                [actions.get('push___o1', False), actions.get('push___o2', False)])
+
+
+def test_binary_log_numbers_episodes_by_start_episode(d1, tmp_path):
+    domain, instance = d1
+    env = RDDLEnv(domain, instance)
+    logger = BinarySimLogger(str(tmp_path / 'log'), env.model, write_freq=2)
+    logger.clear()
+    env.reset(seed=0)
+    for episode in ACTIONS:
+        logger.start_episode()
+        for (t, actions) in enumerate(episode):
+            obs, reward, done, _, _ = env.step(actions)
+            logger.log(obs, {**env._noop_actions, **actions}, reward, done, t)
+            
+            # free text does not start a new episode
+            logger.log_free('text')
+    logger.close()
+
+    episodes = RDDLTrajectoryReader(str(tmp_path / 'log')).episodes()
+    assert [len(episode['turn']) for episode in episodes] == list(map(len, ACTIONS))
+    
+    # appended episodes continue the numbering
+    logger.clear(overwrite=False)
+    logger.start_episode()
+    logger.log(obs, env._noop_actions, 0.0, True, 0)
+    logger.close()
+    data = RDDLTrajectoryReader(str(tmp_path / 'log')).read()
+    assert list(np.unique(data['round'])) == [0, 1, 2]
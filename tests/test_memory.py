@@ -0,0 +1,28 @@
+import numpy as np
+
+from pyRDDLGym.core.env import RDDLEnv
+from pyRDDLGym.core.memory import RDDLMemoryAnalysis
+
+
+def test_fluents_of_unbounded_actions_are_not_narrowed(d1):
+    domain, instance = d1
+    env = RDDLEnv(domain, instance)
+    dtypes = RDDLMemoryAnalysis(env.model).narrow_dtypes()
+    assert 'n' not in dtypes and "n'" not in dtypes
+    assert dtypes['lv'] == np.int8
+
+    # large actions must not wrap around or violate the invariant n >= 0
+    env = RDDLEnv(domain, instance, backend_kwargs={'dtypes': dtypes})
+    env.reset(seed=0)
+    for _ in range(3):
+        obs, _, terminated, truncated, _ = env.step({'b': 50})
+        assert not (terminated or truncated)
+    assert obs['n'] == 150
+
+
+def test_fluents_of_bounded_actions_are_narrowed(d1):
+    domain, instance = d1
+    env = RDDLEnv(domain, instance)
+    action_bounds = {'b': (0, 10)}
+    dtypes = RDDLMemoryAnalysis(env.model).narrow_dtypes(action_bounds=action_bounds)
+    assert dtypes['n'] == np.int8
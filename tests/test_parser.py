@@ -0,0 +1,39 @@
+import os
+
+from pyRDDLGym.core.parser import parser as parser_module
+from pyRDDLGym.core.parser.parser import RDDLParser
+from pyRDDLGym.core.paths import CACHE_DIR_VARIABLE, PLY_TABLES_VARIABLE
+
+
+def _parse(d1):
+    domain, instance = d1
+    parser = RDDLParser(lexer=None, verbose=False)
+    parser.build()
+    with open(domain) as domain_file, open(instance) as instance_file:
+        rddl = parser.parse(domain_file.read() + '\n' + instance_file.read())
+    assert rddl.domain.name == 'd1'
+
+
+def test_tables_are_stored_in_cache_dir(d1, tmp_path, monkeypatch):
+    monkeypatch.setenv(CACHE_DIR_VARIABLE, str(tmp_path / 'cache'))
+    monkeypatch.delenv(PLY_TABLES_VARIABLE, raising=False)
+    _parse(d1)
+    tables = sorted(os.listdir(tmp_path / 'cache' / 'ply'))
+    assert any(name.startswith('rddl_lextab_') for name in tables)
+    assert any(name.startswith('rddl_parsetab_') for name in tables)
+    
+    # the stored tables are loaded by the next parser
+    _parse(d1)
+    assert sorted(os.listdir(tmp_path / 'cache' / 'ply')) == tables
+
+
+def test_tables_are_not_written_when_disabled(d1, tmp_path, monkeypatch):
+    monkeypatch.setenv(CACHE_DIR_VARIABLE, str(tmp_path / 'cache'))
+    monkeypatch.setenv(PLY_TABLES_VARIABLE, '0')
+    monkeypatch.chdir(tmp_path)
+    package_dir = os.path.dirname(parser_module.__file__)
+    package_files = set(os.listdir(package_dir))
+    _parse(d1)
+    assert not (tmp_path / 'cache').exists()
+    assert set(os.listdir(tmp_path)) == {'domain.rddl', 'instance.rddl'}
+    assert set(os.listdir(package_dir)) == package_files
@@ -0,0 +1,28 @@
+import pytest
+
+from pyRDDLGym.core.env import RDDLEnv
+from pyRDDLGym.core.simulator import RDDLSimulator, RDDLSimulatorCodegen
+
+
+@pytest.mark.parametrize('backend', [RDDLSimulator, RDDLSimulatorCodegen])
+def test_profiler_times_every_cpf(d1, backend):
+    domain, instance = d1
+    env = RDDLEnv(domain, instance, backend=backend, backend_kwargs={'profile': True})
+    env.reset(seed=0)
+    for _ in range(3):
+        env.step({'b': 1})
+    stats = {name: (calls, elapsed) 
+             for (name, calls, elapsed) in env.sampler.profiler.root_stats()}
+    for cpf in ("n'", "x'", "on'", "lv'"):
+        calls, elapsed = stats[f'CPF {cpf}']
+        assert calls == 3 and elapsed > 0
+    assert stats['Reward'][0] == 3
+
+
+def test_codegen_times_cpfs_only_when_profiling(d1):
+    domain, instance = d1
+    env = RDDLEnv(domain, instance, backend=RDDLSimulatorCodegen)
+    assert '_clock' not in env.sampler.source
+    env = RDDLEnv(domain, instance, backend=RDDLSimulatorCodegen, 
+                  backend_kwargs={'profile': True})
+    assert '_clock' in env.sampler.source
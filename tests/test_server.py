@@ -0,0 +1,115 @@
+import asyncio
+import numpy as np
+import socket
+
+from pyRDDLGym.core.debug.trajectory import RDDLTrajectoryReader, RDDLTrajectoryWriter
+from pyRDDLGym.core.env import RDDLEnv
+from pyRDDLGym.core.server import (
+    RDDLMessageBuffer,
+    RDDLSimServer,
+    RDDLSimSession,
+    _advance
+)
+
+
+def _free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+def test_message_buffer_splits_fragmented_and_coalesced_messages():
+    received = RDDLMessageBuffer()
+    assert received.pop() is None
+    
+    # a message split across chunks, including inside a multi-byte character
+    data = '<actions>\u00e9</actions>'.encode('UTF-8') + b'\0'
+    for i in range(len(data) - 1):
+        received.feed(data[i:i + 1])
+        assert received.pop() is None
+    received.feed(memoryview(data)[-1:])
+    assert received.pop() == '<actions>\u00e9</actions>'
+    assert received.pop() is None
+    
+    # several messages and the start of another in one chunk
+    received.feed(b'<a/>\0<b/>\0\0<c')
+    assert received.pop() == '<a/>'
+    assert received.pop() == '<b/>'
+    assert received.pop() == ''
+    assert received.pop() is None
+    received.feed(b'/>\0')
+    assert received.pop() == '<c/>'
+    assert received.pop() is None and not received.buffer
+
+
+async def _connect(port, message):
+    for _ in range(100):
+        try:
+            reader, writer = await asyncio.open_connection('127.0.0.1', port)
+            break
+        except ConnectionError:
+            await asyncio.sleep(0.05)
+    writer.write(message.encode() + b'\0')
+    await writer.drain()
+    await reader.read()
+    writer.close()
+
+
+def test_failed_sessions_are_closed(d1, capsys):
+    domain, instance = d1
+    port = _free_port()
+    server = RDDLSimServer(domain, instance, numrounds=1, time=10, port=port)
+
+    async def _main():
+        serving = asyncio.ensure_future(server.serve(max_sessions=2, session_timeout=10))
+        
+        # a malformed message and an invalid session request
+        await _connect(port, '<session-request>')
+        await _connect(port, '<session-request><problem-name>d1</problem-name>'
+                             '<client-name>c</client-name>'
+                             '<input-language>text</input-language>'
+                             '</session-request>')
+        await asyncio.wait_for(serving, 10)
+    
+    asyncio.run(_main())
+    assert [summary['session_id'] for summary in server.sessions] == [0, 1]
+    assert server.sessions[1]['client'] == 'c'
+    
+    # only the last session is kept, and its state is exposed by the server
+    assert server.session.session_id == 1
+    assert server.client == 'c' and server.currentround == 0
+    assert server.total_reward == 0.0 and server.logs == []
+    assert '<session-id>1</session-id>' in server.build_session_end_msg()
+    out = capsys.readouterr().out
+    assert 'Session 0 failed: ParseError' in out
+    assert 'Session 1 failed: RDDLSessionError' in out
+    assert 'Unhandled exception' not in out
+
+
+SESSION_REQUEST = ('<session-request><problem-name>p1</problem-name>'
+                   '<client-name>c</client-name>'
+                   '<input-language>rddl</input-language></session-request>')
+ROUND_REQUEST = '<round-request><execute-policy>yes</execute-policy></round-request>'
+ACTIONS = '<actions></actions>'
+
+
+def test_pomdp_session_logs_trajectory(p1, tmp_path):
+    domain, instance = p1
+    env = RDDLEnv(domain, instance)
+    writer = RDDLTrajectoryWriter(str(tmp_path / 'log'), env.model)
+    session = RDDLSimSession(env, 'task', numrounds=1, time=10, writer=writer)
+    messages = session.messages()
+    inputs = iter([SESSION_REQUEST, ROUND_REQUEST] + [ACTIONS] * env.horizon)
+    request = _advance(messages)
+    while request is not None:
+        data = next(inputs) if request is RDDLSimSession.RECEIVE else None
+        request = _advance(messages, data)
+    session.close()
+
+    reader = RDDLTrajectoryReader(str(tmp_path / 'log'))
+    data = reader.read()
+    np.testing.assert_array_equal(data['turn'], np.arange(1, env.horizon + 1))
+    np.testing.assert_array_equal(data[reader.mask('state/seen')][:, 0], 
+                                  [False] + [True] * (env.horizon - 1))
+    np.testing.assert_array_equal(data['state/lv'][:, 0], [''] + ['mid'] * (env.horizon - 1))
+    np.testing.assert_array_equal(data['done'], [False] * (env.horizon - 1) + [True])
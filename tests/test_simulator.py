@@ -0,0 +1,262 @@
+import threading
+import numpy as np
+import pytest
+
+from pyRDDLGym.core.env import RDDLEnv
+from pyRDDLGym.core.simulator import RDDLSimulator, RDDLSimulatorCodegen
+
+
+def _sampler_threads():
+    return [thread for thread in threading.enumerate()
+            if thread.name.startswith('RDDLSimulator')]
+
+
+def test_close_shuts_down_sampling_threads(d1):
+    domain, instance = d1
+    env = RDDLEnv(domain, instance, backend_kwargs={'num_threads': 2})
+    env.reset(seed=0)
+    env.step({'b': 1, 'f': 1.0})
+    assert _sampler_threads()
+    env.close()
+    assert not _sampler_threads()
+
+    # the simulator samples sequentially once its threads are shut down
+    env.reset(seed=0)
+    obs, _, _, _, _ = env.step({'b': 2})
+    assert obs['n'] == 2
+
+
+DISCRETE_DOMAIN = '''
+domain d2 {
+
+    types {
+        grade : {@low, @mid, @high};
+    };
+
+    pvariables {
+        g : { state-fluent, grade, default = @low };
+        a : { action-fluent, bool, default = false };
+    };
+
+    cpfs {
+        g' = Discrete(grade, @low : 0.2, @mid : 0.3, @high : 0.5);
+    };
+
+    reward = 0;
+}
+'''
+
+DISCRETE_INSTANCE = '''
+non-fluents nf_d2 {
+    domain = d2;
+}
+
+instance d2_inst {
+    domain = d2;
+    non-fluents = nf_d2;
+    max-nondef-actions = pos-inf;
+    horizon = 2000;
+    discount = 1.0;
+}
+'''
+
+
+@pytest.fixture
+def d2(tmp_path):
+    domain = tmp_path / 'domain.rddl'
+    instance = tmp_path / 'instance.rddl'
+    domain.write_text(DISCRETE_DOMAIN)
+    instance.write_text(DISCRETE_INSTANCE)
+    return str(domain), str(instance)
+
+
+def _sample_grades(env, steps):
+    env.reset(seed=42)
+    return [env.step({})[0]['g'] for _ in range(steps)]
+
+
+def test_alias_sampling_is_opt_in(d2):
+    domain, instance = d2
+    env = RDDLEnv(domain, instance)
+    assert not env.sampler.alias_tables
+    samples = _sample_grades(env, 10)
+    assert samples == _sample_grades(RDDLEnv(domain, instance), 10)
+
+    env = RDDLEnv(domain, instance, backend_kwargs={'alias_sampling': True})
+    assert len(env.sampler.alias_tables) == 1
+    counts = np.bincount(_sample_grades(env, 2000), minlength=3) / 2000
+    assert np.allclose(counts, [0.2, 0.3, 0.5], atol=0.05)
+
+
+INT_CPF_DOMAIN = '''
+domain d3 {
+
+    types {
+        obj : object;
+    };
+
+    pvariables {
+        n : { state-fluent, int, default = 0 };
+        y(obj) : { state-fluent, real, default = 0.5 };
+        b : { action-fluent, int, default = 0 };
+    };
+
+    cpfs {
+        n' = n + b;
+        y'(?o) = n + b;
+    };
+
+    reward = 0;
+}
+'''
+
+INT_CPF_INSTANCE = '''
+non-fluents nf_d3 {
+    domain = d3;
+    objects {
+        obj : {o1, o2};
+    };
+}
+
+instance d3_inst {
+    domain = d3;
+    non-fluents = nf_d3;
+    max-nondef-actions = pos-inf;
+    horizon = 5;
+    discount = 1.0;
+}
+'''
+
+
+def test_zero_copy_keeps_dtypes_of_states(tmp_path):
+    domain = tmp_path / 'domain.rddl'
+    instance = tmp_path / 'instance.rddl'
+    domain.write_text(INT_CPF_DOMAIN)
+    instance.write_text(INT_CPF_INSTANCE)
+    trajectories = []
+    for zero_copy in (False, True):
+        env = RDDLEnv(str(domain), str(instance), vectorized=True, zero_copy=zero_copy)
+        obs, _ = env.reset(seed=0)
+        trajectory = [{var: np.array(value) for (var, value) in obs.items()}]
+        for b in (1, 2, 3):
+            obs, _, _, _, _ = env.step({'b': b})
+            trajectory.append({var: np.array(value) for (var, value) in obs.items()})
+        trajectories.append(trajectory)
+    for (expected, actual) in zip(*trajectories):
+        for var in expected:
+            assert actual[var].dtype == expected[var].dtype
+            np.testing.assert_array_equal(actual[var], expected[var])
+
+
+@pytest.mark.parametrize('validation', ['full', 'sampled', 'off'])
+def test_invariants_truncate_without_validation(d1, validation):
+    domain, instance = d1
+    env = RDDLEnv(domain, instance, validation=validation, validation_steps=2)
+    env.reset(seed=0)
+    for _ in range(3):
+        _, _, _, truncated, _ = env.step({'b': 0})
+        assert not truncated
+    assert not env.sampler.validating or validation == 'full'
+    _, _, _, truncated, _ = env.step({'b': -1})
+    assert truncated
+
+
+def _rollout(env, steps=10):
+    obs, _ = env.reset(seed=7)
+    trajectory = []
+    for step in range(steps):
+        actions = {'f': 0.5, 'push___o3': step % 2 == 0}
+        obs, reward, _, _, _ = env.step(actions)
+        trajectory.append((dict(obs), reward))
+    return trajectory
+
+
+def _assert_same_trajectories(expected, actual):
+    for ((expected_obs, expected_reward), (obs, reward)) in zip(expected, actual):
+        assert obs.keys() == expected_obs.keys()
+        for (name, value) in expected_obs.items():
+            assert np.allclose(obs[name], value)
+        assert np.isclose(reward, expected_reward)
+
+
+def test_closures_match_interpreter(s1):
+    domain, instance = s1
+    env = RDDLEnv(domain, instance, backend_kwargs={'compile_closures': False})
+    expected = _rollout(env)
+    env = RDDLEnv(domain, instance, backend_kwargs={'compile_closures': True})
+    assert env.sampler._closures
+    _assert_same_trajectories(expected, _rollout(env))
+
+
+def test_codegen_matches_interpreter(s1):
+    domain, instance = s1
+    env = RDDLEnv(domain, instance, backend_kwargs={'compile_closures': False})
+    expected = _rollout(env)
+    env = RDDLEnv(domain, instance, backend=RDDLSimulatorCodegen)
+    _assert_same_trajectories(expected, _rollout(env))
+
+
+PASS_BACKENDS = [(RDDLSimulator, {'compile_closures': False}),
+                 (RDDLSimulator, {'compile_closures': True}),
+                 (RDDLSimulatorCodegen, {})]
+
+
+@pytest.mark.parametrize('backend, backend_kwargs', PASS_BACKENDS)
+def test_folding_matches_unfolded_run(s1, monkeypatch, backend, backend_kwargs):
+    domain, instance = s1
+    env = RDDLEnv(domain, instance, backend=backend, backend_kwargs=backend_kwargs)
+    assert env.sampler.folded
+    folded = _rollout(env)
+
+    def _fold_nothing(self):
+        self.folded = {}
+    
+    monkeypatch.setattr(RDDLSimulator, '_fold_constants', _fold_nothing)
+    env = RDDLEnv(domain, instance, backend=backend, backend_kwargs=backend_kwargs)
+    assert not env.sampler.folded
+    _assert_same_trajectories(_rollout(env), folded)
+
+
+@pytest.mark.parametrize('backend, backend_kwargs', PASS_BACKENDS)
+def test_shared_subexpressions_match_unshared_run(s1, monkeypatch, backend, 
+                                                  backend_kwargs):
+    domain, instance = s1
+    env = RDDLEnv(domain, instance, backend=backend, backend_kwargs=backend_kwargs)
+    assert env.sampler.shared
+    shared = _rollout(env)
+
+    def _share_nothing(self):
+        self.shared = {}
+        self._shared_values = {}
+    
+    monkeypatch.setattr(RDDLSimulator, '_eliminate_common_subexpressions', 
+                        _share_nothing)
+    env = RDDLEnv(domain, instance, backend=backend, backend_kwargs=backend_kwargs)
+    assert not env.sampler.shared
+    _assert_same_trajectories(_rollout(env), shared)
+
+
+@pytest.mark.parametrize('backend, backend_kwargs', PASS_BACKENDS)
+def test_sparse_aggregations_match_dense_run(s1, backend, backend_kwargs):
+    domain, instance = s1
+    env = RDDLEnv(domain, instance, backend=backend, backend_kwargs=backend_kwargs)
+    assert not env.sampler.sparse_aggregations
+    dense = _rollout(env)
+    env = RDDLEnv(domain, instance, backend=backend, 
+                  backend_kwargs={**backend_kwargs, 'sparse_threshold': 1})
+    assert env.sampler.sparse_aggregations
+    _assert_same_trajectories(_rollout(env), dense)
+
+
+@pytest.mark.parametrize('backend, backend_kwargs', [
+    (RDDLSimulator, {'num_threads': 2}),
+    (RDDLSimulator, {'compile_closures': False}),
+    (RDDLSimulatorCodegen, {})])
+def test_keyed_rng_does_not_depend_on_evaluation(s1, backend, backend_kwargs):
+    domain, instance = s1
+    env = RDDLEnv(domain, instance, backend_kwargs={'keyed_rng': True})
+    expected = _rollout(env)
+    env = RDDLEnv(domain, instance, backend=backend, 
+                  backend_kwargs={**backend_kwargs, 'keyed_rng': True})
+    _assert_same_trajectories(expected, _rollout(env))
+    env.close()
@@ -0,0 +1,70 @@
+import numpy as np
+
+from pyRDDLGym.core.debug.trajectory import RDDLTrajectoryReader, RDDLTrajectoryWriter
+from pyRDDLGym.core.env import RDDLEnv
+
+
+def test_writer_parses_scalar_actions_and_enum_states(d1, tmp_path):
+    domain, instance = d1
+    env = RDDLEnv(domain, instance)
+    state, _ = env.reset(seed=0)
+    writer = RDDLTrajectoryWriter(str(tmp_path / 'log'), env.model)
+    writer.write(1, 1, state, {'b': '3', 'f': '1.5', 'push___o1': 'true'}, 0.0)
+    state, reward, _, _, _ = env.step({'b': 3})
+    writer.end_round(1, 2, state)
+    writer.close()
+
+    data = RDDLTrajectoryReader(str(tmp_path / 'log')).read()
+    np.testing.assert_array_equal(data['action/b'], [[3], [0]])
+    np.testing.assert_allclose(data['action/f'], [[1.5], [0.0]])
+    np.testing.assert_array_equal(data['action/push'], [[True, False], [False, False]])
+    np.testing.assert_array_equal(data['state/n'], [[0], [3]])
+    np.testing.assert_array_equal(data['state/lv'], [['low'], ['mid']])
+    np.testing.assert_array_equal(data['done'], [False, True])
+
+
+def test_writer_stores_grounded_and_lifted_records_alike(d1, tmp_path):
+    domain, instance = d1
+    env = RDDLEnv(domain, instance)
+    state, _ = env.reset(seed=0)
+    state, _, _, _, _ = env.step({'b': 2})
+    env = RDDLEnv(domain, instance, vectorized=True)
+    env.reset(seed=0)
+    lifted, _, _, _, _ = env.step({'b': np.asarray(2)})
+    writer = RDDLTrajectoryWriter(str(tmp_path / 'grounded'), env.model)
+    writer.write(0, 1, state, {'b': 1}, 1.0)
+    writer.close()
+    writer = RDDLTrajectoryWriter(str(tmp_path / 'lifted'), env.model)
+    writer.write_tensors(0, 1, lifted, {'b': np.asarray(1)}, 1.0)
+    writer.close()
+
+    grounded = RDDLTrajectoryReader(str(tmp_path / 'grounded')).read()
+    lifted = RDDLTrajectoryReader(str(tmp_path / 'lifted')).read()
+    assert grounded.keys() == lifted.keys()
+    for name in grounded:
+        np.testing.assert_array_equal(grounded[name], lifted[name])
+
+
+def test_writer_masks_missing_observations(p1, tmp_path):
+    domain, instance = p1
+    for (vectorized, write) in ((False, RDDLTrajectoryWriter.write),
+                                (True, RDDLTrajectoryWriter.write_tensors)):
+        env = RDDLEnv(domain, instance, vectorized=vectorized)
+        path = str(tmp_path / f'log{vectorized}')
+        writer = RDDLTrajectoryWriter(path, env.model)
+        obs, _ = env.reset(seed=0)
+        write(writer, 0, 1, obs, {'b': 3}, 0.0)
+        obs, _, _, _, _ = env.step({'b': 3})
+        writer.end_round(0, 2, obs) if not vectorized else \
+            write(writer, 0, 2, obs, None, 0.0, done=True)
+        writer.close()
+
+        reader = RDDLTrajectoryReader(path)
+        data = reader.read()
+        for name in ('state/seen', 'state/lv', 'state/lit'):
+            np.testing.assert_array_equal(data[reader.mask(name)].all(axis=1), 
+                                          [False, True])
+        np.testing.assert_array_equal(data['state/seen'], [[0], [3]])
+        np.testing.assert_array_equal(data['state/lv'], [[''], ['high']])
+        np.testing.assert_array_equal(data['state/lit'], [[False, False], [True, True]])
+        assert reader.mask('action/b') is None
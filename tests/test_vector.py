@@ -0,0 +1,69 @@
+import numpy as np
+
+from pyRDDLGym.core.env import RDDLEnv
+from pyRDDLGym.core.vector import RDDLVectorEnv
+
+
+def test_vector_env_steps_grounded_actions(d1, tmp_path):
+    domain, instance = d1
+    envs = RDDLVectorEnv(domain, instance, num_envs=2, num_workers=1,
+                         cache_dir=str(tmp_path / 'cache'))
+    try:
+        envs.reset(seed=0)
+        obs, rewards, _, _, _ = envs.step({'b': np.array([1, 2]),
+                                           'f': np.array([0.5, 1.5]),
+                                           'push___o2': np.array([True, False])})
+        np.testing.assert_array_equal(obs['n'], [1, 2])
+        np.testing.assert_allclose(np.ravel(obs['x___o1']), [0.5, 1.5])
+        np.testing.assert_array_equal(obs['on___o2'], [True, False])
+        obs, rewards, _, _, _ = envs.step({'b': np.array([3, 4])})
+        np.testing.assert_array_equal(obs['n'], [4, 6])
+        np.testing.assert_array_equal(rewards, [1, 2])
+    finally:
+        envs.close()
+
+    # the copies step like a single environment
+    env = RDDLEnv(domain, instance)
+    env.reset(seed=0)
+    env.step({'b': 1, 'f': 0.5, 'push___o2': True})
+    obs, reward, _, _, _ = env.step({'b': 3})
+    assert obs['n'] == 4 and reward == 1
+
+
+def test_vector_env_without_cache(d1, tmp_path, monkeypatch):
+    monkeypatch.setenv('PYRDDLGYM_CACHE_DIR', str(tmp_path / 'default'))
+    domain, instance = d1
+    envs = RDDLVectorEnv(domain, instance, num_envs=2, num_workers=2, vectorized=True)
+    try:
+        envs.reset(seed=0)
+        obs, _, _, _, _ = envs.step({'b': np.array([1, 2])})
+        np.testing.assert_array_equal(obs['n'], [1, 2])
+    finally:
+        envs.close()
+
+    # compiled models are only cached if a cache directory is given
+    assert not list((tmp_path / 'default').glob('*.pkl'))
+
+
+def test_vector_env_workers_restore_compiled_model(d1, monkeypatch):
+    import os
+    from pyRDDLGym.core import env as env_module
+
+    # workers forked from this process must not parse the domain again
+    parent, parser = os.getpid(), env_module.shared_parser
+    def _shared_parser():
+        assert os.getpid() == parent, 'worker parsed the domain'
+        return parser()
+    monkeypatch.setattr(env_module, 'shared_parser', _shared_parser)
+    
+    domain, instance = d1
+    envs = RDDLVectorEnv(domain, instance, num_envs=2, num_workers=2, 
+                         vectorized=True, context='fork')
+    try:
+        obs, _ = envs.reset(seed=0)
+        assert obs in envs.observation_space
+        obs, _, _, _, _ = envs.step({'b': np.array([1, 2]), 'f': np.array([0.5, 1.0])})
+        assert obs in envs.observation_space
+        np.testing.assert_allclose(obs['x'], [[0.5, 0.5], [1.0, 1.0]])
+    finally:
+        envs.close()